@@ -1,4 +1,5 @@
 import time
+import json
 from types import MethodType
 
 from qt.core import (
@@ -6,23 +7,29 @@ from qt.core import (
     QPlainTextEdit, QPushButton, QSplitter, QLabel, QThread, QLineEdit,
     QGridLayout, QProgressBar, pyqtSignal, pyqtSlot, QPixmap, QEvent,
     QStackedWidget, QSpacerItem, QTabWidget, QCheckBox,
-    QComboBox, QSizePolicy)
+    QComboBox, QSizePolicy, QTimer)
 from calibre.constants import __version__
 
 from . import EbookTranslator
-from .lib.utils import uid, traceback_error
+from .lib.utils import traceback_error
 from .lib.config import get_config
+from .lib.metrics import JobMetrics, spans
 from .lib.encodings import encoding_list
-from .lib.cache import Paragraph, get_cache
+from .lib.cache import Paragraph, TranslationCache, get_cache
 from .lib.translation import get_engine_class, get_translator, get_translation
 from .lib.element import get_element_handler
-from .lib.conversion import extract_item, extra_formats
+from .lib.conversion import (
+    extract_item, extra_formats, get_cache_id, get_extraction_key)
 from .engines.openai import ChatgptTranslate, ChatgptBatchTranslate
+from .engines.anthropic import ClaudeTranslate, ClaudeBatchTranslate
+from .engines.google import GeminiTranslate, GeminiBatchTranslate
+from .engines.microsoft import (
+    AzureChatgptTranslate, AzureChatgptBatchTranslate)
 from .engines.custom import CustomTranslate
 from .components import (
     EngineList, Footer, SourceLang, TargetLang, InputFormat, OutputFormat,
     AlertMessage, AdvancedTranslationTable, StatusColor, TranslationStatus,
-    set_shortcut, ChatgptBatchTranslationManager)
+    set_shortcut, BatchTranslationManager, SignalDispatcher)
 from .components.editor import CodeEditor
 
 
@@ -85,14 +92,11 @@ class PreparationWorker(QObject):
         input_path = self.ebook.get_input_path()
         element_handler = get_element_handler(
             self.engine_class.placeholder, self.engine_class.separator,
-            self.ebook.target_direction)
+            self.ebook.target_direction, self.ebook.input_format)
         merge_length = str(element_handler.get_merge_length())
-        encoding = ''
-        if self.ebook.encoding.lower() != 'utf-8':
-            encoding = self.ebook.encoding.lower()
-        cache_id = uid(
-            input_path + self.engine_class.name + self.ebook.target_lang
-            + merge_length + encoding)
+        cache_id = get_cache_id(
+            input_path, self.engine_class.name, self.ebook.target_lang,
+            merge_length, self.ebook.encoding)
         cache = get_cache(cache_id)
 
         if cache.is_fresh() or not cache.is_persistence():
@@ -104,14 +108,36 @@ class PreparationWorker(QObject):
             cache.set_info('merge_length', merge_length)
             cache.set_info('plugin_version', EbookTranslator.__version__)
             cache.set_info('calibre_version', __version__)
+            extraction_key = get_extraction_key(
+                input_path, self.ebook.input_format, self.ebook.encoding,
+                self.engine_class.placeholder, self.engine_class.separator,
+                self.ebook.target_direction)
+            cache.is_fresh() and cache.set_checkpoint(
+                'extracting', fingerprint=extraction_key)
+            # The same content may have been extracted for another engine or
+            # target language, so reuse it instead of converting again.
+            source_id = TranslationCache.find_by_info(
+                'extraction_key', extraction_key, cache_id) \
+                if cache.is_persistence() else None
+            if source_id is not None:
+                self.progress_message.emit(_('Loading extracted content...'))
+                self.progress_detail.emit(
+                    'Reusing the content extracted in cache: %s' % source_id)
+                cache.save(TranslationCache.originals(source_id))
+                cache.set_info('extraction_key', extraction_key)
+                self.progress.emit(100)
+                self.finished.emit(cache_id)
+                self.on_working = False
+                return
             # --------------------------
-            a = time.time()
+            metrics = JobMetrics()
             # --------------------------
             self.progress_message.emit(_('Extracting ebook content...'))
             try:
-                elements = extract_item(
-                    input_path, self.ebook.input_format, self.ebook.encoding,
-                    self.progress_detail.emit)
+                with metrics.phase('extract'):
+                    elements = extract_item(
+                        input_path, self.ebook.input_format,
+                        self.ebook.encoding, self.progress_detail.emit)
             except Exception:
                 self.progress_message.emit(
                     _('Failed to extract ebook content'))
@@ -123,26 +149,26 @@ class PreparationWorker(QObject):
                 self.clean_cache(cache)
                 return
             self.progress.emit(30)
-            b = time.time()
-            self.progress_detail.emit('extracting timing: %s' % (b - a))
             if self.canceled:
                 self.clean_cache(cache)
                 return
             # --------------------------
             self.progress_message.emit(_('Filtering ebook content...'))
-            original_group = element_handler.prepare_original(elements)
+            with metrics.phase('prepare'):
+                original_group = element_handler.prepare_original(elements)
             self.progress.emit(80)
-            c = time.time()
-            self.progress_detail.emit('filtering timing: %s' % (c - b))
             if self.canceled:
                 self.clean_cache(cache)
                 return
             # --------------------------
             self.progress_message.emit(_('Preparing user interface...'))
-            cache.save(original_group)
+            with metrics.phase('cache_save'):
+                cache.save(original_group)
+            cache.set_info('extraction_key', extraction_key)
+            cache.set_info(
+                'performance_report', json.dumps(metrics.get_report()))
             self.progress.emit(100)
-            d = time.time()
-            self.progress_detail.emit('cache timing: %s' % (d - c))
+            self.progress_detail.emit(metrics.get_phase_summary())
             if self.canceled:
                 self.clean_cache(cache)
                 return
@@ -160,20 +186,24 @@ class TranslationWorker(QObject):
     close = pyqtSignal(int)
     finished = pyqtSignal()
     translate = pyqtSignal(list, bool)
-    logging = pyqtSignal(str, bool)
     # error = pyqtSignal(str, str, str)
-    streaming = pyqtSignal(object)
-    callback = pyqtSignal(object)
 
     def __init__(self, engine_class, ebook):
         QObject.__init__(self)
         self.source_lang = ebook.source_lang
         self.target_lang = ebook.target_lang
         self.engine_class = engine_class
+        # Created along with the worker to stay in the GUI thread.
+        self.dispatcher = SignalDispatcher()
+        self.start.connect(self.dispatcher.start)
+        self.finished.connect(self.dispatcher.stop)
 
         self.on_working = False
         self.canceled = False
         self.need_close = False
+        # Follow the paragraphs of the cache, which may be merged even if
+        # merging is disabled, e.g. subtitle cues.
+        self.merge_enabled = None
         self.translate.connect(self.translate_paragraphs)
         # self.finished.connect(lambda: self.set_canceled(False))
 
@@ -189,6 +219,9 @@ class TranslationWorker(QObject):
     def set_canceled(self, canceled):
         self.canceled = canceled
 
+    def set_merge_enabled(self, enabled):
+        self.merge_enabled = enabled
+
     def cancel_request(self):
         return self.canceled
 
@@ -200,17 +233,21 @@ class TranslationWorker(QObject):
         """:fresh: retranslate all paragraphs."""
         self.on_working = True
         self.start.emit()
+        spans.set_enabled(get_config().get('instrumentation'))
+        spans.reset()
         translator = get_translator(self.engine_class)
         translator.set_source_lang(self.source_lang)
         translator.set_target_lang(self.target_lang)
+        if self.merge_enabled is not None:
+            translator.set_merge_enabled(self.merge_enabled)
         translation = get_translation(translator)
         translation.set_fresh(fresh)
-        translation.set_logging(
-            lambda text, error=False: self.logging.emit(text, error))
-        translation.set_streaming(self.streaming.emit)
-        translation.set_callback(self.callback.emit)
+        translation.set_logging(self.dispatcher.log)
+        translation.set_streaming(self.dispatcher.stream)
+        translation.set_callback(self.dispatcher.collect)
         translation.set_cancel_request(self.cancel_request)
         translation.handle(paragraphs)
+        self.dispatcher.log(translation.metrics.get_summary())
         self.on_working = False
         self.finished.emit()
         if self.need_close:
@@ -351,7 +388,7 @@ class CreateTranslationProject(QDialog):
 class AdvancedTranslation(QDialog):
     paragraph_sig = pyqtSignal(object)
     ebook_title = pyqtSignal()
-    progress_bar = pyqtSignal()
+    progress_bar = pyqtSignal(int)
     batch_translation = pyqtSignal()
 
     preparation_thread = QThread()
@@ -408,7 +445,7 @@ class AdvancedTranslation(QDialog):
             self.errors_text.clear()
         self.trans_worker.start.connect(working_status)
 
-        self.trans_worker.logging.connect(
+        self.trans_worker.dispatcher.logging.connect(
             lambda text, error: self.errors_text.appendPlainText(text)
             if error else self.logging_text.appendPlainText(text))
 
@@ -435,6 +472,7 @@ class AdvancedTranslation(QDialog):
         def prepare_table_layout(cache_id):
             self.cache = get_cache(cache_id)
             self.merge_enabled = int(self.cache.get_info('merge_length')) > 0
+            self.trans_worker.set_merge_enabled(self.merge_enabled)
             paragraphs = self.cache.all_paragraphs()
             if len(paragraphs) < 1:
                 self.alert.pop(
@@ -576,25 +614,42 @@ class AdvancedTranslation(QDialog):
                 self.table.hide_by_paragraphs(
                     self.table.translated_paragraphs())
 
+        def filter_by_text():
+            text = search_input.text()
+            if not text:
+                return
+            column = {
+                'original_code': 'raw',
+                'translation_text': 'translation',
+            }.get(content_types.currentData(), 'original')
+            self.table.show_by_ids(self.cache.search(text, column))
+
         def filter_by_category(index):
             reset_button.setVisible(index != 0)
             filter_table_items(index)
-            self.table.show_by_text(
-                search_input.text(), content_types.currentData())
+            filter_by_text()
         categories.currentIndexChanged.connect(filter_by_category)
 
         def filter_by_content_type(index):
             reset_button.setVisible(index != 0)
             filter_table_items(categories.currentIndex())
-            self.table.show_by_text(
-                search_input.text(), content_types.itemData(index))
+            filter_by_text()
         content_types.currentIndexChanged.connect(filter_by_content_type)
 
-        def filter_by_keyword(text):
-            reset_button.setVisible(text != '')
+        # Debounce the keyword filtering to avoid querying on each keystroke.
+        search_timer = QTimer(widget)
+        search_timer.setSingleShot(True)
+        search_timer.setInterval(300)
+
+        def filter_by_keyword():
             filter_table_items(categories.currentIndex())
-            self.table.show_by_text(text, content_types.currentData())
-        search_input.textChanged.connect(filter_by_keyword)
+            filter_by_text()
+        search_timer.timeout.connect(filter_by_keyword)
+
+        def change_keyword(text):
+            reset_button.setVisible(text != '')
+            search_timer.start()
+        search_input.textChanged.connect(change_keyword)
 
         def reset_filter_criteria():
             categories.setCurrentIndex(0)
@@ -627,8 +682,8 @@ class AdvancedTranslation(QDialog):
         progress_bar.setMaximum(100000000)
         progress_bar.setVisible(False)
 
-        def write_progress():
-            value = progress_bar.value() + self.progress_step
+        def write_progress(count):
+            value = progress_bar.value() + self.progress_step * count
             if value > progress_bar.maximum():
                 value = progress_bar.maximum()
             progress_bar.setValue(value)
@@ -665,7 +720,7 @@ class AdvancedTranslation(QDialog):
                 _('Total items: {}').format(total) + ' · '
                 + _('Character count: {}').format(parts))
         item_selection_changed()
-        self.table.itemSelectionChanged.connect(item_selection_changed)
+        self.table.selection_changed.connect(item_selection_changed)
 
         if self.merge_enabled:
             non_aligned_paragraph_count.setVisible(True)
@@ -732,17 +787,25 @@ class AdvancedTranslation(QDialog):
         delete_button.setDisabled(True)
         translate_selected.setDisabled(True)
 
+        batch_translators = {
+            ChatgptTranslate: ChatgptBatchTranslate,
+            ClaudeTranslate: ClaudeBatchTranslate,
+            GeminiTranslate: GeminiBatchTranslate,
+            AzureChatgptTranslate: AzureChatgptBatchTranslate,
+        }
+
         self.batch_translation.connect(
             lambda: batch_translation.setVisible(
-                self.current_engine == ChatgptTranslate))
+                self.current_engine in batch_translators))
         self.batch_translation.emit()
 
         def start_batch_translation():
             translator = get_translator(self.current_engine)
             translator.set_source_lang(self.ebook.source_lang)
             translator.set_target_lang(self.ebook.target_lang)
-            batch_translator = ChatgptBatchTranslate(translator)
-            batch = ChatgptBatchTranslationManager(
+            batch_translator = batch_translators[self.current_engine](
+                translator)
+            batch = BatchTranslationManager(
                 batch_translator, self.cache, self.table, self)
             batch.exec_()
         batch_translation.clicked.connect(start_batch_translation)
@@ -752,7 +815,7 @@ class AdvancedTranslation(QDialog):
             delete_button.setDisabled(disabled)
             translate_selected.setDisabled(disabled)
         item_selection_changed()
-        self.table.itemSelectionChanged.connect(item_selection_changed)
+        self.table.selection_changed.connect(item_selection_changed)
 
         def stop_translation():
             action = self.alert.ask(
@@ -901,7 +964,7 @@ class AdvancedTranslation(QDialog):
         output_format.currentTextChanged.connect(change_output_format)
 
         def output_ebook():
-            if len(self.table.findItems(_('Translated'), Qt.MatchExactly)) < 1:
+            if len(self.table.translated_paragraphs()) < 1:
                 self.alert.pop(_('The ebook has not been translated yet.'))
                 return
             if self.table.non_aligned_count > 0:
@@ -1002,8 +1065,8 @@ class AdvancedTranslation(QDialog):
             splitter, splitter.handle(1), QEvent.MouseButtonDblClick,
             auto_open_close_splitter)
 
-        self.table.itemDoubleClicked.connect(
-            lambda item: auto_open_close_splitter())
+        self.table.doubleClicked.connect(
+            lambda index: auto_open_close_splitter())
 
         control = QWidget()
         control_layout = QHBoxLayout(control)
@@ -1090,26 +1153,26 @@ class AdvancedTranslation(QDialog):
                 return
             self.paragraph_sig.emit(paragraph)
             self.table.row.emit(paragraph.row)
-        self.table.setCurrentItem(self.table.item(0, 0))
+        self.table.select_row(0)
         change_selected_item()
-        self.table.itemSelectionChanged.connect(change_selected_item)
+        self.table.selection_changed.connect(change_selected_item)
 
-        def translation_callback(paragraph):
-            self.table.row.emit(paragraph.row)
-            self.paragraph_sig.emit(paragraph)
-            self.cache.update_paragraph(paragraph)
-            self.progress_bar.emit()
-                
-        self.trans_worker.callback.connect(translation_callback)
+        def translation_callback(paragraphs):
+            for paragraph in paragraphs:
+                self.table.row.emit(paragraph.row)
+            self.paragraph_sig.emit(paragraphs[-1])
+            self.cache.update_paragraphs(paragraphs)
+            self.progress_bar.emit(len(paragraphs))
+        self.trans_worker.dispatcher.callback.connect(translation_callback)
 
         def streaming_translation(data):
             if data == '':
                 translation_text.clear()
             elif isinstance(data, Paragraph):
-                self.table.setCurrentItem(self.table.item(data.row, 0))
+                self.table.select_row(data.row)
             else:
                 translation_text.insertPlainText(data)
-        self.trans_worker.streaming.connect(streaming_translation)
+        self.trans_worker.dispatcher.streaming.connect(streaming_translation)
 
         def modify_translation():
             if self.trans_worker.on_working and \
@@ -1196,7 +1259,7 @@ class AdvancedTranslation(QDialog):
     def translate_selected_paragraph(self):
         paragraphs = self.table.get_selected_paragraphs()
         # Consider selecting all paragraphs as translating all.
-        if len(paragraphs) == self.table.rowCount():
+        if len(paragraphs) == self.table.row_count():
             self.translate_all_paragraphs()
         else:
             self.progress_step = self.get_progress_step(len(paragraphs))
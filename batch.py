@@ -213,7 +213,6 @@ class BatchTranslation(QDialog):
             return self.alert.pop(
                 _('The specified path does not exist.'), 'warning')
         ebooks = ebooks if isinstance(ebooks, list) else [ebooks]
-        for ebook in self.ebooks:
-            self.worker.translate_ebook(ebook, is_batch=True)
+        self.worker.schedule_ebooks(self.ebooks)
         self.ebooks.clear()
         self.done(0)
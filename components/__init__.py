@@ -7,4 +7,5 @@ from .table import AdvancedTranslationTable
 from .mode import ModeSelection
 from .indicator import StatusColor, TranslationStatus
 from .shortcut import set_shortcut
-from .chatgpt import ChatgptBatchTranslationManager
+from .batch import BatchTranslationManager
+from .dispatcher import SignalDispatcher
@@ -28,7 +28,7 @@ def request(func):
     return wrapper
 
 
-class ChatgptBatchTranslationWorker(QObject):
+class BatchTranslationWorker(QObject):
     enable_apply_button = pyqtSignal(bool)
     stack_index = pyqtSignal(int)
     process_tip = pyqtSignal(str)
@@ -37,24 +37,28 @@ class ChatgptBatchTranslationWorker(QObject):
     paragraph_sig = pyqtSignal(object)
     finished = pyqtSignal()
 
-    save_batch_id = pyqtSignal(str)
-    save_file_id = pyqtSignal(str)
-    remove_batch = pyqtSignal()
+    save_job = pyqtSignal(dict)
+    remove_jobs = pyqtSignal()
 
     create = pyqtSignal()
     check = pyqtSignal()
     cancel = pyqtSignal()
     apply = pyqtSignal()
 
+    # The number of times to resubmit the failed requests.
+    max_attempts = 2
+    pending_statuses = ('submitted', 'in_progress')
+    # The batches cancelled with the provider, which are not resubmitted.
+    cancelled_statuses = ('cancelled', 'canceled')
+    ended_statuses = ('completed', 'partial', 'failed', 'expired') \
+        + cancelled_statuses
+
     def __init__(self, batch_translator):
         QObject.__init__(self)
         self._batch_translator = batch_translator
 
         self._paragraphs = []
-        self._file_id = None
-        self._batch_id = None
-
-        self._batch_info = {}
+        self._jobs = []
 
         self.create.connect(self.create_batch)
         self.check.connect(self.check_details)
@@ -64,24 +68,32 @@ class ChatgptBatchTranslationWorker(QObject):
     def set_paragraphs(self, paragraphs):
         self._paragraphs = paragraphs
 
-    def set_batch_id(self, batch_id):
-        self._batch_id = batch_id
-
-    def set_file_id(self, file_id):
-        self._file_id = file_id
+    def set_jobs(self, jobs):
+        self._jobs = jobs
+
+    def _save_job(self, job, **kwargs):
+        job.update(kwargs)
+        self.save_job.emit(dict(job))
+
+    def _submit(self, paragraphs, attempt=0):
+        """Split the paragraphs to respect the limits of the provider and
+        submit a batch for each group.
+        """
+        for group in self._batch_translator.split(paragraphs):
+            job = self._batch_translator.submit([line for p, line in group])
+            job.update(
+                status='submitted', output=None, attempt=attempt,
+                custom_ids=[paragraph.md5 for paragraph, line in group])
+            log.info('A batch translation was created: %s' % job['batch_id'])
+            self._jobs.append(job)
+            self._save_job(job)
 
     @pyqtSlot()
     @request
     def create_batch(self):
         self.process_tip.emit(_('processing...'))
         self.stack_index.emit(1)
-        if self._file_id is None:
-            self._file_id = self._batch_translator.upload(self._paragraphs)
-            log.info('A new file was uploaded: %s' % self._file_id)
-            self.save_file_id.emit(self._file_id)
-        self._batch_id = self._batch_translator.create(self._file_id)
-        log.info('A batch translation was created: %s' % self._batch_id)
-        self.save_batch_id.emit(self._batch_id)
+        self._submit(self._paragraphs)
         self.check.emit()
 
     @pyqtSlot()
@@ -89,11 +101,34 @@ class ChatgptBatchTranslationWorker(QObject):
     def check_details(self):
         self.process_tip.emit(_('checking...'))
         self.stack_index.emit(1)
-        log.info('Checking the batch translation: %s' % self._batch_id)
-        self._batch_info = self._batch_translator.check(self._batch_id)
-        if self._batch_info.get('status') == 'completed':
-            self.enable_apply_button.emit(True)
-        self.trans_details.emit(self._batch_info)
+        request_counts = {'total': 0, 'completed': 0, 'failed': 0}
+        errors = []
+        for job in self._jobs:
+            if job['status'] not in self.pending_statuses + self.ended_statuses:
+                continue
+            log.info('Checking the batch translation: %s' % job['batch_id'])
+            details = self._batch_translator.status(job['batch_id'])
+            status = details.get('status')
+            if status == 'completed' and \
+                    details['request_counts'].get('failed'):
+                status = 'partial'
+            self._save_job(job, status=status, output=details.get('output'))
+            for name in request_counts:
+                request_counts[name] += details['request_counts'].get(name, 0)
+            details.get('errors') and errors.append(details.get('errors'))
+        statuses = [job['status'] for job in self._jobs]
+        pending = any(status in self.pending_statuses for status in statuses)
+        ended = [
+            status for status in statuses if status in self.ended_statuses]
+        cancelled = len(ended) > 0 and all(
+            status in self.cancelled_statuses for status in ended)
+        self.enable_apply_button.emit(len(ended) > 0 and not pending)
+        self.trans_details.emit({
+            'status': 'in_progress' if pending else (
+                'cancelled' if cancelled else 'completed'),
+            'request_counts': request_counts,
+            'errors': errors or None,
+            'jobs': [(job['batch_id'], job['status']) for job in self._jobs]})
         self.stack_index.emit(2)
 
     @pyqtSlot()
@@ -101,12 +136,11 @@ class ChatgptBatchTranslationWorker(QObject):
     def cancel_batch(self):
         self.process_tip.emit(_('canceling...'))
         self.stack_index.emit(1)
-        self._batch_info = self._batch_translator.check(self._batch_id)
-        if self._batch_info.get('status') not in (
-                'cancelling', 'cancelled', 'completed', 'failed'):
-            self._batch_translator.cancel(self._batch_id)
-            self._batch_translator.delete(self._file_id)
-        self.remove_batch.emit()
+        for job in self._jobs:
+            if job['status'] in self.pending_statuses:
+                self._batch_translator.cancel(job['batch_id'])
+            job['status'] != 'applied' and self._batch_translator.clean(job)
+        self.remove_jobs.emit()
         self.finished.emit()
 
     @pyqtSlot()
@@ -116,34 +150,61 @@ class ChatgptBatchTranslationWorker(QObject):
         self.process_tip.emit(_('applying...'))
         self.stack_index.emit(1)
         translator = self._batch_translator.translator
-        output_file_id = self._batch_info.get('output_file_id')
-        translations = self._batch_translator.retrieve(output_file_id)
-        for paragraph in self._paragraphs:
-            if paragraph.md5 not in translations.keys():
+        paragraphs = {paragraph.md5: paragraph for paragraph in self._paragraphs}
+        retries = []
+        for job in self._jobs:
+            if job['status'] not in self.ended_statuses:
                 continue
-            paragraph.translation = translations.get(paragraph.md5)
-            paragraph.engine_name = translator.name
-            paragraph.target_lang = translator.get_target_lang()
-            self.paragraph_sig.emit(paragraph)
+            succeeded = set()
+            if job['status'] in ('completed', 'partial'):
+                for custom_id, translation in \
+                        self._batch_translator.results(job):
+                    succeeded.add(custom_id)
+                    paragraph = paragraphs.get(custom_id)
+                    if paragraph is None:
+                        continue
+                    paragraph.translation = translation
+                    paragraph.engine_name = translator.name
+                    paragraph.target_lang = translator.get_target_lang()
+                    self.paragraph_sig.emit(paragraph)
+            cancelled = job['status'] in self.cancelled_statuses
+            self._batch_translator.clean(job)
+            self._save_job(job, status='applied')
+            if cancelled:
+                continue
+            failures = [
+                paragraphs[custom_id] for custom_id in job['custom_ids']
+                if custom_id not in succeeded and custom_id in paragraphs]
+            if len(failures) > 0 and job['attempt'] < self.max_attempts:
+                retries.append((failures, job['attempt'] + 1))
+        for failures, attempt in retries:
+            log.info('Resubmitting %d failed request(s).' % len(failures))
+            self._submit(failures, attempt)
+        if len(retries) > 0:
+            self.check.emit()
+            return
+        self.remove_jobs.emit()
         self.finished.emit()
 
 
-class ChatgptBatchTranslationManager(QDialog):
+class BatchTranslationManager(QDialog):
     batch_thread = QThread()
 
     def __init__(self, translator, cache, table, parent=None):
         QDialog.__init__(self, parent=parent)
-        self.setWindowTitle(_('ChatGPT Batch Translation'))
+        self.setWindowTitle('%s - %s' % (
+            _('Batch Translation'), translator.translator.alias))
         self.setMinimumWidth(500)
         self.setMinimumHeight(300)
         # self.setModal(True)
 
         self.cache = cache
         self.table = table
+        self.translator = translator
 
         self.alert = AlertMessage(self)
 
-        self.batch_worker = ChatgptBatchTranslationWorker(translator)
+        self.batch_worker = BatchTranslationWorker(translator)
         self.batch_worker.moveToThread(self.batch_thread)
         self.batch_thread.finished.connect(self.batch_worker.deleteLater)
         self.batch_thread.start()
@@ -157,55 +218,58 @@ class ChatgptBatchTranslationManager(QDialog):
 
         self.batch_worker.stack_index.connect(self.stack.setCurrentIndex)
 
-        self.batch_id = self.cache.get_info('chatgpt_batch_id')
-        self.file_id = self.cache.get_info('chatgpt_file_id')
+        self.provider = translator.cache_key
+        self.migrate_batch()
+        self.jobs = self.cache.get_batch_jobs(self.provider)
 
-        log.info('Initialized batch id: %s' % self.batch_id)
-        log.info('Initialized file id: %s' % self.file_id)
+        log.info('Initialized batch jobs: %s' % len(self.jobs))
 
         self.batch_worker.set_paragraphs(
             self.table.get_selected_paragraphs(True, True))
-        self.batch_worker.set_batch_id(self.batch_id)
-        self.batch_worker.set_file_id(self.file_id)
-
-        def set_batch_id(batch_id):
-            self.batch_id = batch_id
-            self.cache.set_info('chatgpt_batch_id', batch_id)
-            log.info('A new batch id was stored: %s' % batch_id)
-        self.batch_worker.save_batch_id.connect(set_batch_id)
-
-        def set_file_id(file_id):
-            self.file_id = file_id
-            self.cache.set_info('chatgpt_file_id', file_id)
-            log.info('A new file id was stored: %s' % file_id)
-        self.batch_worker.save_file_id.connect(set_file_id)
-
-        def remove_batch():
-            self.file_id = None
-            self.cache.del_info('chatgpt_batch_id')
-            self.cache.del_info('chatgpt_file_id')
-            log.info('The batch information was deleted.')
-        self.batch_worker.remove_batch.connect(remove_batch)
+        self.batch_worker.set_jobs(self.jobs)
+
+        def save_job(job):
+            self.cache.save_batch_job(self.provider, job)
+            log.info('The batch job was stored: %s' % job['batch_id'])
+        self.batch_worker.save_job.connect(save_job)
+
+        def remove_jobs():
+            self.cache.del_batch_jobs(self.provider)
+            log.info('The batch jobs were deleted.')
+        self.batch_worker.remove_jobs.connect(remove_jobs)
 
         def apply_paragraph(paragraph):
             self.table.row.emit(paragraph.row)
             self.cache.update_paragraph(paragraph)
         self.batch_worker.paragraph_sig.connect(apply_paragraph)
 
-        if self.batch_id is not None:
+        if len(self.jobs) > 0:
             self.batch_worker.check.emit()
 
         self.batch_worker.finished.connect(lambda: self.done(0))
 
+    def migrate_batch(self):
+        """Convert the batch stored by an earlier version into a job."""
+        batch_key = '%s_batch_id' % self.provider
+        file_key = '%s_file_id' % self.provider
+        batch_id = self.cache.get_info(batch_key)
+        if batch_id is not None:
+            self.cache.save_batch_job(self.provider, {
+                'batch_id': batch_id, 'status': 'submitted',
+                'file_id': self.cache.get_info(file_key)})
+        self.cache.del_info(batch_key)
+        self.cache.del_info(file_key)
+
     def layout_create(self):
         title = QLabel(_('Create a new batch translation'))
         title.setStyleSheet('font-size:16px;font-weight:bold;')
         message = QLabel(_(
-            'All original content must be uploaded to OpenAI for batch '
+            'All original content must be uploaded to {} for batch '
             'translation, and you will need to wait up to 24 hours to '
-            'continue the translation process.'
-            '<a href="https://cookbook.openai.com/examples/batch_processing">'
-            'more details</a>'))
+            'continue the translation process.').format(
+                self.translator.provider)
+            + '<a href="%s">%s</a>' % (
+                self.translator.document_url, _('more details')))
         message.setWordWrap(True)
         message.setOpenExternalLinks(True)
         button = QPushButton('Create Batch Translation')
@@ -288,12 +352,12 @@ class ChatgptBatchTranslationManager(QDialog):
             detail.clear()
             batch_status = data.get('status')
             status.setText(str(batch_status))
-            if batch_status == 'completed':
-                request_counts = data.get('request_counts')
-                detail.appendPlainText(str(request_counts))
-            else:
-                error_info = data.get('errors')
-                detail.appendPlainText(str(error_info))
+            request_counts = data.get('request_counts')
+            detail.appendPlainText(str(request_counts))
+            error_info = data.get('errors')
+            error_info and detail.appendPlainText(str(error_info))
+            for batch_id, job_status in data.get('jobs', []):
+                detail.appendPlainText('%s: %s' % (batch_id, job_status))
         self.batch_worker.trans_details.connect(set_details_data)
 
         widget = QGroupBox(_('Batch translation details'))
@@ -0,0 +1,69 @@
+from threading import Lock
+
+from qt.core import QObject, QTimer, pyqtSignal
+
+
+class SignalDispatcher(QObject):
+    """Collect the updates reported by a worker thread and deliver them to the
+    GUI thread in frames, so the cost of refreshing the interface does not
+    grow with the translation throughput. The dispatcher must be created in
+    the GUI thread, while the collecting methods can be called from any
+    thread.
+    """
+    logging = pyqtSignal(str, bool)
+    streaming = pyqtSignal(object)
+    callback = pyqtSignal(list)
+
+    def __init__(self, interval=33):
+        QObject.__init__(self)
+        self._lock = Lock()
+        self._logs = []
+        self._errors = []
+        self._streams = []
+        self._paragraphs = []
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.flush()
+
+    def log(self, text, error=False):
+        with self._lock:
+            (self._errors if error else self._logs).append(text)
+
+    def stream(self, data):
+        with self._lock:
+            streams = self._streams
+            if data == '':
+                # Clearing the editor discards anything pending before it.
+                streams[:] = ['']
+            elif len(streams) > 0 and type(streams[-1]) is type(data) \
+                    and streams[-1] != '':
+                # Join the text chunks, and only keep the latest paragraph
+                # to be selected.
+                streams[-1] = streams[-1] + data if isinstance(data, str) \
+                    else data
+            else:
+                streams.append(data)
+
+    def collect(self, paragraph):
+        with self._lock:
+            self._paragraphs.append(paragraph)
+
+    def flush(self):
+        with self._lock:
+            logs, self._logs = self._logs, []
+            errors, self._errors = self._errors, []
+            streams, self._streams = self._streams, []
+            paragraphs, self._paragraphs = self._paragraphs, []
+        logs and self.logging.emit('\n'.join(logs), False)
+        errors and self.logging.emit('\n'.join(errors), True)
+        for data in streams:
+            self.streaming.emit(data)
+        paragraphs and self.callback.emit(paragraphs)
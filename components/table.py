@@ -1,7 +1,7 @@
 from qt.core import (
-    Qt, QTableWidget, QHeaderView, QMenu, QAbstractItemView, QCursor,
-    QBrush, QTableWidgetItem, pyqtSignal, QTableWidgetSelectionRange,
-    QColor, QPalette, QT_VERSION_STR)
+    Qt, QTableView, QHeaderView, QMenu, QAbstractItemView, QCursor, QBrush,
+    pyqtSignal, QColor, QPalette, QAbstractTableModel, QModelIndex,
+    QItemSelection, QItemSelectionModel)
 
 from ..lib.utils import group
 from ..lib.translation import get_engine_class
@@ -12,141 +12,213 @@ from .alert import AlertMessage
 load_translations()
 
 
-class AdvancedTranslationTable(QTableWidget):
+class AdvancedTranslationModel(QAbstractTableModel):
+    """Render the paragraphs on demand instead of creating items for each of
+    them up front. The status and alignment of a row are only computed when
+    the row is requested, and cached until the row is refreshed.
+    """
+    def __init__(self, paragraphs, merge_enabled, light_theme, parent=None):
+        QAbstractTableModel.__init__(self, parent)
+        self.paragraphs = paragraphs
+        self.merge_enabled = merge_enabled
+        self.light_theme = light_theme
+        self.headers = [
+            _('Original'), _('Engine'), _('Language'), _('Status')]
+
+        self._separators = {}
+        self._alignments = {}
+        self._non_aligned_count = None
+
+        for row, paragraph in enumerate(self.paragraphs):
+            paragraph.row = row
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paragraphs)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def flags(self, index):
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+
+    def _separator(self, engine_name):
+        """Resolving an engine class loads the configuration, so only do it
+        once for each engine.
+        """
+        if engine_name not in self._separators:
+            engine = get_engine_class(engine_name)
+            self._separators[engine_name] = \
+                None if engine is None else engine.separator
+        return self._separators[engine_name]
+
+    def is_aligned(self, paragraph):
+        if not self.merge_enabled or not paragraph.translation:
+            return True
+        aligned = self._alignments.get(paragraph.id)
+        if aligned is None:
+            separator = self._separator(paragraph.engine_name)
+            aligned = separator is None or paragraph.is_alignment(separator)
+            self._alignments[paragraph.id] = aligned
+            paragraph.aligned = aligned
+        return aligned
+
+    @property
+    def non_aligned_count(self):
+        if self._non_aligned_count is None:
+            self._non_aligned_count = len(
+                [p for p in self.paragraphs if not self.is_aligned(p)])
+        return self._non_aligned_count
+
+    def _status(self, paragraph):
+        if not paragraph.translation:
+            return 'error' if paragraph.error is not None else None
+        return None if self.is_aligned(paragraph) else 'non_aligned'
+
+    def _status_tip(self, status, paragraph):
+        if status == 'error':
+            return paragraph.error
+        if status == 'non_aligned':
+            return _(
+                'The number of lines differs between the original text and '
+                'the translated text.')
+        return None
+
+    def _texts(self, paragraph):
+        original = paragraph.original.replace('\n', ' ')
+        if paragraph.translation:
+            return [
+                original, paragraph.engine_name, paragraph.target_lang,
+                _('Translated')]
+        return [original, '--', '--', _('Untranslated')]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        paragraph = self.paragraphs[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            return self._texts(paragraph)[column]
+        if role == Qt.ToolTipRole:
+            tip = self._status_tip(self._status(paragraph), paragraph)
+            if column == 3 and tip:
+                return tip
+            return self._texts(paragraph)[column]
+        if role == Qt.TextAlignmentRole and column > 0:
+            return Qt.AlignCenter
+        if role == Qt.BackgroundRole:
+            status = self._status(paragraph)
+            if status == 'error':
+                return QBrush(QColor(255, 0, 0, 100))
+            if status == 'non_aligned':
+                return QBrush(QColor(255, 255, 0, 100))
+        if role == Qt.UserRole:
+            return paragraph
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal:
+            if role == Qt.DisplayRole:
+                return self.headers[section]
+            return None
+        if section >= len(self.paragraphs):
+            return None
+        if role == Qt.DisplayRole:
+            return str(section)
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        status = self._status(self.paragraphs[section])
+        if status is None:
+            return None
+        if role == Qt.BackgroundRole:
+            if status == 'error':
+                return QBrush(
+                    QColor(255, 100, 100) if self.light_theme else
+                    QColor(100, 0, 0))
+            return QBrush(
+                QColor(255, 255, 100) if self.light_theme else
+                QColor(100, 100, 0))
+        if role == Qt.ForegroundRole:
+            return QBrush(Qt.black if self.light_theme else Qt.white)
+        if role == Qt.ToolTipRole:
+            return self._status_tip(status, self.paragraphs[section])
+        return None
+
+    def refresh_row(self, row):
+        """Recheck the alignment of the row after its translation changed and
+        notify the view to repaint it.
+        """
+        paragraph = self.paragraphs[row]
+        before_aligned = self._alignments.pop(paragraph.id, True)
+        paragraph.aligned = True
+        aligned = self.is_aligned(paragraph)
+        if self._non_aligned_count is not None:
+            # If the alignment of before and after is the same, do nothing.
+            if before_aligned and not aligned:
+                self._non_aligned_count += 1
+            elif not before_aligned and aligned:
+                self._non_aligned_count -= 1
+        self.dataChanged.emit(
+            self.index(row, 0), self.index(row, self.columnCount() - 1))
+        self.headerDataChanged.emit(Qt.Vertical, row, row)
+
+    def remove_paragraphs(self, paragraphs):
+        rows = [paragraph.row for paragraph in paragraphs]
+        for first, last in reversed(group(rows)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for paragraph in self.paragraphs[first:last + 1]:
+                aligned = self._alignments.pop(paragraph.id, True)
+                if self._non_aligned_count is not None and not aligned:
+                    self._non_aligned_count -= 1
+            del self.paragraphs[first:last + 1]
+            self.endRemoveRows()
+        for row, paragraph in enumerate(self.paragraphs[min(rows):]):
+            paragraph.row = min(rows) + row
+
+
+class AdvancedTranslationTable(QTableView):
     row = pyqtSignal(int)
+    selection_changed = pyqtSignal()
 
     def __init__(self, parent, paragraphs):
-        QTableWidget.__init__(self, parent)
+        QTableView.__init__(self, parent)
         self.parent = parent
         self.paragraphs = paragraphs
 
-        self.non_aligned_count = 0
         # self.setFocusPolicy(Qt.NoFocus)
         self.alert = AlertMessage(self)
         self.layout()
 
         self.row.connect(self.track_row_data)
 
+    @property
+    def non_aligned_count(self):
+        return self.model().non_aligned_count
+
     def layout(self):
-        self.setRowCount(len(self.paragraphs))
-        self.setColumnCount(4)
-        self.setHorizontalHeaderLabels(
-            [_('Original'), _('Engine'), _('Language'), _('Status')])
+        model = AdvancedTranslationModel(
+            self.paragraphs, self.parent.merge_enabled,
+            self._is_light_theme(), self)
+        self.setModel(model)
+        self.selectionModel().selectionChanged.connect(
+            lambda selected, deselected: self.selection_changed.emit())
+
         self.verticalHeader().setMinimumWidth(28)
         self.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.setAlternatingRowColors(True)
-
-        # self.setVerticalHeaderLabels(
-        #     map(str, range(1, len(self.paragraphs) + 1)))
-        # self.verticalHeader().setStyleSheet(
-        #     "QHeaderView::section{background-color:red}")
-
-        for row, paragraph in enumerate(self.paragraphs):
-            paragraph.row = row
-
-            vheader = QTableWidgetItem(str(row))
-            vheader.setTextAlignment(Qt.AlignCenter)
-            self.setVerticalHeaderItem(row, vheader)
-
-            original = QTableWidgetItem()
-            original.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-            original.setData(Qt.UserRole, paragraph)
-            engine_name = QTableWidgetItem()
-            engine_name.setTextAlignment(Qt.AlignCenter)
-            traget_lang = QTableWidgetItem()
-            traget_lang.setTextAlignment(Qt.AlignCenter)
-            status = QTableWidgetItem()
-            status.setTextAlignment(Qt.AlignCenter)
-            self.setItem(row, 0, original)
-            self.setItem(row, 1, engine_name)
-            self.setItem(row, 2, traget_lang)
-            self.setItem(row, 3, status)
-
-            self.track_row_data(row)
+        # Avoid measuring every row, which is expensive on large books.
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
 
         header = self.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
 
     def track_row_data(self, row):
-        paragraph = self.paragraph(row)
-        original = paragraph.original.replace('\n', ' ')
-        engine_name = paragraph.engine_name
-        target_lang = paragraph.target_lang
-        items = [original, '--', '--', _('Untranslated')]
-        if paragraph.translation:
-            before_aligned = paragraph.aligned
-            self.parent.merge_enabled and self.check_line_alignment(paragraph)
-            # If the alignment of before and after is the same, do nothing.
-            if before_aligned and not paragraph.aligned:
-                self.non_aligned_count += 1
-            elif not before_aligned and paragraph.aligned:
-                self.non_aligned_count -= 1
-            items = [original, engine_name, target_lang, _('Translated')]
-        else:
-            self.check_translation_error(paragraph)
-        for column, text in enumerate(items):
-            item = self.item(row, column)
-            item.setText(text)
-            item.setToolTip(text)
+        if 0 <= row < self.row_count():
+            self.model().refresh_row(row)
 
     def _is_light_theme(self):
         return self.palette().color(QPalette.Window).lightness() > 127
 
-    def _normal_row_background_color(self):
-        vh_background = vh_foreground = background = QBrush(Qt.NoBrush)
-        if QT_VERSION_STR < '6.0.0':
-            vh_background = QBrush(QColor(235, 235, 235, 255))
-            vh_foreground = QBrush(Qt.black)
-        return (vh_background, vh_foreground, background)
-
-    def check_translation_error(self, paragraph):
-        if paragraph.error is not None:
-            vh_bg = QBrush(
-                QColor(255, 100, 100) if self._is_light_theme() else
-                QColor(100, 0, 0))
-            vh_fg = QBrush(
-                Qt.black if self._is_light_theme() else Qt.white)
-            bg = QBrush(QColor(255, 0, 0, 100))
-            tip = paragraph.error
-        else:
-            (vh_bg, vh_fg, bg), tip = self._normal_row_background_color(), ''
-        self.set_row_background_color(paragraph.row, vh_bg, vh_fg, bg, tip)
-
-    def check_line_alignment(self, paragraph):
-        """The header item exhibits a peculiar behavior where setting the
-        background color with an alpha value visually has no effect. Emulating
-        a native background for PyQt versions lower than 6.0.0, as using
-        Qt.NoBrush results in a fully black background.
-        """
-        engine = get_engine_class(paragraph.engine_name)
-        if engine is None or paragraph.is_alignment(engine.separator):
-            (vh_bg, vh_fg, bg), tip = self._normal_row_background_color(), ''
-            paragraph.aligned = True
-        else:
-            vh_bg = QBrush(
-                QColor(255, 255, 100) if self._is_light_theme() else
-                QColor(100, 100, 0))
-            vh_fg = QBrush(
-                Qt.black if self._is_light_theme() else Qt.white)
-            bg = QBrush(QColor(255, 255, 0, 100))
-            tip = _(
-                'The number of lines differs between the original text and '
-                'the translated text.')
-            paragraph.aligned = False
-        self.set_row_background_color(paragraph.row, vh_bg, vh_fg, bg, tip)
-
-    def set_row_background_color(
-            self, row, vh_background, vh_foreground, background, tip):
-        item = self.verticalHeaderItem(row)
-        item.setBackground(vh_background)
-        item.setForeground(vh_foreground)
-        item.setToolTip(tip)
-        for column in range(self.columnCount()):
-            item = self.item(row, column)
-            item.setBackground(background)
-        item.setToolTip(tip)
-
     def contextMenuEvent(self, event):
         if self.parent.trans_worker.on_working:
             return
@@ -175,21 +247,29 @@ class AdvancedTranslationTable(QTableWidget):
     def keyPressEvent(self, event):
         if event.key() in (Qt.Key_Backspace, Qt.Key_Backtab, Qt.Key_Delete):
             self.delete_selected_rows()
-        QTableWidget.keyPressEvent(self, event)
+        QTableView.keyPressEvent(self, event)
+
+    def row_count(self):
+        return self.model().rowCount()
 
     def paragraph(self, row):
-        item = self.item(row, 0)
-        return item.data(Qt.UserRole)
+        if 0 <= row < self.row_count():
+            return self.paragraphs[row]
+        return None
+
+    def select_row(self, row):
+        if 0 <= row < self.row_count():
+            self.setCurrentIndex(self.model().index(row, 0))
 
     def current_paragraph(self):
         items = self.get_selected_paragraphs()
         return items[0] if len(items) > 0 else None
 
     def non_aligned_paragraphs(self):
-        return [p for p in self.paragraphs if not p.aligned]
+        return [p for p in self.paragraphs if not self.model().is_aligned(p)]
 
     def aligned_paragraphs(self):
-        return [p for p in self.paragraphs if p.aligned]
+        return [p for p in self.paragraphs if self.model().is_aligned(p)]
 
     def untranslated_paragraphs(self):
         return [p for p in self.paragraphs if not p.translation]
@@ -198,18 +278,15 @@ class AdvancedTranslationTable(QTableWidget):
         return [p for p in self.paragraphs if p.translation]
 
     def get_selected_rows(self):
-        rows = []
-        for item_range in self.selectedRanges():
-            rows.extend(list(range(
-                item_range.topRow(), item_range.bottomRow() + 1)))
+        rows = [index.row() for index in self.selectionModel().selectedRows()]
         return sorted(rows)
 
     def selected_count(self):
-        return len(self.get_selected_rows())
+        return len(self.selectionModel().selectedRows())
 
     def get_selected_paragraphs(self, ignore_done=False, select_all=False):
         items = []
-        rows = range(self.rowCount()) if select_all else \
+        rows = range(self.row_count()) if select_all else \
             self.get_selected_rows()
         for row in rows:
             paragraph = self.paragraph(row)
@@ -226,25 +303,17 @@ class AdvancedTranslationTable(QTableWidget):
             self.hideRow(paragraph.row)
 
     def show_all_rows(self):
-        for row in range(self.rowCount()):
+        for row in range(self.row_count()):
             self.showRow(row)
 
-    def show_by_text(self, text, content_type):
-        if not text:
-            return
+    def show_by_ids(self, ids):
+        """Hide the visible rows whose paragraph id is not in the given ids."""
         paragraphs = []
-        for row in range(self.rowCount()):
+        for row in range(self.row_count()):
             if self.isRowHidden(row):
                 continue
             paragraph = self.paragraph(row)
-            if content_type == 'original_code':
-                content = paragraph.raw.lower()
-            elif content_type == 'translation_text':
-                content = '' if paragraph.translation is None else \
-                    paragraph.translation.lower()
-            else:
-                content = paragraph.original.lower()
-            if text.lower() not in content:
+            if paragraph.id not in ids:
                 paragraphs.append(paragraph)
         self.hide_by_paragraphs(paragraphs)
 
@@ -252,16 +321,28 @@ class AdvancedTranslationTable(QTableWidget):
         paragraphs = self.get_selected_paragraphs()
         if len(paragraphs) < 1:
             return
-        if self.rowCount() == len(paragraphs):
+        if self.row_count() == len(paragraphs):
             return self.alert.pop(_('Retain at least one row.'), 'warning')
-        self.setCurrentItem(
-            self.item(paragraphs[-1].row + 1, 0) or
-            self.item(paragraphs[0].row - 1, 0) or
-            self.item(paragraphs[-1].row - 1, 0))
-        for paragraph in reversed(paragraphs):
-            self.removeRow(paragraph.row)
+        rows = [paragraph.row for paragraph in paragraphs]
+        current = next(
+            (row for row in (rows[-1] + 1, rows[0] - 1, rows[-1] - 1)
+             if 0 <= row < self.row_count() and row not in rows), None)
+        current = None if current is None else self.paragraph(current)
+        self.model().remove_paragraphs(paragraphs)
+        current is not None and self.select_row(current.row)
         self.parent.cache.ignore_paragraphs(paragraphs)
 
+    def _select_rows(self, rows):
+        model = self.model()
+        selection = QItemSelection()
+        for bottom, top in group(rows):
+            selection.select(
+                model.index(bottom, 0),
+                model.index(top, model.columnCount() - 1))
+        self.selectionModel().select(
+            selection, QItemSelectionModel.SelectionFlag.Select
+            | QItemSelectionModel.SelectionFlag.Rows)
+
     def select_by_attribute(self, name, value):
         rows = []
         paragraphs = self.get_selected_paragraphs(False, True)
@@ -269,9 +350,7 @@ class AdvancedTranslationTable(QTableWidget):
             attributes = paragraph.get_attributes()
             if attributes.get(name) == value:
                 rows.append(paragraph.row)
-        for bottom, top in group(rows):
-            self.setRangeSelected(
-                QTableWidgetSelectionRange(bottom, 0, top, 3), True)
+        rows and self._select_rows(rows)
 
     def select_by_page(self, page):
         rows = []
@@ -279,6 +358,4 @@ class AdvancedTranslationTable(QTableWidget):
         for paragraph in paragraphs:
             if paragraph.page == page:
                 rows.append(paragraph.row)
-        for bottom, top in group(rows):
-            self.setRangeSelected(
-                QTableWidgetSelectionRange(bottom, 0, top, 3), True)
+        rows and self._select_rows(rows)
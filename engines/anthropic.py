@@ -9,6 +9,7 @@ from .. import EbookTranslator
 from ..lib.utils import request
 
 from .genai import GenAI
+from .batch import BatchTranslate
 from .languages import anthropic
 from .prompt_extensions import anthropic as anthropic_prompt_extension
 
@@ -92,6 +93,9 @@ class ClaudeTranslate(GenAI):
         if self.merge_enabled:
             prompt += (' Ensure that placeholders matching the pattern '
                        '{{id_\\d+}} in the content are retained.')
+        # Claude has no JSON mode, so the format relies on the prompt.
+        if self.is_structured():
+            prompt += ' ' + self.structured_prompt
         return prompt
 
     def get_models(self):
@@ -118,13 +122,33 @@ class ClaudeTranslate(GenAI):
 
         return headers
 
+    def _get_system(self):
+        """Mark the system prompt as a cache breakpoint, so the requests
+        after the first one read it from the cache. Prompts shorter than the
+        minimum cacheable length of the model are processed as usual.
+        https://docs.anthropic.com/en/docs/build-with-claude/prompt-caching
+        """
+        prompt = self._get_prompt()
+        if not self.prompt_caching:
+            return prompt
+        return [{
+            'type': 'text', 'text': prompt,
+            'cache_control': {'type': 'ephemeral'}}]
+
+    def _record_usage(self, usage):
+        cached_tokens = usage.get('cache_read_input_tokens') or 0
+        input_tokens = (usage.get('input_tokens') or 0) + cached_tokens \
+            + (usage.get('cache_creation_input_tokens') or 0)
+        self.record_prompt_cache(input_tokens, cached_tokens)
+        self.record_tokens(input_tokens, usage.get('output_tokens') or 0)
+
     def get_body(self, text):
         body = {
             'stream': self.stream,
             'max_tokens': 4096,
             'model': self.model,
             'top_k': self.top_k,
-            'system': self._get_prompt(),
+            'system': self._get_system(),
             'messages': [{'role': 'user', 'content': text}]
         }
         sampling_value = getattr(self, self.sampling)
@@ -137,6 +161,7 @@ class ClaudeTranslate(GenAI):
             return self._parse_stream(response)
 
         response_json = json.loads(response)
+        self._record_usage(response_json.get('usage') or {})
         response_content_text: str = response_json['content'][0]['text']
         return response_content_text
 
@@ -162,6 +187,8 @@ class ClaudeTranslate(GenAI):
 
                 if event_type == 'message_stop':
                     break
+                elif event_type == 'message_start':
+                    self._record_usage(chunk['message'].get('usage') or {})
                 elif event_type == 'content_block_delta':
                     delta = chunk.get('delta')
                     if delta is not None:
@@ -172,11 +199,86 @@ class ClaudeTranslate(GenAI):
                         .format(chunk['error']['message']))
 
 
-class ClaudeBatchTranslate:
-    """TODO: use the message batches api (currently only the streaming api can
-    be used). The message batches api allows sending any number of batches of
-    up to 100,000 messages per batch. Batches are processed asynchronously with
+class ClaudeBatchTranslate(BatchTranslate):
+    """The message batches api allows sending any number of batches of up to
+    100,000 messages per batch. Batches are processed asynchronously with
     results returned as soon as the batch is complete and cost 50% less than
     standard API calls (more info here:
-    https://docs.anthropic.com/en/docs/build-with-claude/message-batches)
+    https://docs.anthropic.com/en/docs/build-with-claude/batch-processing)
     """
+    provider = 'Anthropic'
+    cache_key = 'claude'
+    document_url = ('https://docs.anthropic.com/en/docs/build-with-claude/'
+                    'batch-processing')
+
+    max_requests = 100000
+    max_bytes = 256 * 1024 * 1024
+
+    def __init__(self, translator):
+        BatchTranslate.__init__(self, translator)
+        self.batch_endpoint = '%s/batches' % \
+            self.translator.endpoint.rstrip('/')
+
+    def get_line(self, paragraph):
+        params = json.loads(self.translator.get_body(paragraph.original))
+        params.pop('stream', None)
+        return json.dumps({'custom_id': paragraph.md5, 'params': params})
+
+    def submit(self, lines):
+        """The requests are sent inline, so there is no file to upload.
+        https://docs.anthropic.com/en/api/creating-message-batches
+        """
+        body = '{"requests": [%s]}' % ', '.join(lines)
+        response = request(
+            self.batch_endpoint, body, self.translator.get_headers(), 'POST',
+            proxy_uri=self.translator.proxy_uri)
+        return {'batch_id': json.loads(response).get('id'), 'file_id': None}
+
+    def status(self, batch_id):
+        """https://docs.anthropic.com/en/api/retrieving-message-batches"""
+        response = request(
+            '%s/%s' % (self.batch_endpoint, batch_id),
+            headers=self.translator.get_headers(),
+            proxy_uri=self.translator.proxy_uri)
+        details = json.loads(response)
+        counts = details.get('request_counts', {})
+        ended = details.get('processing_status') == 'ended'
+        return {
+            'status': 'completed' if ended else 'in_progress',
+            'request_counts': {
+                'total': sum(counts.values()),
+                'completed': counts.get('succeeded', 0),
+                'failed': sum(counts.get(name, 0) for name in (
+                    'errored', 'canceled', 'expired'))},
+            'errors': None,
+            'output': batch_id}
+
+    def results(self, job):
+        """Read the results line by line instead of loading them at once.
+        https://docs.anthropic.com/en/api/retrieving-message-batch-results
+        """
+        headers = self.translator.get_headers()
+        del headers['Content-Type']
+        response = request(
+            '%s/%s/results' % (self.batch_endpoint, job.get('batch_id')),
+            headers=headers, raw_object=True,
+            proxy_uri=self.translator.proxy_uri)
+        for line in iter(response.readline, b''):
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            data = result.get('result') or {}
+            if data.get('type') != 'succeeded':
+                continue
+            yield result.get('custom_id'), ''.join(
+                content.get('text', '') for content
+                in data['message']['content'] if content.get('type') == 'text')
+
+    def cancel(self, batch_id):
+        """https://docs.anthropic.com/en/api/canceling-message-batches"""
+        response = request(
+            '%s/%s/cancel' % (self.batch_endpoint, batch_id),
+            headers=self.translator.get_headers(), method='POST',
+            proxy_uri=self.translator.proxy_uri)
+        return json.loads(response).get('processing_status') in (
+            'canceling', 'ended')
@@ -1,12 +1,19 @@
 import os.path
+import threading
 from typing import Any
+from functools import partial
+from types import GeneratorType
 
 from mechanize import HTTPError
 from mechanize._response import response_seek_wrapper as Response
 from calibre.utils.localization import lang_as_iso639_1
 
 from ..lib.utils import traceback_error, request
+from ..lib.hedging import RequestHedger
+from ..lib.sharding import KeySharder
+from ..lib.coordinator import get_coordinator
 from ..lib.exception import UnexpectedResult
+from ..lib.metrics import span, timed
 
 from .languages import lang_directionality
 
@@ -47,9 +54,8 @@ class Base:
         self.search_paths = []
 
         self.merge_enabled = False
-        self.api_keys: list = self.config.get('api_keys', [])[:]
-        self.bad_api_keys = []
-        self.api_key = self.get_api_key()
+        self.coordinated = False
+        self._local = threading.local()
 
         concurrency_limit = self.config.get('concurrency_limit')
         if concurrency_limit is not None:
@@ -67,6 +73,13 @@ class Base:
         if max_error_count is not None:
             self.max_error_count = max_error_count
 
+        self.set_api_keys(self.config.get('api_keys', []))
+
+        # Only the free engines are hedged, as the duplicates are not billed.
+        self.hedger = None
+        if self.free and self.config.get('request_hedging'):
+            self.hedger = RequestHedger(self.concurrency_limit)
+
     @classmethod
     def load_lang_codes(cls, codes):
         if not ('source' in codes or 'target' in codes):
@@ -100,6 +113,32 @@ class Base:
         return _('A correct key format "{}" is required.') \
             .format(cls.api_key_hint)
 
+    @property
+    def api_key(self):
+        """The key of the current thread if the keys are sharded."""
+        return getattr(self._local, 'api_key', None) or self._api_key
+
+    @api_key.setter
+    def api_key(self, api_key):
+        self._api_key = api_key
+
+    def set_api_keys(self, api_keys):
+        """Use the keys in turn, or all at once if there is more than one,
+        in which case the concurrency limit and request interval apply to
+        each key.
+        """
+        self.api_keys: list = list(api_keys)
+        self.bad_api_keys = []
+        self.api_key = self.get_api_key()
+        if getattr(self, 'sharder', None) is not None:
+            # Restore the concurrency limit of a single key.
+            self.concurrency_limit = self.sharder.concurrency_limit
+        self.sharder = None
+        if self.need_api_key and len(set(api_keys)) > 1:
+            self.sharder = KeySharder(
+                api_keys, self.concurrency_limit, self.request_interval)
+            self.concurrency_limit *= len(self.sharder.keys)
+
     def get_api_key(self):
         if self.need_api_key and self.api_keys:
             return self.api_keys.pop(0)
@@ -115,6 +154,9 @@ class Base:
         return False
 
     def need_swap_api_key(self, error_message):
+        # The sharded keys are quarantined instead.
+        if self.sharder is not None:
+            return False
         if self.need_api_key and len(self.api_keys) > 0 \
                 and self.match_error(error_message):
             return True
@@ -155,8 +197,13 @@ class Base:
             if not self.proxy_uri.startswith('http'):
                 self.proxy_uri = 'http://%s' % self.proxy_uri
 
+    def set_coordinated(self, enable):
+        self.coordinated = enable
+
     def set_concurrency_limit(self, limit):
         self.concurrency_limit = limit
+        if self.hedger is not None:
+            self.hedger.set_concurrency_limit(limit)
 
     def set_request_attempt(self, limit):
         self.request_attempt = limit
@@ -176,14 +223,83 @@ class Base:
     def _is_auto_lang(self):
         return self._get_source_code() == 'auto'
 
-    def translate(self, content):
-        try:
-            response = request(
-                url=self.get_endpoint(), data=self.get_body(content),
-                headers=self.get_headers(), method=self.method,
+    def _request(self, content):
+        with span('engine.body'):
+            endpoint = self.get_endpoint()
+            body = self.get_body(content)
+            headers = self.get_headers()
+        with span('engine.network'):
+            return request(
+                url=endpoint, data=body, headers=headers, method=self.method,
                 timeout=self.request_timeout, proxy_uri=self.proxy_uri,
                 raw_object=self.stream)
-            return self.get_result(response)
+
+    @timed('engine.translate')
+    def translate(self, content):
+        if self.sharder is None:
+            return self._coordinate(self.api_key, content)
+        api_key = self.sharder.acquire()
+        self._local.api_key = api_key
+        try:
+            result = self._coordinate(api_key, content)
+        except Exception as e:
+            self.sharder.release(api_key)
+            # Move on to another key if the service rejected this one.
+            if self.match_error(str(e)) and self.sharder.quarantine(api_key):
+                return self.translate(content)
+            raise
+        finally:
+            self._local.api_key = None
+        if isinstance(result, GeneratorType):
+            return self.sharder.hold(api_key, result)
+        self.sharder.release(api_key)
+        return result
+
+    def _coordinate(self, api_key, content):
+        """Share the concurrency limit and request interval of the API key
+        with the other job processes, which may translate at the same time.
+        """
+        concurrency_limit = self.concurrency_limit
+        if self.sharder is not None:
+            concurrency_limit = self.sharder.concurrency_limit
+        if not self.coordinated or concurrency_limit < 1:
+            return self._translate(content)
+        coordinator = get_coordinator(
+            self.name, api_key, concurrency_limit, self.request_interval)
+        slot = coordinator.acquire()
+        self._local.coordinator = coordinator
+        try:
+            result = self._translate(content)
+        except Exception:
+            coordinator.release(slot)
+            raise
+        finally:
+            self._local.coordinator = None
+        if isinstance(result, GeneratorType):
+            return coordinator.hold(slot, result)
+        coordinator.release(slot)
+        return result
+
+    def _reserve_slot(self):
+        """Take another slot of the coordinator for a duplicate request and
+        return the function to free it, or None if all the slots are busy.
+        """
+        coordinator = getattr(self._local, 'coordinator', None)
+        if coordinator is None:
+            return lambda: None
+        slot = coordinator.try_acquire()
+        return None if slot is None else partial(coordinator.release, slot)
+
+    def _translate(self, content):
+        try:
+            if self.hedger is not None and not self.stream:
+                response = self.hedger.request(
+                    lambda: self._request(content), self._reserve_slot)
+            else:
+                response = self._request(content)
+            # A streaming response is parsed while it is read.
+            with span('engine.parse'):
+                return self.get_result(response)
         except Exception as e:
             # Combine the error messages for investigation.
             error_message = traceback_error()
@@ -193,7 +309,7 @@ class Base:
                 error_message += '\n\n' + response
             # Swap a valid API key if necessary.
             if self.need_swap_api_key(error_message) and self.swap_api_key():
-                return self.translate(content)
+                return self._translate(content)
             raise UnexpectedResult(
                 _('Can not parse returned response. Raw data: {}')
                 .format('\n\n' + error_message))
@@ -213,6 +329,17 @@ class Base:
     def get_usage(self):
         return None
 
+    def get_token_count(self):
+        """The tokens of the requests and responses, if the engine reports
+        them."""
+        return None
+
+    def get_hedge_report(self):
+        return None if self.hedger is None else self.hedger.get_report()
+
+    def get_key_report(self):
+        return None if self.sharder is None else self.sharder.get_report()
+
     def allow_raw(self) -> bool:
         """Allow raw content translation only if the engine supports HTML and
         merge translation is disabled.
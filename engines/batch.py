@@ -0,0 +1,75 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+
+class BatchTranslate(ABC):
+    """Each batch translation service should inherit this class to work with
+    the batch translation manager. A book is split into as many batches as
+    required to respect the limits of the provider, and each batch is tracked
+    as a job in the cache.
+    """
+    provider: str
+    cache_key: str
+    document_url: str
+
+    # The limits of requests and bytes per batch.
+    max_requests: int = 50000
+    max_bytes: int = 200 * 1024 * 1024
+
+    def __init__(self, translator):
+        self.translator = translator
+        self.translator.stream = False
+        # The results are applied as they are, without keyed responses.
+        self.translator.structured_merge = False
+
+    def supported_models(self, refresh=False):
+        return self.translator.get_cached_models(refresh)
+
+    def get_line(self, paragraph) -> str:
+        """The serialized request of the paragraph used for the batch."""
+        return json.dumps({
+            'custom_id': paragraph.md5,
+            'body': json.loads(self.translator.get_body(paragraph.original))})
+
+    def split(self, paragraphs):
+        """Yield groups of paragraphs and their request lines, each of which
+        fits in a single batch.
+        """
+        group: list = []
+        size = 0
+        for paragraph in paragraphs:
+            line = self.get_line(paragraph)
+            line_size = len(line.encode('utf-8')) + 1
+            if len(group) >= self.max_requests or \
+                    (len(group) > 0 and size + line_size > self.max_bytes):
+                yield group
+                group, size = [], 0
+            group.append((paragraph, line))
+            size += line_size
+        if len(group) > 0:
+            yield group
+
+    @abstractmethod
+    def submit(self, lines: list[str]) -> dict:
+        """Submit the request lines as a batch and return its job data
+        containing the keys "batch_id" and "file_id".
+        """
+
+    @abstractmethod
+    def status(self, batch_id: str) -> dict:
+        """Return the details of the batch with the keys "status", one of
+        "in_progress", "completed", "failed", "cancelled" and "expired",
+        "request_counts" and "errors".
+        """
+
+    @abstractmethod
+    def results(self, job: dict) -> Iterator[tuple[str, str]]:
+        """Yield the custom id and translation of each successful request."""
+
+    @abstractmethod
+    def cancel(self, batch_id: str) -> bool:
+        """Cancel the batch."""
+
+    def clean(self, job: dict) -> None:
+        """Remove the files stored with the provider for the job."""
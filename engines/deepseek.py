@@ -13,6 +13,7 @@ class DeepseekTranslate(ChatgptTranslate):
     request_interval = 0.0
 
     models: list[str] = ['deepseek-chat', 'deepseek-reasoner']
+    models_ttl = None
     model: str | None = models[0]
 
     def __init__(self):
@@ -1,11 +1,110 @@
+import json
+import time
+from threading import Lock
 from abc import ABC, abstractmethod
 
+from ..lib.credential import get_model_cache
+
 from .base import Base
 
 
+load_translations()
+
+
 class GenAI(Base, ABC):
     """Each GenAI model should inherit this class to use specific methods."""
+    # Let the provider reuse the processed system prompt across requests.
+    prompt_caching = False
+    # Send the merged paragraphs as a JSON object keyed by their positions.
+    structured_merge = False
+    structured_prompt = (
+        'The content is a JSON object whose values are the paragraphs to '
+        'translate. Respond with a JSON object only, which has exactly the '
+        'same keys, each mapped to the translation of its value.')
+    # The seconds to use a fetched model list before refreshing it, or None
+    # if the model list is not fetched from the service.
+    models_ttl: float | None = 86400.0
+
+    def __init__(self):
+        super().__init__()
+        self.prompt_caching = self.config.get(
+            'prompt_caching', self.prompt_caching)
+        self.structured_merge = self.config.get(
+            'structured_merge', self.structured_merge)
+        self.prompt_cache_usage = {
+            'requests': 0, 'hits': 0, 'input_tokens': 0, 'cached_tokens': 0}
+        self.token_count: int | None = None
+        self._usage_lock = Lock()
 
     @abstractmethod
     def get_models(self) -> list[str]:
         """Automatically get the models for the engine."""
+
+    def get_cached_models(self, refresh=False) -> list[str]:
+        """The model list of the endpoint kept on the disk. Once it is older
+        than ``models_ttl``, it is fetched again in the background, and is
+        given up after a week. With ``refresh``, it is fetched at once.
+        """
+        if self.models_ttl is None:
+            return self.get_models()
+        return get_model_cache().get(
+            '%s %s' % (self.name, self.endpoint),
+            lambda: (self.get_models(), time.time() + 604800),
+            ahead=604800 - self.models_ttl, force=refresh)
+
+    def is_structured(self) -> bool:
+        return self.merge_enabled and self.structured_merge
+
+    def get_structured_content(self, segments: dict[str, str]) -> str:
+        return json.dumps(segments, ensure_ascii=False)
+
+    def get_structured_result(
+            self, result: str, keys) -> dict[str, str]:
+        """Pick the translations of the requested keys from the JSON object
+        in the response. Any missing or empty key is left out, so only those
+        need to be requested again.
+        """
+        start, end = result.find('{'), result.rfind('}')
+        try:
+            data = json.loads(result[start:end + 1])
+        except ValueError:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        translations = {}
+        for key in keys:
+            value = data.get(key)
+            if isinstance(value, str) and value.strip() != '':
+                translations[key] = value.strip()
+        return translations
+
+    def record_prompt_cache(self, input_tokens, cached_tokens):
+        """Accumulate the token counts reported with a response. The requests
+        may come from multiple threads.
+        """
+        if not self.prompt_caching:
+            return
+        with self._usage_lock:
+            usage = self.prompt_cache_usage
+            usage['requests'] += 1
+            usage['hits'] += int(cached_tokens > 0)
+            usage['input_tokens'] += input_tokens
+            usage['cached_tokens'] += cached_tokens
+
+    def record_tokens(self, input_tokens, output_tokens):
+        with self._usage_lock:
+            self.token_count = (self.token_count or 0) + input_tokens \
+                + output_tokens
+
+    def get_token_count(self) -> int | None:
+        return self.token_count
+
+    def get_prompt_cache_report(self) -> str | None:
+        usage = self.prompt_cache_usage
+        if not self.prompt_caching or usage['requests'] < 1:
+            return None
+        return _(
+            'Prompt cache: {} hits, {} misses, {} of {} input tokens cached'
+        ).format(
+            usage['hits'], usage['requests'] - usage['hits'],
+            usage['cached_tokens'], usage['input_tokens'])
@@ -1,15 +1,24 @@
 import os
+import re
 import sys
+import math
 import time
 import json
+import uuid
 from html import unescape
+from datetime import datetime
+from threading import Lock
+from urllib.parse import urlsplit
 from subprocess import Popen, PIPE
 from http.client import IncompleteRead
 
 from ..lib.utils import request, traceback_error
+from ..lib.exception import UnexpectedResult
+from ..lib.credential import get_credential_cache
 
 from .base import Base
 from .genai import GenAI
+from .batch import BatchTranslate
 from .languages import google, gemini
 
 
@@ -127,7 +136,6 @@ class GoogleFreeTranslate(Base):
 
 class GoogleTranslate(Base):
     api_key_errors = ['429']
-    api_key_cache: tuple[float, str | None] = (0.0, None)
     gcloud = None
     project_id = None
     using_tip = _(
@@ -140,7 +148,7 @@ class GoogleTranslate(Base):
         .format('<sup><a href="https://cloud.google.com/sdk/docs/install">[^]'
                 '</a></sup>').replace('\n', '<br />')
 
-    def _run_command(self, command, silence=False):
+    def _run_command(self, command, silence=False, env=None):
         message = _('Cannot run the command "{}".')
         try:
             startupinfo = None
@@ -151,7 +159,7 @@ class GoogleTranslate(Base):
                 startupinfo.dwFlags |= STARTF_USESHOWWINDOW
             process = Popen(
                 command, stdout=PIPE, stderr=PIPE, universal_newlines=True,
-                startupinfo=startupinfo)
+                startupinfo=startupinfo, env=env)
         except Exception:
             if silence:
                 return None
@@ -193,29 +201,30 @@ class GoogleTranslate(Base):
     def _get_project_id(self):
         if self.project_id is not None:
             return self.project_id
+        # Not shared with the other processes, so a project changed with
+        # gcloud is used by the next job.
         self.project_id = self._run_command(
             [self._get_gcloud_command(), 'config', 'get', 'project'])
         return self.project_id
 
+    def _fetch_credential(self):
+        env = None
+        # Pass the existing proxies to the command.
+        if self.proxy_uri:
+            env = dict(os.environ)
+            env.update(http_proxy=self.proxy_uri, https_proxy=self.proxy_uri)
+        api_key = self._run_command([
+            self._get_gcloud_command(), 'auth', 'application-default',
+            'print-access-token'], env=env)
+        return api_key, time.time() + 3600
+
     def _get_credential(self):
         """The default lifetime of the API key is 3600 seconds. Once an
-        available key is generated, it will be cached until it expired.
+        available key is generated, it will be cached until it expired, and
+        shared with the other job processes.
         """
-        timestamp, old_api_key = self.api_key_cache
-        if old_api_key is not None and time.time() - timestamp < 3600:
-            return old_api_key
-        # Temporarily add existing proxies.
-        self.proxy_uri and os.environ.update(
-            http_proxy=self.proxy_uri, https_proxy=self.proxy_uri)
-        new_api_key = self._run_command([
-            self._get_gcloud_command(), 'auth', 'application-default',
-            'print-access-token'])
-        # Cleanse the proxies after use.
-        for proxy in ('http_proxy', 'https_proxy'):
-            if proxy in os.environ:
-                del os.environ[proxy]
-        self.api_key_cache = (time.time(), new_api_key)
-        return new_api_key
+        return get_credential_cache().get(
+            'gcloud_access_token', self._fetch_credential)
 
 
 class GoogleBasicTranslateADC(GoogleTranslate):
@@ -334,6 +343,12 @@ class GeminiTranslate(GenAI):
     # TODO: Handle the default model more appropriately.
     model: str | None = 'gemini-2.0-flash'
 
+    # The time to live of the cached system prompt in seconds, which is
+    # created again when it expires within the refresh seconds.
+    cache_ttl = 3600
+    cache_refresh = 300
+    cache_missing_error = 'CachedContent not found'
+
     def __init__(self):
         super().__init__()
         self.prompt = self.config.get('prompt', self.prompt)
@@ -342,8 +357,11 @@ class GeminiTranslate(GenAI):
         self.top_p = self.config.get('top_p', self.top_p)
         self.stream = self.config.get('stream', self.stream)
         self.model = self.config.get('model', self.model)
+        # The name and expiration time of the cached content by prompt.
+        self.cached_contents: dict[tuple, tuple[str | None, float]] = {}
+        self._cache_lock = Lock()
 
-    def _prompt(self, text):
+    def _system_prompt(self):
         prompt = self.prompt.replace('<tlang>', self.target_lang)
         if self._is_auto_lang():
             prompt = prompt.replace('<slang>', 'detected language')
@@ -354,7 +372,89 @@ class GeminiTranslate(GenAI):
             prompt += (
                 ' Ensure that placeholders matching the pattern {{id_\\d+}} '
                 'in the content are retained.')
-        return prompt + ' Start translating: ' + text
+        if self.is_structured():
+            prompt += ' ' + self.structured_prompt
+        return prompt
+
+    def _prompt(self, text):
+        return self._system_prompt() + ' Start translating: ' + text
+
+    def _cached_content(self):
+        """Create the cached content of the system prompt for the requests,
+        and again before it expires. None is kept if it can not be created,
+        e.g. the prompt is shorter than the minimum token count of the model.
+        https://ai.google.dev/gemini-api/docs/caching
+        """
+        prompt = self._system_prompt()
+        # The cached content belongs to the project of the API key.
+        cache_key = (prompt, self.api_key)
+        with self._cache_lock:
+            name, expire_time = self.cached_contents.get(cache_key, (None, 0))
+            if expire_time - time.time() > self.cache_refresh:
+                return name
+            endpoint = '%s/cachedContents?key=%s' % (
+                self.endpoint.rsplit('/', 1)[0], self.api_key)
+            body = json.dumps({
+                'model': 'models/%s' % self.model,
+                'systemInstruction': {'parts': [{'text': prompt}]},
+                'ttl': '%ss' % self.cache_ttl})
+            try:
+                response = request(
+                    endpoint, body, self.get_headers(), 'POST',
+                    timeout=self.request_timeout, proxy_uri=self.proxy_uri)
+                data = json.loads(response)
+                entry = (data.get('name'), self._get_expire_time(data))
+            except Exception:
+                entry = (None, math.inf)
+            self.cached_contents[cache_key] = entry
+            return entry[0]
+
+    def _get_expire_time(self, data):
+        """The expiration time of the cached content as a timestamp."""
+        try:
+            # The fractional seconds may have up to nine digits.
+            value = re.sub(r'\.\d+', '', data['expireTime'])
+            return datetime.fromisoformat(
+                value.replace('Z', '+00:00')).timestamp()
+        except Exception:
+            return time.time() + self.cache_ttl
+
+    def _drop_cached_content(self, name):
+        with self._cache_lock:
+            for cache_key, entry in list(self.cached_contents.items()):
+                if entry[0] == name:
+                    del self.cached_contents[cache_key]
+
+    def need_swap_api_key(self, error_message):
+        # The cached content is missing rather than the key being denied.
+        if self.cache_missing_error in error_message:
+            return False
+        return super().need_swap_api_key(error_message)
+
+    def _translate(self, content):
+        self._local.cached_content = None
+        try:
+            return super()._translate(content)
+        except UnexpectedResult as e:
+            name = self._local.cached_content
+            if name is None or self.cache_missing_error not in str(e):
+                raise
+        # The cached content expired or was deleted, so the system prompt is
+        # sent inline instead, and it is created again for the next request.
+        self._drop_cached_content(name)
+        self._local.inline_prompt = True
+        try:
+            return super()._translate(content)
+        finally:
+            self._local.inline_prompt = False
+
+    def _record_usage(self, usage):
+        self.record_prompt_cache(
+            usage.get('promptTokenCount') or 0,
+            usage.get('cachedContentTokenCount') or 0)
+        self.record_tokens(
+            usage.get('promptTokenCount') or 0,
+            usage.get('candidatesTokenCount') or 0)
 
     def get_models(self):
         endpoint = f'{self.endpoint}?key={self.api_key}'
@@ -381,7 +481,11 @@ class GeminiTranslate(GenAI):
         return {'Content-Type': 'application/json'}
 
     def get_body(self, text):
-        return json.dumps({
+        cached_content = self.prompt_caching \
+            and not getattr(self._local, 'inline_prompt', False) \
+            and self._cached_content()
+        self._local.cached_content = cached_content or None
+        body: dict = {
             "contents": [
                 {"role": "user", "parts": [{"text": self._prompt(text)}]},
             ],
@@ -410,12 +514,22 @@ class GeminiTranslate(GenAI):
                     "threshold": "BLOCK_NONE"
                 },
             ],
-        })
+        }
+        if self.is_structured():
+            body['generationConfig'].update(
+                responseMimeType='application/json')
+        if cached_content:
+            # The system prompt is taken from the cached content.
+            body.update(cachedContent=cached_content, contents=[
+                {"role": "user", "parts": [{"text": text}]}])
+        return json.dumps(body)
 
     def get_result(self, response):
         if self.stream:
             return self._parse_stream(response)
-        parts = json.loads(response)['candidates'][0]['content']['parts']
+        data = json.loads(response)
+        self._record_usage(data.get('usageMetadata') or {})
+        parts = data['candidates'][0]['content']['parts']
         return ''.join([part['text'] for part in parts])
 
     def _parse_stream(self, response):
@@ -436,4 +550,168 @@ class GeminiTranslate(GenAI):
                     for part in content['parts']:
                         yield part['text']
                 if candidate.get('finishReason') == 'STOP':
+                    self._record_usage(item.get('usageMetadata') or {})
                     break
+
+
+class GeminiBatchTranslate(BatchTranslate):
+    """Requests are sent inline when they fit in a single request, otherwise
+    they are uploaded as a JSONL file through the Files API.
+    https://ai.google.dev/gemini-api/docs/batch-mode
+    """
+    provider = 'Google'
+    cache_key = 'gemini'
+    document_url = 'https://ai.google.dev/gemini-api/docs/batch-mode'
+
+    boundary = uuid.uuid4().hex
+    max_inline_bytes = 20 * 1024 * 1024
+    states = {
+        'BATCH_STATE_PENDING': 'in_progress',
+        'BATCH_STATE_RUNNING': 'in_progress',
+        'BATCH_STATE_SUCCEEDED': 'completed',
+        'BATCH_STATE_FAILED': 'failed',
+        'BATCH_STATE_CANCELLED': 'cancelled',
+        'BATCH_STATE_EXPIRED': 'expired'}
+
+    def __init__(self, translator):
+        BatchTranslate.__init__(self, translator)
+        # The cached content may expire before the batch is processed.
+        self.translator.prompt_caching = False
+        domain_name = '://'.join(
+            urlsplit(self.translator.endpoint, 'https')[:2])
+        path = urlsplit(self.translator.endpoint).path.rstrip('/')
+        version = path.split('/')[1] if path.count('/') > 1 else 'v1beta'
+        self.api_endpoint = '%s/%s' % (domain_name, version)
+        self.file_endpoint = '%s/upload/%s/files' % (domain_name, version)
+        self.download_endpoint = '%s/download/%s' % (domain_name, version)
+
+    def _url(self, endpoint, query=''):
+        return '%s?%skey=%s' % (endpoint, query, self.translator.api_key)
+
+    def get_line(self, paragraph):
+        return json.dumps({
+            'key': paragraph.md5,
+            'request': json.loads(
+                self.translator.get_body(paragraph.original))})
+
+    def _create_multipart_related_data(self, lines):
+        """https://ai.google.dev/api/files#method:-media.upload"""
+        data = []
+        data.append('--%s' % self.boundary)
+        data.append('Content-Type: application/json; charset=UTF-8')
+        data.append('')
+        data.append(json.dumps({'file': {'display_name': 'original.jsonl'}}))
+        data.append('--%s' % self.boundary)
+        data.append('Content-Type: application/jsonl')
+        data.append('')
+        data.append('')
+        head, tail = '\r\n'.join(data), '\r\n--%s--' % self.boundary
+        return b''.join([
+            head.encode('utf-8'),
+            b'\n'.join(line.encode('utf-8') for line in lines),
+            tail.encode('utf-8')])
+
+    def upload(self, lines):
+        """Upload the request lines as a JSONL file and retrieve its name."""
+        headers = {
+            'X-Goog-Upload-Protocol': 'multipart',
+            'Content-Type': 'multipart/related; boundary=%s' % self.boundary}
+        response = request(
+            self._url(self.file_endpoint),
+            self._create_multipart_related_data(lines), headers, 'POST',
+            proxy_uri=self.translator.proxy_uri)
+        return json.loads(response)['file']['name']
+
+    def submit(self, lines):
+        """Create a batch job and retrieve its name, e.g. batches/123.
+        https://ai.google.dev/api/batch-mode#method:-models.batchgeneratecontent
+        """
+        file_id = None
+        size = sum(len(line.encode('utf-8')) for line in lines)
+        if size > self.max_inline_bytes:
+            file_id = self.upload(lines)
+            input_config: dict = {'file_name': file_id}
+        else:
+            requests = []
+            for line in lines:
+                item = json.loads(line)
+                requests.append({
+                    'request': item['request'],
+                    'metadata': {'key': item['key']}})
+            input_config = {'requests': {'requests': requests}}
+        body = json.dumps({'batch': {
+            'display_name': 'ebook-translator',
+            'input_config': input_config}})
+        endpoint = '%s/models/%s:batchGenerateContent' % (
+            self.api_endpoint, self.translator.model)
+        response = request(
+            self._url(endpoint), body, self.translator.get_headers(), 'POST',
+            proxy_uri=self.translator.proxy_uri)
+        return {'batch_id': json.loads(response).get('name'),
+                'file_id': file_id}
+
+    def _batch(self, batch_id):
+        response = request(
+            self._url('%s/%s' % (self.api_endpoint, batch_id)),
+            headers=self.translator.get_headers(),
+            proxy_uri=self.translator.proxy_uri)
+        return json.loads(response)
+
+    def status(self, batch_id):
+        """https://ai.google.dev/api/batch-mode#method:-batches.get"""
+        batch = self._batch(batch_id)
+        metadata = batch.get('metadata', {})
+        stats = metadata.get('batchStats', {})
+        return {
+            'status': self.states.get(metadata.get('state'), 'in_progress'),
+            'request_counts': {
+                'total': int(stats.get('requestCount', 0)),
+                'completed': int(stats.get('successfulRequestCount', 0)),
+                'failed': int(stats.get('failedRequestCount', 0))},
+            'errors': batch.get('error'),
+            'output': batch_id}
+
+    def _text(self, response):
+        parts = response['candidates'][0]['content']['parts']
+        return ''.join(part.get('text', '') for part in parts)
+
+    def results(self, job):
+        batch = self._batch(job.get('batch_id'))
+        output = batch.get('response') or \
+            batch.get('metadata', {}).get('output', {})
+        inlined = output.get('inlinedResponses', {})
+        for item in inlined.get('inlinedResponses', []):
+            if 'response' in item:
+                key = item.get('metadata', {}).get('key')
+                yield key, self._text(item['response'])
+        file_name = output.get('responsesFile')
+        if file_name is None:
+            return
+        response = request(
+            self._url(
+                '%s/%s:download' % (self.download_endpoint, file_name),
+                'alt=media&'),
+            headers=self.translator.get_headers(), raw_object=True,
+            proxy_uri=self.translator.proxy_uri)
+        for line in iter(response.readline, b''):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if 'response' in item:
+                yield item.get('key'), self._text(item['response'])
+
+    def cancel(self, batch_id):
+        """https://ai.google.dev/api/batch-mode#method:-batches.cancel"""
+        request(
+            self._url('%s/%s:cancel' % (self.api_endpoint, batch_id)),
+            '{}', self.translator.get_headers(), 'POST',
+            proxy_uri=self.translator.proxy_uri)
+        return True
+
+    def clean(self, job):
+        file_id = job.get('file_id')
+        if file_id is not None:
+            request(
+                self._url('%s/%s' % (self.api_endpoint, file_id)),
+                headers=self.translator.get_headers(), method='DELETE',
+                proxy_uri=self.translator.proxy_uri)
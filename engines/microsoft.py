@@ -1,13 +1,15 @@
 import json
 import base64
 from datetime import datetime
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit, parse_qs
 
 from ..lib.utils import request
+from ..lib.credential import get_credential_cache
 
 from .base import Base
 from .languages import microsoft
-from .openai import ChatgptTranslate
+from .batch import BatchTranslate
+from .openai import ChatgptTranslate, ChatgptBatchTranslate
 
 
 load_translations()
@@ -20,7 +22,6 @@ class MicrosoftEdgeTranslate(Base):
     lang_codes = Base.load_lang_codes(microsoft)
     endpoint = 'https://api-edge.cognitive.microsofttranslator.com/translate'
     need_api_key = False
-    access_info = None
 
     def _parse_jwt(self, token):
         parts = token.split(".")
@@ -36,14 +37,16 @@ class MicrosoftEdgeTranslate(Base):
         expired_date = datetime.fromtimestamp(parsed['exp'])
         return {'Token': token, 'Expire': expired_date}
 
+    def _fetch_app_key(self):
+        auth_url = 'https://edge.microsoft.com/translate/auth'
+        access_info = self._parse_jwt(request(auth_url, method='GET'))
+        return access_info['Token'], access_info['Expire'].timestamp()
+
     def _get_app_key(self):
-        if not self.access_info or datetime.now() > self.access_info['Expire']:
-            auth_url = 'https://edge.microsoft.com/translate/auth'
-            app_key = request(auth_url, method='GET')
-            self.access_info = self._parse_jwt(app_key)
-        else:
-            app_key = self.access_info['Token']
-        return app_key
+        """The token is shared with the other job processes until it is
+        about to expire."""
+        return get_credential_cache().get(
+            'microsoft_edge_token', self._fetch_app_key, ahead=60.0)
 
     def get_endpoint(self):
         query = {
@@ -89,6 +92,57 @@ class AzureChatgptTranslate(ChatgptTranslate):
                 {'role': 'user', 'content': text}
             ]
         }
+        if self.stream and self.prompt_caching:
+            body.update(stream_options={'include_usage': True})
+        if self.is_structured():
+            body.update(response_format={'type': 'json_object'})
         sampling_value = getattr(self, self.sampling)
         body.update({self.sampling: sampling_value})
         return json.dumps(body)
+
+
+class AzureChatgptBatchTranslate(ChatgptBatchTranslate):
+    """The batch requires a deployment of the "Global Batch" type.
+    https://learn.microsoft.com/azure/ai-services/openai/how-to/batch
+    """
+    provider = 'Azure OpenAI'
+    cache_key = 'azure_chatgpt'
+    document_url = (
+        'https://learn.microsoft.com/azure/ai-services/openai/how-to/batch')
+
+    # https://learn.microsoft.com/azure/ai-services/openai/quotas-limits
+    max_requests = 100000
+    max_bytes = 200 * 1024 * 1024
+
+    batch_url = '/chat/completions'
+
+    def __init__(self, translator):
+        BatchTranslate.__init__(self, translator)
+        url = urlsplit(self.translator.endpoint)
+        self.api_version = parse_qs(url.query).get(
+            'api-version', ['2024-10-21'])[0]
+        paths = url.path.split('/')
+        self.deployment = paths[paths.index('deployments') + 1] \
+            if 'deployments' in paths[:-1] else None
+        domain_name = '%s://%s' % (url.scheme, url.netloc)
+        self.file_endpoint = '%s/openai/files' % domain_name
+        self.batch_endpoint = '%s/openai/batches' % domain_name
+
+    def _url(self, endpoint, *paths):
+        return '%s?api-version=%s' % (
+            ChatgptBatchTranslate._url(self, endpoint, *paths),
+            self.api_version)
+
+    def get_line(self, paragraph):
+        body = json.loads(self.translator.get_body(paragraph.original))
+        # The deployment name is used as the model name.
+        body.update(model=self.deployment)
+        return json.dumps({
+            "custom_id": paragraph.md5,
+            "method": "POST",
+            "url": self.batch_url,
+            "body": body})
+
+    def supported_models(self, refresh=False):
+        # Whether a deployment supports batches is up to its type.
+        return [self.translator.model]
@@ -1,17 +1,15 @@
-import io
 import json
 import uuid
 from typing import Any
 from urllib.parse import urlsplit
 from http.client import IncompleteRead
 
-from mechanize._response import response_seek_wrapper as Response
-
 from .. import EbookTranslator
 from ..lib.utils import request
 from ..lib.exception import UnsupportedModel
 
 from .genai import GenAI
+from .batch import BatchTranslate
 from .languages import google
 
 
@@ -79,6 +77,8 @@ class ChatgptTranslate(GenAI):
         if self.merge_enabled:
             prompt += (' Ensure that placeholders matching the pattern '
                        '{{id_\\d+}} in the content are retained.')
+        if self.is_structured():
+            prompt += ' ' + self.structured_prompt
         return prompt
 
     def get_headers(self):
@@ -89,6 +89,8 @@ class ChatgptTranslate(GenAI):
         }
 
     def get_body(self, text):
+        # Keep the system prompt as the leading message, so the identical
+        # prefix of the requests can be served from the provider's cache.
         body: dict[str, Any] = {
             'model': self.model,
             'messages': [
@@ -97,14 +99,32 @@ class ChatgptTranslate(GenAI):
             ],
         }
         self.stream and body.update(stream=True)
+        if self.stream and self.prompt_caching:
+            # The usage is only sent with the last chunk when requested.
+            body.update(stream_options={'include_usage': True})
+        if self.is_structured():
+            body.update(response_format={'type': 'json_object'})
         sampling_value = getattr(self, self.sampling)
         body.update({self.sampling: sampling_value})
         return json.dumps(body)
 
+    def _record_usage(self, usage):
+        """https://platform.openai.com/docs/guides/prompt-caching"""
+        details = usage.get('prompt_tokens_details') or {}
+        # DeepSeek reports the cache hits in its own field.
+        cached_tokens = details.get('cached_tokens') or \
+            usage.get('prompt_cache_hit_tokens') or 0
+        self.record_prompt_cache(usage.get('prompt_tokens') or 0, cached_tokens)
+        self.record_tokens(
+            usage.get('prompt_tokens') or 0,
+            usage.get('completion_tokens') or 0)
+
     def get_result(self, response):
         if self.stream:
             return self._parse_stream(response)
-        return json.loads(response)['choices'][0]['message']['content']
+        data = json.loads(response)
+        self._record_usage(data.get('usage') or {})
+        return data['choices'][0]['message']['content']
 
     def _parse_stream(self, response):
         while True:
@@ -120,25 +140,44 @@ class ChatgptTranslate(GenAI):
                 chunk = line.split('data: ')[1]
                 if chunk == '[DONE]':
                     break
-                delta = json.loads(chunk)['choices'][0]['delta']
+                data = json.loads(chunk)
+                if data.get('usage'):
+                    self._record_usage(data['usage'])
+                if len(data.get('choices') or []) < 1:
+                    continue
+                delta = data['choices'][0]['delta']
                 if 'content' in delta:
                     yield str(delta['content'])
 
 
-class ChatgptBatchTranslate:
+class ChatgptBatchTranslate(BatchTranslate):
     """https://cookbook.openai.com/examples/batch_processing"""
+    provider = 'OpenAI'
+    cache_key = 'chatgpt'
+    document_url = 'https://cookbook.openai.com/examples/batch_processing'
+
+    # https://platform.openai.com/docs/guides/batch#rate-limits
+    max_requests = 50000
+    max_bytes = 200 * 1024 * 1024
+
     boundary = uuid.uuid4().hex
+    batch_url = '/v1/chat/completions'
+    statuses = {
+        'validating': 'in_progress',
+        'finalizing': 'in_progress',
+        'cancelling': 'in_progress'}
 
     def __init__(self, translator):
-        self.translator = translator
-        self.translator.stream = False
-
+        BatchTranslate.__init__(self, translator)
         domain_name = '://'.join(
             urlsplit(self.translator.endpoint, 'https')[:2])
         self.file_endpoint = '%s/v1/files' % domain_name
         self.batch_endpoint = '%s/v1/batches' % domain_name
 
-    def _create_multipart_form_data(self, body):
+    def _url(self, endpoint, *paths):
+        return '/'.join((endpoint,) + paths)
+
+    def _create_multipart_form_data(self, lines):
         """https://www.rfc-editor.org/rfc/rfc2046#section-5.1"""
         data = []
         data.append('--%s' % self.boundary)
@@ -151,41 +190,41 @@ class ChatgptBatchTranslate:
             'filename="original.jsonl"')
         data.append('Content-Type: application/json')
         data.append('')
-        data.append(body)
-        data.append('--%s--' % self.boundary)
-        return '\r\n'.join(data).encode('utf-8')
-
-    def supported_models(self):
-        return self.translator.get_models()
+        data.append('')
+        head, tail = '\r\n'.join(data), '\r\n--%s--' % self.boundary
+        # The request is sent as a whole, so the body is built in memory.
+        return b''.join([
+            head.encode('utf-8'),
+            b'\n'.join(line.encode('utf-8') for line in lines),
+            tail.encode('utf-8')])
 
     def headers(self, extra_headers={}):
         headers = self.translator.get_headers()
         headers.update(extra_headers)
         return headers
 
-    def upload(self, paragraphs):
-        """Upload the original content and retrieve the file id.
+    def get_line(self, paragraph):
+        return json.dumps({
+            "custom_id": paragraph.md5,
+            "method": "POST",
+            "url": self.batch_url,
+            "body": json.loads(self.translator.get_body(paragraph.original))})
+
+    def upload(self, lines):
+        """Upload the request lines and retrieve the file id.
         https://platform.openai.com/docs/api-reference/files/create
         """
-        if self.translator.model not in self.supported_models():
+        # The cached model list may be older than the model.
+        if self.translator.model not in self.supported_models() and \
+                self.translator.model not in self.supported_models(True):
             raise UnsupportedModel(
                 'The model "{}" does not support batch functionality.'
                 .format(self.translator.model))
-        body = io.StringIO()
-        for paragraph in paragraphs:
-            data = self.translator.get_body(paragraph.original)
-            body.write(json.dumps({
-                "custom_id": paragraph.md5,
-                "method": "POST",
-                "url": "/v1/chat/completions",
-                "body": json.loads(data)}))
-            if paragraph != paragraphs[-1]:
-                body.write('\n')
         content_type = 'multipart/form-data; boundary="%s"' % self.boundary
         headers = self.headers({'Content-Type': content_type})
-        body = self._create_multipart_form_data(body.getvalue())
+        body = self._create_multipart_form_data(lines)
         response = request(
-            self.file_endpoint, body, headers, 'POST',
+            self._url(self.file_endpoint), body, headers, 'POST',
             proxy_uri=self.translator.proxy_uri)
         return json.loads(response).get('id')
 
@@ -193,43 +232,44 @@ class ChatgptBatchTranslate:
         headers = self.translator.get_headers()
         del headers['Content-Type']
         response = request(
-            '%s/%s' % (self.file_endpoint, file_id), headers=headers,
+            self._url(self.file_endpoint, file_id), headers=headers,
             method='DELETE', proxy_uri=self.translator.proxy_uri)
         return json.loads(response).get('deleted')
 
     def retrieve(self, output_file_id):
+        """Read the output file line by line and yield the custom id and
+        content of each successful request.
+        """
         headers = self.translator.get_headers()
         del headers['Content-Type']
         response = request(
-            '%s/%s/content' % (self.file_endpoint, output_file_id),
+            self._url(self.file_endpoint, output_file_id, 'content'),
             headers=headers, raw_object=True,
             proxy_uri=self.translator.proxy_uri)
-        assert isinstance(response, Response)
-
-        translations = {}
-        for line in io.BytesIO(response.read()):
+        for line in iter(response.readline, b''):
+            if not line.strip():
+                continue
             result = json.loads(line)
-            response_item = result['response']
+            response_item = result.get('response') or {}
             if response_item.get('status_code') == 200:
                 content = response_item[
                     'body']['choices'][0]['message']['content']
-                translations[result.get('custom_id')] = content
-        return translations
+                yield result.get('custom_id'), content
 
     def create(self, file_id):
         headers = self.translator.get_headers()
         body = json.dumps({
             'input_file_id': file_id,
-            'endpoint': '/v1/chat/completions',
+            'endpoint': self.batch_url,
             'completion_window': '24h'})
         response = request(
-            self.batch_endpoint, body, headers, 'POST',
+            self._url(self.batch_endpoint), body, headers, 'POST',
             proxy_uri=self.translator.proxy_uri)
         return json.loads(response).get('id')
 
     def check(self, batch_id):
         response = request(
-            '%s/%s' % (self.batch_endpoint, batch_id),
+            self._url(self.batch_endpoint, batch_id),
             headers=self.translator.get_headers(),
             proxy_uri=self.translator.proxy_uri)
         return json.loads(response)
@@ -237,8 +277,39 @@ class ChatgptBatchTranslate:
     def cancel(self, batch_id):
         headers = self.translator.get_headers()
         response = request(
-            '%s/%s/cancel' % (self.batch_endpoint, batch_id),
+            self._url(self.batch_endpoint, batch_id, 'cancel'),
             headers=headers, method='POST',
             proxy_uri=self.translator.proxy_uri)
         return json.loads(response).get('status') in (
             'cancelling', 'cancelled')
+
+    def submit(self, lines):
+        file_id = self.upload(lines)
+        try:
+            batch_id = self.create(file_id)
+        except Exception:
+            self.delete(file_id)
+            raise
+        return {'batch_id': batch_id, 'file_id': file_id}
+
+    def status(self, batch_id):
+        details = self.check(batch_id)
+        status = details.get('status')
+        request_counts = details.get('request_counts') or {}
+        return {
+            'status': self.statuses.get(status, status),
+            'request_counts': {
+                'total': request_counts.get('total', 0),
+                'completed': request_counts.get('completed', 0),
+                'failed': request_counts.get('failed', 0)},
+            'errors': details.get('errors'),
+            'output': details.get('output_file_id')}
+
+    def results(self, job):
+        # No output file is created if all the requests failed.
+        output_file_id = job.get('output')
+        return self.retrieve(output_file_id) if output_file_id else iter(())
+
+    def clean(self, job):
+        file_id = job.get('file_id')
+        file_id is not None and self.delete(file_id)
@@ -0,0 +1,168 @@
+import time
+import random
+import threading
+from types import GeneratorType
+
+
+load_translations()
+
+
+class EnginePool:
+    """Spread the requests of a job over several translators by weight. A
+    translator that keeps failing is taken out of the rotation for a while,
+    and its requests fail over to the others. The pool can be used in place
+    of a single translator, while the name of the translator that actually
+    translated a paragraph is reported through ``name`` in the same thread.
+    """
+    alias = _('Engine Pool')
+    free = False
+    stream = False
+
+    # The consecutive failures to take a translator out of the rotation.
+    failure_threshold = 3
+    # The seconds to wait before trying a disabled translator again.
+    cooldown = 60.0
+
+    def __init__(self, members):
+        """:members: A list of (translator, weight) pairs. The first
+        translator decides the placeholder and separator of the job."""
+        self.members = [(translator, max(1, int(weight)))
+                        for translator, weight in members]
+        self.primary = self.members[0][0]
+        self.placeholder = self.primary.placeholder
+        self.separator = self.primary.separator
+
+        translators = [translator for translator, weight in self.members]
+        limits = [translator.concurrency_limit for translator in translators]
+        self.concurrency_limit = 0 if 0 in limits else sum(limits)
+        self.request_interval = min(
+            translator.request_interval for translator in translators)
+        self.request_attempt = max(
+            translator.request_attempt for translator in translators)
+        self.request_timeout = max(
+            translator.request_timeout for translator in translators)
+        self.max_error_count = max(
+            translator.max_error_count for translator in translators)
+        self.merge_enabled = False
+
+        self.failures = {id(translator): 0 for translator in translators}
+        self.disabled_until = {id(translator): 0.0 for translator in translators}
+        self.counts = {id(translator): 0 for translator in translators}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def name(self):
+        translator = getattr(self._local, 'translator', None)
+        return (translator or self.primary).name
+
+    def __getattr__(self, name):
+        # Delegate anything else, e.g. the language codes, to the primary.
+        primary = self.__dict__.get('primary')
+        if primary is None:
+            raise AttributeError(name)
+        return getattr(primary, name)
+
+    def set_merge_enabled(self, enable):
+        self.merge_enabled = enable
+        for translator, weight in self.members:
+            translator.set_merge_enabled(enable)
+
+    def set_source_lang(self, source_lang):
+        for translator, weight in self.members:
+            translator.set_source_lang(source_lang)
+
+    def set_target_lang(self, target_lang):
+        for translator, weight in self.members:
+            translator.set_target_lang(target_lang)
+
+    def set_proxy(self, proxy=[]):
+        for translator, weight in self.members:
+            translator.set_proxy(proxy)
+
+    def set_coordinated(self, enable):
+        for translator, weight in self.members:
+            translator.set_coordinated(enable)
+
+    def set_search_paths(self, paths):
+        for translator, weight in self.members:
+            translator.set_search_paths(paths)
+
+    def get_target_lang(self):
+        return self.primary.get_target_lang()
+
+    def match_error(self, error_message):
+        # Errors of a single translator are handled by failing over.
+        return False
+
+    def _candidates(self):
+        """The available translators in a weighted random order."""
+        now = time.monotonic()
+        with self._lock:
+            members = [
+                (translator, weight) for translator, weight in self.members
+                if self.disabled_until[id(translator)] <= now]
+        if len(members) < 1:
+            members = self.members[:]
+        candidates = []
+        while len(members) > 0:
+            translator, weight = random.choices(
+                members, [weight for translator, weight in members])[0]
+            members.remove((translator, weight))
+            candidates.append(translator)
+        return candidates
+
+    def _succeed(self, translator):
+        with self._lock:
+            self.failures[id(translator)] = 0
+            self.counts[id(translator)] += 1
+
+    def _fail(self, translator):
+        with self._lock:
+            key = id(translator)
+            self.failures[key] += 1
+            if self.failures[key] >= self.failure_threshold:
+                self.failures[key] = 0
+                self.disabled_until[key] = time.monotonic() + self.cooldown
+
+    def translate(self, content):
+        error = None
+        for translator in self._candidates():
+            self._local.translator = translator
+            try:
+                translation = translator.translate(content)
+                # Read the streaming response here to fail over on errors.
+                if isinstance(translation, GeneratorType):
+                    translation = ''.join(translation)
+                self._succeed(translator)
+                return translation
+            except Exception as e:
+                self._fail(translator)
+                error = e
+        raise error
+
+    def get_usage(self):
+        return None
+
+    def get_token_count(self):
+        counts = [translator.get_token_count()
+                  for translator, weight in self.members]
+        counts = [count for count in counts if count is not None]
+        return sum(counts) if len(counts) > 0 else None
+
+    def get_hedge_report(self):
+        reports = [translator.get_hedge_report()
+                   for translator, weight in self.members]
+        reports = [report for report in reports if report is not None]
+        return '\n'.join(reports) if len(reports) > 0 else None
+
+    def get_key_report(self):
+        reports = [translator.get_key_report()
+                   for translator, weight in self.members]
+        reports = [report for report in reports if report is not None]
+        return '\n'.join(reports) if len(reports) > 0 else None
+
+    def get_pool_report(self):
+        return _('Engine pool: {}').format(', '.join(
+            '%s %s' % (translator.name, self.counts[id(translator)])
+            for translator, weight in self.members))
@@ -82,6 +82,7 @@ class VertexAITranslate(GoogleTranslate, GenAI):
         "gemini-2.5-flash-lite-preview-06-17",
         "gemini-2.5-pro",
     ]
+    models_ttl = None
     model: str | None = models[0]
 
     _cached_config: dict[str, Any] = {}
@@ -179,6 +180,9 @@ class VertexAITranslate(GoogleTranslate, GenAI):
             prompt = prompt.replace("<slang>", "the detected source language")
         else:
             prompt = prompt.replace("<slang>", self.source_lang)
+        if self.is_structured():
+            # The translation argument carries the JSON object.
+            return prompt + " " + self.structured_prompt
         if self.merge_enabled:
             prompt += (
                 " Ensure that placeholders matching the pattern {{id_\\d+}} "
@@ -217,6 +221,13 @@ class VertexAITranslate(GoogleTranslate, GenAI):
     def get_result(self, response):
         try:
             data = json.loads(response)
+            # The stable system instruction leads the request, so the models
+            # with implicit caching report the cached part of the prompt.
+            usage = data.get("usageMetadata") or {}
+            self.record_prompt_cache(
+                usage.get("promptTokenCount") or 0,
+                usage.get("cachedContentTokenCount") or 0,
+            )
             if "candidates" not in data or not data["candidates"]:
                 error_info = data.get("error", "No candidates in response")
                 raise UnexpectedResult("Vertex AI Error: " + str(error_info))
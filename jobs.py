@@ -0,0 +1,124 @@
+import time
+
+from qt.core import (
+    Qt, QDialog, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QHeaderView,
+    QTableWidget, QTableWidgetItem, QTableWidgetSelectionRange, QTimer)
+
+from .lib.utils import size_by_unit
+from .lib.scheduler import ScheduledBook
+from .components import Footer
+
+
+load_translations()
+
+
+class BookQueue(QDialog):
+    """List the books scheduled by the batch mode, and let them be paused,
+    resumed or moved to the front of the queue."""
+    def __init__(self, plugin, parent):
+        QDialog.__init__(self, parent)
+        self.plugin = plugin
+        self.gui = parent
+        self.books: list[ScheduledBook] = []
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.table_widget(), 1)
+        layout.addWidget(self.control_widget())
+        layout.addWidget(Footer())
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(2000)
+        self.finished.connect(self.timer.stop)
+        self.refresh()
+
+    def table_widget(self):
+        self.table = QTableWidget()
+        self.table.setAlternatingRowColors(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        headers = (
+            _('Title'), _('Status'), _('Length'), _('Estimated Completion'))
+        self.table.setColumnCount(len(headers))
+        self.table.setHorizontalHeaderLabels(headers)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.itemSelectionChanged.connect(self.update_buttons)
+        return self.table
+
+    def control_widget(self):
+        widget = QWidget()
+        layout = QHBoxLayout(widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.first_button = QPushButton(_('Move to Front'))
+        self.pause_button = QPushButton(_('Pause'))
+        self.resume_button = QPushButton(_('Resume'))
+        layout.addStretch(1)
+        layout.addWidget(self.first_button)
+        layout.addWidget(self.pause_button)
+        layout.addWidget(self.resume_button)
+
+        self.first_button.clicked.connect(self.move_to_front)
+        self.pause_button.clicked.connect(
+            lambda: self.apply(self.scheduler.pause))
+        self.resume_button.clicked.connect(
+            lambda: self.apply(self.scheduler.resume))
+        return widget
+
+    def selected_books(self):
+        rows = {index.row() for index in self.table.selectedIndexes()}
+        return [self.books[row] for row in sorted(rows)]
+
+    def update_buttons(self):
+        states = {book.state for book in self.selected_books()}
+        self.first_button.setEnabled(ScheduledBook.QUEUED in states)
+        self.pause_button.setEnabled(bool(states & {
+            ScheduledBook.QUEUED, ScheduledBook.RUNNING}))
+        self.resume_button.setEnabled(bool(states & {
+            ScheduledBook.PAUSED, ScheduledBook.FAILED}))
+
+    @property
+    def scheduler(self):
+        # The scheduler is created once the first batch is started.
+        return self.gui.bookfere_ebook_translator.scheduler
+
+    def apply(self, action):
+        for book in self.selected_books():
+            action(book)
+        self.refresh()
+
+    def move_to_front(self):
+        priority = max(book.priority for book in self.scheduler.books)
+        for book in self.selected_books():
+            self.scheduler.set_priority(book, priority + 1)
+        self.refresh()
+
+    def refresh(self):
+        if self.scheduler is None:
+            self.update_buttons()
+            return
+        selected = self.selected_books()
+        self.books = self.scheduler.books[:]
+        estimates = self.scheduler.get_estimates()
+        self.table.setRowCount(len(self.books))
+        for row, book in enumerate(self.books):
+            estimate = estimates.get(book)
+            if book.finished_at is not None:
+                estimate = book.finished_at
+            estimate = '-' if estimate is None else time.strftime(
+                '%Y-%m-%d %H:%M', time.localtime(estimate))
+            items = (
+                book.ebook.title, book.get_state_name(),
+                '-' if book.size is None
+                else '%sK' % size_by_unit(book.size), estimate)
+            for column, text in enumerate(items):
+                item = QTableWidgetItem(str(text))
+                if column > 0:
+                    item.setTextAlignment(Qt.AlignCenter)
+                self.table.setItem(row, column, item)
+            if book in selected:
+                self.table.setRangeSelected(QTableWidgetSelectionRange(
+                    row, 0, row, len(items) - 1), True)
+        self.table.resizeColumnsToContents()
+        self.update_buttons()
@@ -1,6 +1,7 @@
 import os
 import re
 import json
+import time
 import shutil
 import sqlite3
 import os.path
@@ -10,6 +11,7 @@ from glob import glob
 
 from .utils import size_by_unit
 from .config import get_config
+from .metrics import timed
 
 
 load_translations()
@@ -74,13 +76,17 @@ def default_cache_path():
 
 
 def cache_path():
-    config = get_config()
+    config = get_config(snapshot=True)
     path = config.get('cache_path')
     if path and os.path.exists(path):
         return path
     return default_cache_path()
 
 
+def _casefold(value):
+    return value.casefold() if isinstance(value, str) else value
+
+
 class TranslationCache:
     fresh = True
     dir_path = cache_path()
@@ -95,11 +101,10 @@ class TranslationCache:
         self.identity = identity
         self.persistence = persistence
         self.file_path = self._path(identity)
-        # An interruption may occur, resulting in the cache size being less
-        # than 50,000 bytes. Therefore, we need to resave it again.
-        if os.path.exists(self.file_path) and self.size() > 50000:
-            self.fresh = False
+        existed = os.path.exists(self.file_path)
         self.cache_only = False
+        # The extracted content is replaced once saved.
+        self.stale = False
         self.connection = sqlite3.connect(
             self.file_path, check_same_thread=False)
         self.cursor = self.connection.cursor()
@@ -111,6 +116,70 @@ class TranslationCache:
             'target_lang DEFAULT NULL)')
         self.cursor.execute(
             'CREATE TABLE IF NOT EXISTS info(key UNIQUE, value)')
+        self.cursor.execute(
+            'CREATE TABLE IF NOT EXISTS batch_job('
+            'batch_id UNIQUE, provider, file_id, status, custom_ids, '
+            'output DEFAULT NULL, attempt DEFAULT 0, created_at, updated_at)')
+        # The search index is created on the first search.
+        self.searchable = None
+        self.connection.create_function(
+            'casefold', 1, _casefold, deterministic=True)
+
+        checkpoint = self.get_checkpoint()
+        if checkpoint is not None:
+            # The content may only be partly saved if the job was stopped
+            # while extracting it, so it needs to be saved again.
+            self.fresh = checkpoint.get('phase') == 'extracting'
+        # An interruption may occur, resulting in the cache size being less
+        # than 50,000 bytes. Therefore, we need to resave it again.
+        elif existed and self.size() > 50000:
+            self.fresh = False
+
+    def _create_search_index(self):
+        """Maintain a full-text index of the raw, original and translation
+        columns, which is kept in sync with the cache table by triggers. The
+        trigram tokenizer preserves the substring semantics of filtering.
+        The index is created once per file and indexes the existing data.
+        """
+        resource = self.cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' "
+            "AND name='cache_search'")
+        if resource.fetchone() is not None:
+            return True
+        try:
+            self.cursor.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS cache_search USING fts5('
+                'raw, original, translation, content=cache, '
+                'content_rowid=id, tokenize=trigram)')
+        except sqlite3.OperationalError:
+            # FTS5 or the trigram tokenizer is unavailable.
+            return False
+        self.cursor.execute(
+            'CREATE TRIGGER IF NOT EXISTS cache_search_insert '
+            'AFTER INSERT ON cache BEGIN '
+            'INSERT INTO cache_search(rowid, raw, original, translation) '
+            'VALUES (new.id, new.raw, new.original, new.translation); END')
+        self.cursor.execute(
+            'CREATE TRIGGER IF NOT EXISTS cache_search_delete '
+            'AFTER DELETE ON cache BEGIN '
+            'INSERT INTO cache_search('
+            'cache_search, rowid, raw, original, translation) '
+            "VALUES ('delete', old.id, old.raw, old.original, "
+            'old.translation); END')
+        self.cursor.execute(
+            'CREATE TRIGGER IF NOT EXISTS cache_search_update '
+            'AFTER UPDATE OF raw, original, translation ON cache BEGIN '
+            'INSERT INTO cache_search('
+            'cache_search, rowid, raw, original, translation) '
+            "VALUES ('delete', old.id, old.raw, old.original, "
+            'old.translation); '
+            'INSERT INTO cache_search(rowid, raw, original, translation) '
+            'VALUES (new.id, new.raw, new.original, new.translation); END')
+        # Index the data saved before the index was created.
+        self.cursor.execute(
+            "INSERT INTO cache_search(cache_search) VALUES ('rebuild')")
+        self.connection.commit()
+        return True
 
     @classmethod
     def move(cls, dest):
@@ -154,6 +223,59 @@ class TranslationCache:
             cache.close()
         return names
 
+    @classmethod
+    def pending_size(cls, identity):
+        """The characters left to translate in an existing cache, or None if
+        the cache does not exist."""
+        file_path = os.path.join(cls.cache_path, '%s.db' % identity)
+        if not os.path.exists(file_path):
+            return None
+        connection = sqlite3.connect(file_path)
+        try:
+            size = connection.execute(
+                'SELECT SUM(LENGTH(original)) FROM cache '
+                'WHERE translation IS NULL AND NOT ignored').fetchone()[0]
+        except sqlite3.Error:
+            return None
+        finally:
+            connection.close()
+        return size or 0
+
+    @classmethod
+    def find_by_info(cls, key, value, exclude=None):
+        """The identity of an existing cache with the information, except the
+        one to be excluded, or None if there is no such cache."""
+        for file_path in glob(os.path.join(cls.cache_path, '*.db')):
+            identity = os.path.splitext(os.path.basename(file_path))[0]
+            if identity == exclude:
+                continue
+            connection = sqlite3.connect(file_path)
+            try:
+                result = connection.execute(
+                    'SELECT value FROM info WHERE key=?', (key,)).fetchone()
+            except sqlite3.Error:
+                continue
+            finally:
+                connection.close()
+            if result is not None and result[0] == value:
+                return identity
+        return None
+
+    @classmethod
+    def originals(cls, identity):
+        """The extracted content of an existing cache without translations,
+        in the form accepted by the method ``save``."""
+        file_path = os.path.join(cls.cache_path, '%s.db' % identity)
+        connection = sqlite3.connect(file_path)
+        try:
+            return connection.execute(
+                'SELECT id, md5, raw, original, ignored, attributes, page '
+                'FROM cache ORDER BY id').fetchall()
+        except sqlite3.Error:
+            return []
+        finally:
+            connection.close()
+
     def _path(self, name):
         if not os.path.exists(self.dir_path):
             os.mkdir(self.dir_path)
@@ -197,11 +319,94 @@ class TranslationCache:
             'DELETE FROM info WHERE key=?', (key,))
         self.connection.commit()
 
+    def get_checkpoint(self):
+        """The phase reached by the last job, which is one of extracting,
+        translating, output and done, along with the fingerprint of the
+        source it was extracted from."""
+        checkpoint = self.get_info('checkpoint')
+        try:
+            return json.loads(checkpoint) if checkpoint else None
+        except ValueError:
+            return None
+
+    def set_checkpoint(self, phase, **details):
+        checkpoint = self.get_checkpoint() or {}
+        checkpoint.update(details, phase=phase, time=time.time())
+        self.set_info('checkpoint', json.dumps(checkpoint))
+
+    def resume(self, fingerprint):
+        """Return the checkpoint to resume from, or None if the job starts
+        over. If the source has changed since the checkpoint, its content is
+        extracted again while the translations are kept."""
+        checkpoint = self.get_checkpoint()
+        if checkpoint is not None \
+                and checkpoint.get('fingerprint') not in (None, fingerprint):
+            self.fresh = self.stale = True
+            checkpoint = None
+        if self.is_fresh():
+            self.set_checkpoint('extracting', fingerprint=fingerprint)
+        else:
+            self.set_checkpoint('translating', fingerprint=fingerprint)
+        return checkpoint
+
+    def get_progress(self):
+        """The number of translated paragraphs and of all paragraphs."""
+        resource = self.cursor.execute(
+            'SELECT COUNT(translation), COUNT(*) FROM cache WHERE NOT ignored')
+        return resource.fetchone()
+
+    def save_batch_job(self, provider, job):
+        """Insert or update the record of a batch job. The status is one of
+        submitted, in_progress, completed, partial, failed, cancelled and
+        applied.
+        """
+        now = time.time()
+        self.cursor.execute(
+            'INSERT INTO batch_job VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?8) '
+            'ON CONFLICT (batch_id) DO UPDATE SET status=excluded.status, '
+            'output=excluded.output, updated_at=excluded.updated_at',
+            (job['batch_id'], provider, job.get('file_id'), job['status'],
+             json.dumps(job.get('custom_ids', [])), job.get('output'),
+             job.get('attempt', 0), now))
+        self.connection.commit()
+
+    def get_batch_jobs(self, provider):
+        resource = self.cursor.execute(
+            'SELECT batch_id, file_id, status, custom_ids, output, attempt '
+            'FROM batch_job WHERE provider=? ORDER BY created_at', (provider,))
+        jobs = []
+        for batch_id, file_id, status, custom_ids, output, attempt \
+                in resource.fetchall():
+            jobs.append({
+                'batch_id': batch_id, 'file_id': file_id, 'status': status,
+                'custom_ids': json.loads(custom_ids), 'output': output,
+                'attempt': attempt})
+        return jobs
+
+    def del_batch_jobs(self, provider):
+        self.cursor.execute(
+            'DELETE FROM batch_job WHERE provider=?', (provider,))
+        self.connection.commit()
+
+    @timed('cache.save')
     def save(self, original_group):
         if self.is_fresh():
+            translations = []
+            if self.stale:
+                translations = self.cursor.execute(
+                    'SELECT original, translation, engine_name, target_lang '
+                    'FROM cache WHERE translation IS NOT NULL').fetchall()
+                self.cursor.execute('DELETE FROM cache')
             for original_unit in original_group:
                 self.add(*original_unit)
+            # Restore the translations of the content that has not changed.
+            self.cursor.executemany(
+                'UPDATE cache SET translation=?2, engine_name=?3, '
+                'target_lang=?4 WHERE original=?1 AND translation IS NULL',
+                translations)
             self.connection.commit()
+            self.stale = False
+            self.set_checkpoint('translating')
 
     def all(self):
         resource = self.cursor.execute('SELECT * FROM cache WHERE NOT ignored')
@@ -213,6 +418,27 @@ class TranslationCache:
             'SELECT * FROM cache WHERE id IN (%s) ' % placeholders, tuple(ids))
         return resource.fetchall()
 
+    def search(self, keyword, column='original'):
+        """Get the ids of paragraphs whose column contains the keyword,
+        ignoring case. Keywords shorter than a trigram are matched without
+        the index, after folding the case of both sides like the index does.
+        """
+        if column not in ('raw', 'original', 'translation'):
+            raise ValueError('Unsupported search column: %s' % column)
+        if self.searchable is None:
+            self.searchable = self._create_search_index()
+        if self.searchable and len(keyword) > 2:
+            query = '%s : "%s"' % (column, keyword.replace('"', '""'))
+            resource = self.cursor.execute(
+                'SELECT rowid FROM cache_search WHERE cache_search MATCH ?',
+                (query,))
+        else:
+            # LIKE only ignores the case of ASCII letters.
+            resource = self.cursor.execute(
+                'SELECT id FROM cache WHERE INSTR(casefold(%s), ?) > 0'
+                % column, (keyword.casefold(),))
+        return set(row[0] for row in resource.fetchall())
+
     def first(self, **kwargs):
         if kwargs:
             data = ' AND '.join(['%s=?' % column for column in kwargs])
@@ -231,6 +457,7 @@ class TranslationCache:
             (id, md5, raw, original, ignored, attributes, page))
         # self.connection.commit()
 
+    @timed('cache.update')
     def update(self, ids, **kwargs):
         ids = ids if isinstance(ids, list) else [ids]
         data = ', '.join(['%s=?' % column for column in kwargs.keys()])
@@ -259,6 +486,9 @@ class TranslationCache:
         os.path.exists(self.file_path) and os.remove(self.file_path)
 
     def done(self):
+        """Keep the temporary cache until the job is completed, so a job
+        stopped halfway can be resumed."""
+        self.set_checkpoint('done')
         self.persistence or self.destroy()
 
     def paragraph(self, id=None):
@@ -282,6 +512,15 @@ class TranslationCache:
             engine_name=paragraph.engine_name,
             target_lang=paragraph.target_lang)
 
+    def update_paragraphs(self, paragraphs):
+        self.cursor.executemany(
+            'UPDATE cache SET translation=?, engine_name=?, target_lang=? '
+            'WHERE id=?', [(
+                paragraph.translation, paragraph.engine_name,
+                paragraph.target_lang, paragraph.id)
+                for paragraph in paragraphs])
+        self.connection.commit()
+
     def delete_paragraphs(self, paragraphs):
         self.delete([paragraph.id for paragraph in paragraphs])
 
@@ -290,4 +529,4 @@ class TranslationCache:
 
 
 def get_cache(uid):
-    return TranslationCache(uid, get_config().get('cache_enabled'))
+    return TranslationCache(uid, get_config(snapshot=True).get('cache_enabled'))
@@ -1,4 +1,5 @@
 import os
+import copy
 import os.path
 import shutil
 
@@ -42,8 +43,16 @@ defaults = {
     "merge_enabled": False,
     "merge_strategy": "length",  # 新增這一行
     "merge_length": 1800,
+    "subtitle_window": {"enabled": False, "cue_count": 30, "length": 1500},
     "ebook_metadata": {},
     "search_paths": [],
+    "engine_pool": {"enabled": False, "members": []},
+    "job_coordination": True,
+    "book_concurrency": 2,
+    "shortest_book_first": True,
+    "epub_in_place": False,
+    "instrumentation": False,
+    "profiling": False,
 }
 
 
@@ -92,14 +101,51 @@ class Configuration:
 
     def commit(self):
         self.preferences.commit()
+        _snapshots.clear()
 
     def save(self, *args, **kwargs):
         self.update(*args, **kwargs)
         self.commit()
 
 
-def get_config():
-    preferences = JSONConfig("plugins/ebook_translator")
+class ConfigurationSnapshot(Configuration):
+    """A read-only copy of the preferences shared within the process."""
+
+    def __init__(self, preferences, stamp):
+        Configuration.__init__(self, copy.deepcopy(dict(preferences)))
+        self.stamp = stamp
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("The configuration snapshot is read-only.")
+
+    set = update = delete = refresh = commit = save = _read_only
+
+
+config_name = "plugins/ebook_translator"
+_snapshots: dict[str, ConfigurationSnapshot] = {}
+
+
+def _config_stamp():
+    path = os.path.join(config_dir, *config_name.split("/"))
+    try:
+        stat = os.stat(path + JSONConfig.EXTENSION)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def get_config(snapshot=False):
+    """:snapshot: Return the shared read-only configuration instead of loading
+    the settings file again. It is reloaded once the file has been modified.
+    """
+    if snapshot:
+        stamp = _config_stamp()
+        config = _snapshots.get(config_name)
+        if config is None or config.stamp != stamp:
+            config = ConfigurationSnapshot(get_config().preferences, stamp)
+            _snapshots[config_name] = config
+        return config
+    preferences = JSONConfig(config_name)
     preferences.defaults = defaults
     return Configuration(preferences)
 
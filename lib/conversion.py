@@ -1,6 +1,11 @@
 import os
+import json
+import time
+import shutil
 import os.path
 from types import MethodType
+from functools import partial
+from contextlib import nullcontext
 from typing import Callable, Any
 from tempfile import gettempdir
 
@@ -17,12 +22,17 @@ from .. import EbookTranslator
 
 from .config import get_config
 from .utils import sep, uid, open_path, open_file
-from .cache import get_cache
+from .cache import get_cache, TranslationCache
 from .element import (
-    get_element_handler, get_srt_elements, get_toc_elements, get_page_elements,
-    get_metadata_elements, get_pgn_elements)
-from .translation import get_translator, get_translation
-from .exception import ConversionAbort
+    get_element_handler, get_merge_length, get_srt_elements, get_toc_elements,
+    get_page_elements, get_metadata_elements, get_pgn_elements,
+    get_vtt_elements, get_ass_elements, read_srt, read_vtt, read_ass,
+    TocElement)
+from .epub import EpubContainer
+from .translation import get_translator, get_translation, get_engine_name
+from .scheduler import BookScheduler, ScheduledBook
+from .metrics import spans, profiler, get_profile_path, get_report_path
+from .exception import ConversionAbort, UnsupportedEpub
 
 
 load_translations()
@@ -54,25 +64,32 @@ def convert_book(
     plumber = Plumber(
         input_path, output_path, log=log, report_progress=notification)
     _convert = plumber.output_plugin.convert
+    metrics = translation.metrics
     elements = []
 
     def convert(self, oeb, output_path, input_plugin, opts, log):
+        # The input is read and transformed by calibre before the output.
+        metrics.add_phase('extract', time.monotonic() - start)
         backup_progress = self.report_progress.global_min
         self.report_progress = CompositeProgressReporter(0, 1, notification)
         log.info('Translating ebook content... (this will take a while)')
         log.info(debug_info)
         translation.set_progress(self.report_progress)
 
-        elements.extend(get_metadata_elements(oeb.metadata))
-        # The number of elements may vary with format conversion.
-        elements.extend(get_toc_elements(oeb.toc.nodes, []))
-        elements.extend(get_page_elements(oeb.manifest.items))
-        original_group = element_handler.prepare_original(elements)
-        cache.save(original_group)
+        with metrics.phase('extract'):
+            elements.extend(get_metadata_elements(oeb.metadata))
+            # The number of elements may vary with format conversion.
+            elements.extend(get_toc_elements(oeb.toc.nodes, []))
+            elements.extend(get_page_elements(oeb.manifest.items))
+        with metrics.phase('prepare'):
+            original_group = element_handler.prepare_original(elements)
+        with metrics.phase('cache_save'):
+            cache.save(original_group)
 
         paragraphs = cache.all_paragraphs()
         translation.handle(paragraphs)
-        element_handler.add_translations(paragraphs)
+        with metrics.phase('output'):
+            element_handler.add_translations(paragraphs)
 
         log(sep())
         log(_('Start to convert ebook format...'))
@@ -81,62 +98,160 @@ def convert_book(
         self.report_progress = CompositeProgressReporter(
             backup_progress, 1, notification)
         self.report_progress(0., _('Outputting ebook file...'))
-        _convert(oeb, output_path, input_plugin, opts, log)
+        cache.set_checkpoint('output')
+        with metrics.phase('output'):
+            _convert(oeb, output_path, input_plugin, opts, log)
 
     plumber.output_plugin.convert = MethodType(convert, plumber.output_plugin)
+    start = time.monotonic()
     plumber.run()
 
 
-def convert_srt(
+def convert_epub(
         input_path, output_path, translation, element_handler, cache,
         debug_info, encoding, notification) -> None:
+    """Translate the EPUB file without converting it with calibre. Only the
+    documents containing extracted content are written again."""
+    metrics = translation.metrics
+    start = time.monotonic()
+    try:
+        container = EpubContainer(input_path)
+        metadata_elements = get_metadata_elements(container.get_metadata())
+        toc_elements = [
+            TocElement(item, 'toc.ncx') for item in container.get_toc_items()]
+        pages = container.get_pages()
+    except UnsupportedEpub as e:
+        log.warning(
+            _('Failed to edit the EPUB file in place: {}').format(e))
+        return convert_book(
+            input_path, output_path, translation, element_handler, cache,
+            debug_info, encoding, notification)
+
+    log.info('Translating ebook content... (this will take a while)')
+    log.info(debug_info)
+
+    page_elements = list(get_page_elements(pages))
+    elements = metadata_elements + toc_elements + page_elements
+    metrics.add_phase('extract', time.monotonic() - start)
+    with metrics.phase('prepare'):
+        original_group = element_handler.prepare_original(elements)
+    with metrics.phase('cache_save'):
+        cache.save(original_group)
+
+    paragraphs = cache.all_paragraphs()
+    translation.set_progress(notification)
+    translation.handle(paragraphs)
+
+    log(sep())
+    log(_('Starting to output ebook file...'))
+    log(sep())
+    cache.set_checkpoint('output')
+
+    with metrics.phase('output'):
+        element_handler.add_translations(paragraphs)
+        names = {container.get_page_name(element.page_id)
+                 for element in page_elements}
+        if any(not element.ignored for element in metadata_elements):
+            names.add(container.opf_name)
+        if len(toc_elements) > 0:
+            names.add(container.toc_name)
+        try:
+            container.save(output_path, names)
+        finally:
+            container.close()
+
+    log(_('The translation of the EPUB file was completed.'))
+
+
+def convert_subtitles(
+        input_path, output_path, translation, element_handler, cache,
+        debug_info, encoding, notification, reader, separator) -> None:
+    """Translate the cues read by the reader, then write the output while
+    reading the file again, so the other content is not kept in memory.
+    :reader: A generator yielding the cues as elements, and the other
+    content as strings to be output as they are.
+    :separator: The string between the items yielded by the reader.
+    """
     log.info('Translating subtitles content... (this will take a while)')
     log.info(debug_info)
 
-    elements = get_srt_elements(input_path, encoding)
-    original_group = element_handler.prepare_original(elements)
-    cache.save(original_group)
+    metrics = translation.metrics
+    with metrics.phase('extract'):
+        elements = [
+            item for item in reader(input_path, encoding)
+            if not isinstance(item, str)]
+    with metrics.phase('prepare'):
+        original_group = element_handler.prepare_original(elements)
+    with metrics.phase('cache_save'):
+        cache.save(original_group)
 
     paragraphs = cache.all_paragraphs()
     translation.set_progress(notification)
     translation.handle(paragraphs)
-    element_handler.add_translations(paragraphs)
 
     log(sep())
     log(_('Starting to output subtitles file...'))
     log(sep())
+    cache.set_checkpoint('output')
 
-    with open(output_path, 'w') as file:
-        file.write('\n\n'.join([e.get_translation() for e in elements]))
+    with metrics.phase('output'):
+        element_handler.add_translations(paragraphs)
+        cues = iter(elements)
+        with open(output_path, 'w', encoding='utf-8') as file:
+            for index, item in enumerate(reader(input_path, encoding)):
+                if index > 0:
+                    file.write(separator)
+                if not isinstance(item, str):
+                    item = next(cues).get_translation()
+                file.write(item)
+            file.write('\n')
 
     log(_('The translation of the subtitles file was completed.'))
 
 
+convert_srt = partial(convert_subtitles, reader=read_srt, separator='\n\n')
+convert_vtt = partial(convert_subtitles, reader=read_vtt, separator='\n\n')
+convert_ass = partial(convert_subtitles, reader=read_ass, separator='\n')
+
+
 def convert_pgn(
         input_path, output_path, translation, element_handler, cache,
         debug_info, encoding, notification) -> None:
     log.info('Translating PGN content... (this may be take a while)')
     log.info(debug_info)
 
-    elements = get_pgn_elements(input_path, encoding)
-    original_group = element_handler.prepare_original(elements)
-    cache.save(original_group)
+    metrics = translation.metrics
+    with metrics.phase('extract'):
+        elements = get_pgn_elements(input_path, encoding)
+    with metrics.phase('prepare'):
+        original_group = element_handler.prepare_original(elements)
+    with metrics.phase('cache_save'):
+        cache.save(original_group)
 
     paragraphs = cache.all_paragraphs()
     translation.set_progress(notification)
     translation.handle(paragraphs)
-    element_handler.add_translations(paragraphs)
 
     log(sep())
     log(_('Starting to output PGN file...'))
     log(sep())
+    cache.set_checkpoint('output')
 
-    pgn_content = open_file(input_path, encoding)
-    for element in elements:
-        pgn_content = pgn_content.replace(
-            element.get_raw(), element.get_translation(), 1)
-    with open(output_path, 'w', encoding='utf-8') as file:
-        file.write(pgn_content)
+    with metrics.phase('output'):
+        element_handler.add_translations(paragraphs)
+        # Assemble the content from the segments between the comments in
+        # one pass, instead of searching for each comment from the start.
+        pgn_content = open_file(input_path, encoding)
+        segments = []
+        position = 0
+        for element in elements:
+            start, end = element.span
+            segments.append(pgn_content[position:start])
+            segments.append(element.get_translation())
+            position = end
+        segments.append(pgn_content[position:])
+        with open(output_path, 'w', encoding='utf-8') as file:
+            file.write(''.join(segments))
 
     log(_('The translation of the PGN file was completed.'))
 
@@ -146,6 +261,18 @@ extra_formats = {
         'extractor': get_srt_elements,
         'convertor': convert_srt,
     },
+    'vtt': {
+        'extractor': get_vtt_elements,
+        'convertor': convert_vtt,
+    },
+    'ass': {
+        'extractor': get_ass_elements,
+        'convertor': convert_ass,
+    },
+    'ssa': {
+        'extractor': get_ass_elements,
+        'convertor': convert_ass,
+    },
     'pgn': {
         'extractor': get_pgn_elements,
         'convertor': convert_pgn,
@@ -186,6 +313,48 @@ def extract_book(input_path, encoding):
         return elements
 
 
+def get_cache_id(input_path, engine_name, target_lang, merge_length, encoding):
+    _encoding = ''
+    if encoding.lower() != 'utf-8':
+        _encoding = encoding.lower()
+    return uid(
+        input_path + engine_name + target_lang + str(merge_length) + _encoding)
+
+
+# The options that change the content extracted from an ebook.
+extraction_options = (
+    'ebook_metadata.metadata_translation', 'priority_rules', 'rule_mode',
+    'filter_scope', 'filter_rules', 'ignore_rules', 'element_rules',
+    'reserve_rules', 'translation_position', 'merge_enabled',
+    'merge_strategy', 'merge_length', 'subtitle_window')
+
+
+def get_extraction_key(
+        input_path, input_format, encoding, placeholder, separator,
+        direction):
+    """Identify the content extracted from the ebook file by its size and
+    modification time along with the options used to extract it, so it can
+    be reused whatever the engine or target language is.
+    """
+    config = get_config(snapshot=True)
+    stat = os.stat(input_path)
+    options = [config.get(name) for name in extraction_options]
+    return uid(json.dumps([
+        input_path, stat.st_size, stat.st_mtime_ns, input_format,
+        encoding.lower(), placeholder, separator, direction, options],
+        default=str))
+
+
+def get_book_size(ebook, engine_name):
+    """The characters left to translate in the cache of the ebook, or None
+    if it has not been cached, as the size of its file is not comparable.
+    """
+    cache_id = get_cache_id(
+        ebook.get_input_path(), engine_name, ebook.target_lang,
+        get_merge_length(ebook.input_format), ebook.encoding)
+    return TranslationCache.pending_size(cache_id)
+
+
 def convert_item(
         ebook_title, input_path, output_path, source_lang, target_lang,
         cache_only, is_batch, format, encoding, direction, notification):
@@ -193,21 +362,24 @@ def convert_item(
     :cache_only: Only use the translation which exists in the cache.
     :notification: It is automatically added by arbitrary_n.
     """
+    config = get_config(snapshot=True)
+    spans.set_enabled(config.get('instrumentation'))
+    spans.reset()
+
     translator = get_translator()
     translator.set_source_lang(source_lang)
     translator.set_target_lang(target_lang)
 
     element_handler = get_element_handler(
-        translator.placeholder, translator.separator, direction)
+        translator.placeholder, translator.separator, direction, format)
     element_handler.set_translation_lang(
         translator.get_iso639_target_code(target_lang))
+    # Subtitle cues may be merged even if merging is disabled.
+    translator.set_merge_enabled(element_handler.get_merge_length() > 0)
 
     merge_length = str(element_handler.get_merge_length())
-    _encoding = ''
-    if encoding.lower() != 'utf-8':
-        _encoding = encoding.lower()
-    cache_id = uid(
-        input_path + translator.name + target_lang + merge_length + _encoding)
+    cache_id = get_cache_id(
+        input_path, translator.name, target_lang, merge_length, encoding)
     cache = get_cache(cache_id)
     cache.set_cache_only(cache_only)
     cache.set_info('title', ebook_title)
@@ -216,6 +388,15 @@ def convert_item(
     cache.set_info('merge_length', merge_length)
     cache.set_info('plugin_version', EbookTranslator.__version__)
     cache.set_info('calibre_version', __version__)
+    fingerprint = get_extraction_key(
+        input_path, format, encoding, translator.placeholder,
+        translator.separator, direction)
+    checkpoint = cache.resume(fingerprint)
+    if checkpoint is not None and checkpoint.get('phase') != 'done':
+        translated, total = cache.get_progress()
+        log.info(_(
+            'Resuming from the checkpoint: {}, {}/{} paragraphs translated.'
+        ).format(checkpoint.get('phase'), translated, total))
 
     translation = get_translation(
         translator, lambda text, error=False: log.info(text))
@@ -240,9 +421,31 @@ def convert_item(
 
     handler = extra_formats.get(format)
     convertor = convert_book if handler is None else handler['convertor']
-    convertor(
-        input_path, output_path, translation, element_handler, cache,
-        debug_info, encoding, notification)
+    if format.lower() == 'epub' and output_path.lower().endswith('.epub') \
+            and config.get('epub_in_place'):
+        convertor = convert_epub
+    profiling = config.get('profiling')
+    try:
+        with profiler.profile() if profiling else nullcontext():
+            convertor(
+                input_path, output_path, translation, element_handler, cache,
+                debug_info, encoding, notification)
+    finally:
+        if profiling:
+            # It is moved next to the job log once the job is done.
+            profiler.dump_stats(get_profile_path(output_path))
+            log(_('The profile is saved next to the job log, with the '
+                  'extension .prof.'))
+    report = json.dumps(translation.metrics.get_report())
+    cache.set_info('performance_report', report)
+    # The temporary cache is removed when done, so the report is also kept
+    # with the job log.
+    with open(get_report_path(output_path), 'w') as file:
+        file.write(report)
+    log(_('The performance report is saved next to the job log, with the '
+          'extension .json.'))
+    log(sep())
+    log(translation.metrics.get_summary())
     cache.done()
 
 
@@ -277,9 +480,51 @@ class ConversionWorker:
             description=(_('[{} > {}] Translating "{}"').format(
                 ebook.source_lang, ebook.target_lang, ebook.title)))
         self.working_jobs[job] = (ebook, output_path)
+        return job
+
+    def get_scheduler(self):
+        """The scheduler of the batch mode, which is shared by the workers
+        while calibre is running."""
+        status = self.gui.bookfere_ebook_translator
+        if status.scheduler is None:
+            status.scheduler = BookScheduler(
+                lambda ebook: self.translate_ebook(ebook, is_batch=True),
+                self.stop_job)
+        status.scheduler.limit = self.config.get('book_concurrency', 2)
+        status.scheduler.shortest_first = self.config.get(
+            'shortest_book_first', True)
+        return status.scheduler
+
+    def stop_job(self, job):
+        # The job manager shows its errors in a dialog over the view.
+        self.gui.job_manager.kill_job(job, self.gui)
+
+    def schedule_ebooks(self, ebooks):
+        scheduler = self.get_scheduler()
+        engine_name = get_engine_name()
+        for ebook in ebooks:
+            scheduler.add(ebook, get_book_size(ebook, engine_name))
+        scheduler.schedule()
+
+    def save_reports(self, job, output_path):
+        """Move the performance report and the profile of the job next to
+        its log, which are named after the log."""
+        for path, extension in (
+                (get_report_path(output_path), '.json'),
+                (get_profile_path(output_path), '.prof')):
+            if os.path.exists(path):
+                shutil.move(
+                    path, os.path.splitext(job.log_path)[0] + extension)
 
     def translate_done(self, job):
         ebook, output_path = self.working_jobs.pop(job)
+        self.save_reports(job, output_path)
+
+        scheduler = self.gui.bookfere_ebook_translator.scheduler
+        book = scheduler and scheduler.done(job, job.failed)
+        # The job was stopped to pause the book.
+        if book is not None and book.state == ScheduledBook.PAUSED:
+            return
 
         if job.failed:
             DEBUG or self.gui.job_exception(
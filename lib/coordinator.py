@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+import hashlib
+from threading import Lock
+
+from calibre.constants import config_dir
+
+
+if sys.platform == 'win32':
+    import msvcrt
+
+    def _try_lock(file):
+        try:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(file):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(file):
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+class SlotCoordinator:
+    """Share the concurrency limit and request interval of an engine, or of
+    one of its API keys, with all the running job processes. Each slot is a
+    locked file, which the system releases even if the process holding it
+    is killed. A slot also records the time from which it can be used
+    again.
+    """
+    # The maximum seconds to sleep before looking for a free slot again.
+    poll_interval = 0.5
+    # The time is written with a fixed width, so the locked file does not
+    # need to be truncated, which is unreliable on Windows.
+    time_width = 32
+
+    def __init__(self, directory, name, concurrency_limit, request_interval):
+        self.paths = [
+            os.path.join(directory, '%s-%s.lock' % (name, index))
+            for index in range(concurrency_limit)]
+        self.request_interval = request_interval
+
+    def _open(self, path):
+        return open(path, 'r+', opener=lambda path, flags: os.open(
+            path, flags | os.O_CREAT, 0o600))
+
+    def _read_time(self, file):
+        file.seek(0)
+        try:
+            return float(file.read().strip() or 0)
+        except ValueError:
+            return 0.0
+
+    def _try_acquire(self):
+        """Return a free slot, or the seconds until one may be available."""
+        wait = self.poll_interval
+        for path in self.paths:
+            file = self._open(path)
+            if not _try_lock(file):
+                file.close()
+                continue
+            available_time = self._read_time(file)
+            if available_time <= time.time():
+                return file
+            wait = min(wait, available_time - time.time())
+            _unlock(file)
+            file.close()
+        return max(0.0, wait)
+
+    def try_acquire(self):
+        """Return a free slot without waiting, or None."""
+        slot = self._try_acquire()
+        return None if isinstance(slot, float) else slot
+
+    def acquire(self):
+        while True:
+            slot = self._try_acquire()
+            if not isinstance(slot, float):
+                return slot
+            time.sleep(slot)
+
+    def release(self, slot):
+        """Free the slot for the next request after the request interval."""
+        try:
+            slot.seek(0)
+            slot.write(str(time.time() + self.request_interval).ljust(
+                self.time_width))
+            slot.flush()
+            _unlock(slot)
+        finally:
+            slot.close()
+
+    def hold(self, slot, generator):
+        """Release the slot once the streaming response is read."""
+        try:
+            yield from generator
+        finally:
+            self.release(slot)
+
+
+_coordinators: dict[tuple, SlotCoordinator] = {}
+_coordinators_lock = Lock()
+
+
+def get_coordinator(name, api_key, concurrency_limit, request_interval):
+    """The coordinator shared by the translators of the engine and API key
+    in this process. The API key is not stored, only its digest.
+    """
+    key = (name, api_key, concurrency_limit, request_interval)
+    with _coordinators_lock:
+        if key not in _coordinators:
+            directory = os.path.join(
+                config_dir, 'plugins', 'ebook_translator_slots')
+            os.makedirs(directory, exist_ok=True)
+            digest = hashlib.sha1(
+                ('%s %s' % (name, api_key)).encode('utf-8')).hexdigest()
+            _coordinators[key] = SlotCoordinator(
+                directory, digest[:16], concurrency_limit, request_interval)
+        return _coordinators[key]
@@ -0,0 +1,111 @@
+import os
+import json
+import time
+from threading import Lock, Thread
+
+from calibre.constants import config_dir
+
+
+class CredentialCache:
+    """Keep the short-lived credentials, e.g. access tokens, in a file that
+    only the current user can read, so the job processes do not need to
+    fetch them again for each book. A credential about to expire is
+    refreshed in the background while the current one is still in use.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        self.refreshing: set[str] = set()
+        self._lock = Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _save(self, name, value, expires):
+        """Merge the credential into the file, which is replaced at once so
+        no other process can read a partial file."""
+        with self._lock:
+            self.entries[name] = {'value': value, 'expires': expires}
+            entries = self._load()
+            entries[name] = self.entries[name]
+            now = time.time()
+            entries = {key: entry for key, entry in entries.items()
+                       if entry.get('expires', 0) > now}
+            temp_path = '%s.%s.tmp' % (self.path, os.getpid())
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                descriptor = os.open(
+                    temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+                    json.dump(entries, file)
+                os.replace(temp_path, self.path)
+            except OSError:
+                # The credential is still kept in the memory.
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def _get_entry(self, name):
+        now = time.time()
+        entry = self.entries.get(name)
+        if entry is None or entry['expires'] <= now:
+            entry = self._load().get(name)
+            if not isinstance(entry, dict) or entry.get('expires', 0) <= now:
+                return None
+            self.entries[name] = entry
+        return entry
+
+    def _refresh(self, name, fetch):
+        try:
+            self._save(name, *fetch())
+        except Exception:
+            # Fetch it again when it is needed.
+            pass
+        finally:
+            with self._lock:
+                self.refreshing.discard(name)
+
+    def get(self, name, fetch, ahead=300.0, force=False):
+        """:fetch: A function returning the credential and the timestamp at
+        which it expires.
+        :ahead: The seconds before expiry to start refreshing it.
+        :force: Fetch it again even if it has not expired.
+        """
+        entry = None if force else self._get_entry(name)
+        if entry is None:
+            value, expires = fetch()
+            self._save(name, value, expires)
+            return value
+        if entry['expires'] - time.time() < ahead:
+            with self._lock:
+                refresh = name not in self.refreshing
+                self.refreshing.add(name)
+            if refresh:
+                Thread(target=self._refresh, args=(name, fetch),
+                       daemon=True).start()
+        return entry['value']
+
+
+_credential_cache: CredentialCache | None = None
+_model_cache: CredentialCache | None = None
+
+
+def get_credential_cache():
+    global _credential_cache
+    if _credential_cache is None:
+        _credential_cache = CredentialCache(os.path.join(
+            config_dir, 'plugins', 'ebook_translator_credentials.json'))
+    return _credential_cache
+
+
+def get_model_cache():
+    """The model lists of the engines, kept in the same way."""
+    global _model_cache
+    if _model_cache is None:
+        _model_cache = CredentialCache(os.path.join(
+            config_dir, 'plugins', 'ebook_translator_models.json'))
+    return _model_cache
@@ -16,6 +16,7 @@ from .utils import (
     create_xpath,
 )
 from .config import get_config
+from .metrics import span, timed
 
 
 def get_string(element, remove_ns=False):
@@ -128,10 +129,46 @@ class SrtElement(Element):
                 self.element[2] = "%s\n%s" % (translation, self.element[2])
 
     def get_translation(self):
-        return "\n".join(self.element)
+        # The identifier of a WebVTT cue is optional.
+        return "\n".join(item for item in self.element if item is not None)
+
+
+class AssElement(Element):
+    """A Dialogue line of ASS/SSA subtitles, which is split into the fields
+    before the text and the text."""
+
+    def get_raw(self):
+        return self.element[1]
+
+    def get_text(self):
+        text = re.sub(r"\{[^}]*\}", "", self.get_raw())
+        return re.sub(r"\\[Nn]", "\n", text).strip()
+
+    def get_content(self):
+        return self.get_text()
+
+    def add_translation(self, translation=None):
+        if translation is not None:
+            translation = translation.strip().replace("\n", "\\N")
+            if self.position == "only":
+                # Keep the override tags for the position of the line.
+                tags = re.match(r"(\{[^}]*\})*", self.element[1]).group()
+                self.element[1] = tags + translation
+            elif self.position in ("below", "right"):
+                self.element[1] += "\\N%s" % translation
+            else:
+                self.element[1] = "%s\\N%s" % (translation, self.element[1])
+
+    def get_translation(self):
+        return "".join(self.element)
 
 
 class PgnElement(Element):
+    def __init__(self, element, span=None):
+        super().__init__(element)
+        # The start and end offsets of the comment in the PGN content.
+        self.span = span
+
     def get_raw(self):
         return self.element[0]
 
@@ -587,7 +624,9 @@ class Extraction:
         elements = []
         for page in self.get_sorted_pages():
             body = page.data.find("./x:body", namespaces=ns)
-            elements.extend(self.extract_elements(page.id, body, []))
+            # The span is outside as the extraction is recursive.
+            with span("extraction.extract_elements"):
+                elements.extend(self.extract_elements(page.id, body, []))
         return filter(self.filter_content, elements)
 
     def is_priority(self, element):
@@ -725,6 +764,7 @@ class ElementHandler:
         )
         self.reserve_pattern = create_xpath(default_rules + tuple(rules))
 
+    @timed("element_handler.prepare_original")
     def prepare_original(self, elements):
         count = 0
         for oid, element in enumerate(elements):
@@ -760,6 +800,7 @@ class ElementHandler:
             translations[paragraph.original] = paragraph.translation
         return translations
 
+    @timed("element_handler.add_translations")
     def add_translations(self, paragraphs):
         translations = self.prepare_translation(paragraphs)
         for eid, element in self.elements.copy().items():
@@ -779,10 +820,16 @@ class ElementHandlerMerge(ElementHandler):
     def __init__(self, placeholder, separator, position):  # 新增 __init__
         super().__init__(placeholder, separator, position)
         self.merge_strategy = "length"  # 預設策略
+        # The maximum number of elements to merge, or 0 for no limit.
+        self.window_size = 0
 
     def set_merge_strategy(self, strategy):  # 新增這個方法
         self.merge_strategy = strategy
 
+    def set_window_size(self, size):
+        self.window_size = size
+
+    @timed("element_handler.prepare_original")
     def prepare_original(self, elements):
         if self.merge_strategy == "file":
             return self._prepare_original_by_file(elements)
@@ -793,6 +840,7 @@ class ElementHandlerMerge(ElementHandler):
         raw = ""
         txt = ""
         oid = 0
+        count = 0
         for eid, element in enumerate(elements):
             self.elements[eid] = element
             if element.ignored:
@@ -815,9 +863,12 @@ class ElementHandlerMerge(ElementHandler):
                 continue
 
             content += self.separator
-            if len(txt + content) < self.merge_length:
+            if len(txt + content) < self.merge_length and (
+                self.window_size < 1 or count < self.window_size
+            ):
                 raw += code + self.separator
                 txt += content
+                count += 1
                 continue
             elif txt:
                 md5 = uid("%s%s" % (oid, txt))
@@ -825,6 +876,7 @@ class ElementHandlerMerge(ElementHandler):
                 oid += 1
             raw = code
             txt = content
+            count = 1
         md5 = uid("%s%s" % (oid, txt))
         if txt:
             self.originals.append((oid, md5, raw, txt, False))
@@ -925,26 +977,96 @@ class ElementHandlerMerge(ElementHandler):
         return dict(translations)
 
 
+def read_lines(path, encoding):
+    """Read the lines one by one, whatever the line endings are."""
+    with open(path, "r", encoding=encoding, newline=None) as file:
+        for number, line in enumerate(file):
+            line = line.rstrip("\r\n")
+            yield line.lstrip("\ufeff") if number == 0 else line
+
+
+def read_blocks(path, encoding):
+    """Read the blocks of lines separated by one or more blank lines."""
+    block = []
+    for line in read_lines(path, encoding):
+        if line.strip() == "":
+            if len(block) > 0:
+                yield block
+                block = []
+            continue
+        block.append(line)
+    if len(block) > 0:
+        yield block
+
+
+def read_srt(path, encoding):
+    """Read the SubRip cues as elements, and the blocks that are not cues as
+    strings to be output as they are."""
+    for lines in read_blocks(path, encoding):
+        if "-->" in lines[0]:
+            # A cue without the number.
+            yield SrtElement([None, lines[0], "\n".join(lines[1:])])
+        elif len(lines) > 1 and "-->" in lines[1]:
+            yield SrtElement([lines[0], lines[1], "\n".join(lines[2:])])
+        else:
+            yield "\n".join(lines)
+
+
+def read_vtt(path, encoding):
+    """Read the WebVTT cues as elements. The header, notes, styles and
+    regions are read as strings."""
+    for lines in read_blocks(path, encoding):
+        if "-->" in lines[0]:
+            yield SrtElement([None, lines[0], "\n".join(lines[1:])])
+        elif len(lines) > 1 and "-->" in lines[1]:
+            yield SrtElement([lines[0], lines[1], "\n".join(lines[2:])])
+        else:
+            yield "\n".join(lines)
+
+
+def read_ass(path, encoding):
+    """Read the Dialogue lines of ASS/SSA subtitles as elements, and the
+    other lines as strings."""
+    section = None
+    # The number of fields declared by the Format line of the events.
+    fields = 10
+    for line in read_lines(path, encoding):
+        stripped = line.strip()
+        if stripped.startswith("["):
+            section = stripped.lower()
+        elif section == "[events]":
+            if stripped.lower().startswith("format:"):
+                fields = len(stripped.split(","))
+            elif stripped.startswith("Dialogue:"):
+                items = line.split(",", fields - 1)
+                if len(items) == fields:
+                    yield AssElement([",".join(items[:-1]) + ",", items[-1]])
+                    continue
+        yield line
+
+
 def get_srt_elements(path, encoding):
-    elements = []
-    content = open_file(path, encoding)
-    for section in content.strip().split("\n\n"):
-        lines = section.split("\n")
-        number = lines.pop(0)
-        time = lines.pop(0)
-        content = "\n".join(lines)
-        elements.append(SrtElement([number, time, content]))
-    return elements
+    return [item for item in read_srt(path, encoding) if isinstance(item, Element)]
+
+
+def get_vtt_elements(path, encoding):
+    return [item for item in read_vtt(path, encoding) if isinstance(item, Element)]
+
+
+def get_ass_elements(path, encoding):
+    return [item for item in read_ass(path, encoding) if isinstance(item, Element)]
 
 
 def get_pgn_elements(path, encoding):
     pattern = re.compile(r"\{[^}]*[a-zA-z][^}]*\}")
-    originals = pattern.findall(open_file(path, encoding))
-    return [PgnElement([original, None]) for original in originals]
+    return [
+        PgnElement([match.group(), None], match.span())
+        for match in pattern.finditer(open_file(path, encoding))
+    ]
 
 
 def get_metadata_elements(metadata):
-    config = get_config()
+    config = get_config(snapshot=True)
     enable_translation = config.get("ebook_metadata.metadata_translation", False)
     elements = []
     names = (
@@ -981,7 +1103,7 @@ def get_toc_elements(nodes, elements=[]):
 
 
 def get_page_elements(pages):
-    config = get_config()
+    config = get_config(snapshot=True)
     priority_rules = config.get("priority_rules")
     rule_mode = config.get("rule_mode")
     filter_scope = config.get("filter_scope")
@@ -993,13 +1115,34 @@ def get_page_elements(pages):
     return extraction.get_elements()
 
 
-def get_element_handler(placeholder, separator, direction):
-    config = get_config()
+# The extra formats whose cues can be translated in windows.
+subtitle_formats = ("srt", "vtt", "ass", "ssa")
+
+
+def get_merge_length(format=None):
+    """The merge length of the element handler for the input format, which
+    is a part of the cache id."""
+    config = get_config(snapshot=True)
+    if format in subtitle_formats and config.get("subtitle_window.enabled"):
+        return config.get("subtitle_window.length")
+    if config.get("merge_enabled"):
+        return config.get("merge_length")
+    return 0
+
+
+def get_element_handler(placeholder, separator, direction, format=None):
+    """:format: The input format, by which subtitle cues are merged into
+    windows of consecutive cues if it is enabled."""
+    config = get_config(snapshot=True)
     position_alias = {"before": "above", "after": "below"}
     position = config.get("translation_position", "below")
     position = position_alias.get(position) or position
     handler = ElementHandler(placeholder, separator, position)
-    if config.get("merge_enabled"):
+    if format in subtitle_formats and config.get("subtitle_window.enabled"):
+        handler = ElementHandlerMerge(placeholder, separator, position)
+        handler.set_merge_length(config.get("subtitle_window.length"))
+        handler.set_window_size(config.get("subtitle_window.cue_count"))
+    elif config.get("merge_enabled"):
         handler = ElementHandlerMerge(placeholder, separator, position)
         handler.set_merge_strategy(config.get("merge_strategy", "length"))  # 新增這一行
         handler.set_merge_length(config.get("merge_length"))
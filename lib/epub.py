@@ -0,0 +1,218 @@
+import copy
+import struct
+import zipfile
+import posixpath
+from urllib.parse import unquote
+
+from lxml import etree
+from calibre.ebooks.chardet import xml_to_unicode
+from calibre.utils.xml_parse import safe_xml_fromstring
+
+from .exception import UnsupportedEpub
+
+
+namespaces = {
+    'c': 'urn:oasis:names:tc:opendocument:xmlns:container',
+    'opf': 'http://www.idpf.org/2007/opf',
+    'dc': 'http://purl.org/dc/elements/1.1/',
+    'ncx': 'http://www.daisy.org/z3986/2005/ncx/',
+    'x': 'http://www.w3.org/1999/xhtml',
+    'epub': 'http://www.idpf.org/2007/ops',
+}
+
+page_media_types = ('application/xhtml+xml', 'text/html')
+
+
+class MetadataItem:
+    """A Dublin Core element of the OPF file, which has the same content
+    attribute as the metadata item of calibre."""
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def content(self):
+        return self.element.text or ''
+
+    @content.setter
+    def content(self, value):
+        self.element.text = value
+
+
+class Metadata:
+    """The Dublin Core elements of the OPF file, which are read in the same
+    way as the metadata of calibre by ``get_metadata_elements``."""
+    def __init__(self, element):
+        self.items: dict[str, list[MetadataItem]] = {}
+        if element is None:
+            return
+        for item in element.iterchildren('{%s}*' % namespaces['dc']):
+            name = etree.QName(item).localname
+            self.items.setdefault(name, []).append(MetadataItem(item))
+
+    def iterkeys(self):
+        return iter(self.items)
+
+    def __getattr__(self, name):
+        items = self.__dict__.get('items', {})
+        if name not in items:
+            raise AttributeError(name)
+        return items[name]
+
+
+class TocItem:
+    """An entry of the NCX or navigation document, which has the same title
+    attribute as the TOC node of calibre."""
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def title(self):
+        return ''.join(self.element.itertext()).strip()
+
+    @title.setter
+    def title(self, value):
+        for child in self.element.iterchildren():
+            self.element.remove(child)
+        self.element.text = value
+
+
+class Page:
+    """A spine document, which has the attributes of the manifest item of
+    calibre used by ``Extraction``."""
+    def __init__(self, id, href, data):
+        self.id = id
+        self.href = href
+        self.data = data
+
+
+class EpubContainer:
+    """Read the documents of an EPUB file, and write the file again with
+    only the modified documents replaced. The other entries, e.g. images and
+    fonts, are copied byte for byte without being compressed again.
+    """
+    def __init__(self, path):
+        try:
+            self.archive = zipfile.ZipFile(path)
+        except (OSError, zipfile.BadZipFile) as e:
+            raise UnsupportedEpub(str(e))
+        self.documents: dict[str, etree._Element] = {}
+        self.opf_name = self._get_opf_name()
+        self.opf = self.parse(self.opf_name)
+        # The manifest items by id: (name, media type, properties)
+        self.manifest: dict[str, tuple[str, str, str]] = {}
+        for item in self.opf.xpath(
+                '//opf:manifest/opf:item', namespaces=namespaces):
+            href = item.get('href')
+            if item.get('id') is None or href is None:
+                continue
+            self.manifest[item.get('id')] = (
+                self.get_name(href), item.get('media-type', ''),
+                item.get('properties', ''))
+        self.spine = [
+            itemref.get('idref') for itemref in self.opf.xpath(
+                '//opf:spine/opf:itemref', namespaces=namespaces)
+            if itemref.get('idref') in self.manifest]
+        self.toc_name = None
+
+    def _get_opf_name(self):
+        container = self.parse('META-INF/container.xml')
+        paths = container.xpath(
+            '//c:rootfile/@full-path', namespaces=namespaces)
+        if len(paths) < 1:
+            raise UnsupportedEpub('No OPF file is specified.')
+        return paths[0]
+
+    def get_name(self, href):
+        """The name in the archive of a file referenced by the OPF file."""
+        path = unquote(href.split('#')[0])
+        return posixpath.normpath(
+            posixpath.join(posixpath.dirname(self.opf_name), path))
+
+    def parse(self, name):
+        if name in self.documents:
+            return self.documents[name]
+        try:
+            data = self.archive.read(name)
+            text = xml_to_unicode(
+                data, strip_encoding_pats=True, resolve_entities=True,
+                assume_utf8=True)[0]
+            root = safe_xml_fromstring(text)
+        except KeyError:
+            raise UnsupportedEpub('Missing file: %s' % name)
+        except Exception as e:
+            raise UnsupportedEpub('Failed to parse %s: %s' % (name, e))
+        if root is None:
+            raise UnsupportedEpub('Failed to parse %s' % name)
+        self.documents[name] = root
+        return root
+
+    def get_metadata(self):
+        element = self.opf.find('.//opf:metadata', namespaces=namespaces)
+        return Metadata(element)
+
+    def get_pages(self):
+        pages = []
+        for id in self.spine:
+            name, media_type = self.manifest[id][:2]
+            if media_type in page_media_types:
+                pages.append(Page(id, name, self.parse(name)))
+        return pages
+
+    def get_page_name(self, id):
+        return self.manifest[id][0]
+
+    def get_toc_items(self):
+        """The entries of the NCX file, or of the navigation document if it
+        is not a part of the spine, whose content is extracted as a page."""
+        for id, (name, media_type, properties) in self.manifest.items():
+            if media_type == 'application/x-dtbncx+xml':
+                self.toc_name = name
+                return [TocItem(text) for text in self.parse(name).xpath(
+                    '//ncx:navPoint/ncx:navLabel/ncx:text',
+                    namespaces=namespaces)]
+        for id, (name, media_type, properties) in self.manifest.items():
+            if 'nav' in properties.split() and id not in self.spine:
+                self.toc_name = name
+                return [TocItem(anchor) for anchor in self.parse(name).xpath(
+                    '//x:nav[@epub:type="toc"]//x:a', namespaces=namespaces)]
+        return []
+
+    def _copy_entry(self, target, info):
+        """Copy the compressed data of the entry as it is."""
+        source = self.archive.fp
+        source.seek(info.header_offset)
+        header = source.read(zipfile.sizeFileHeader)
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+        source.seek(
+            info.header_offset + zipfile.sizeFileHeader + name_length
+            + extra_length)
+        data = source.read(info.compress_size)
+        entry = copy.copy(info)
+        # The sizes are written in the header instead of a data descriptor.
+        entry.flag_bits &= ~0x08
+        entry.header_offset = target.fp.tell()
+        target.fp.write(entry.FileHeader())
+        target.fp.write(data)
+        target.filelist.append(entry)
+        target.NameToInfo[entry.filename] = entry
+        target.start_dir = target.fp.tell()
+
+    def save(self, path, names):
+        """Write the EPUB file with the documents of the given names
+        serialized again."""
+        with zipfile.ZipFile(path, 'w') as target:
+            for info in self.archive.infolist():
+                if info.filename not in names:
+                    self._copy_entry(target, info)
+                    continue
+                root = self.documents[info.filename]
+                entry = zipfile.ZipInfo(info.filename, info.date_time)
+                entry.external_attr = info.external_attr
+                target.writestr(
+                    entry, etree.tostring(
+                        root.getroottree(), encoding='utf-8',
+                        xml_declaration=True),
+                    compress_type=zipfile.ZIP_DEFLATED)
+
+    def close(self):
+        self.archive.close()
@@ -10,6 +10,10 @@ class ConversionAbort(Exception):
     pass
 
 
+class UnsupportedEpub(Exception):
+    pass
+
+
 class TranslationFailed(Exception):
     pass
 
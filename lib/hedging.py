@@ -0,0 +1,119 @@
+import os
+import time
+from threading import Lock
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .metrics import profiled
+
+
+load_translations()
+
+
+class RequestHedger:
+    """Send a duplicate of a request that has not answered within the
+    observed p95 latency, and take whichever answer arrives first. The
+    duplicates are limited to a share of all the requests, so hedging can
+    not multiply the load on the service.
+    """
+    def __init__(
+            self, concurrency_limit=0, budget=0.05, min_samples=20,
+            max_samples=200):
+        self.budget = budget
+        self.min_samples = min_samples
+        self.latencies: deque = deque(maxlen=max_samples)
+
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+
+        self._lock = Lock()
+        self._executor = None
+        self.set_concurrency_limit(concurrency_limit)
+
+    def set_concurrency_limit(self, limit):
+        """Size the pool for every request in flight along with a duplicate
+        of each, so no request is queued, as the time in the queue would
+        count against the delay and trigger needless duplicates. Without a
+        limit, the requests are bounded by the default executor of asyncio,
+        which runs the translations.
+        """
+        if limit < 1:
+            limit = min(32, (os.cpu_count() or 1) + 4)
+        executor = self._executor
+        self._executor = ThreadPoolExecutor(
+            max_workers=limit * 2, thread_name_prefix='hedge')
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def get_delay(self):
+        """The p95 latency, or None before there are enough samples."""
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            latencies = sorted(self.latencies)
+        return latencies[int(len(latencies) * 0.95) - 1]
+
+    def _record(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+
+    def _acquire(self):
+        with self._lock:
+            if self.hedges + 1 > self.requests * self.budget:
+                return False
+            self.hedges += 1
+            return True
+
+    @profiled
+    def _timed(self, func):
+        start = time.monotonic()
+        result = func()
+        self._record(time.monotonic() - start)
+        return result
+
+    def _hedge(self, func, release):
+        try:
+            return self._timed(func)
+        finally:
+            release()
+
+    def request(self, func, reserve=None):
+        """:reserve: Take a slot of the concurrency limit for the duplicate
+        and return the function to free it, or None if no slot is free. The
+        duplicate is not sent without a slot.
+        """
+        with self._lock:
+            self.requests += 1
+        delay = self.get_delay()
+        if delay is None:
+            return self._timed(func)
+        primary = self._executor.submit(self._timed, func)
+        done, pending = wait([primary], timeout=delay)
+        if primary in done:
+            return primary.result()
+        release = (lambda: None) if reserve is None else reserve()
+        if release is None:
+            return primary.result()
+        if not self._acquire():
+            release()
+            return primary.result()
+        hedge = self._executor.submit(self._hedge, func, release)
+        futures = [primary, hedge]
+        while len(futures) > 0:
+            done, pending = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                futures.remove(future)
+                # Fall back to the other request if this one failed.
+                if future.exception() is None or len(futures) < 1:
+                    if future is hedge:
+                        with self._lock:
+                            self.wins += 1
+                    return future.result()
+
+    def get_report(self):
+        if self.hedges < 1:
+            return None
+        return _(
+            'Hedged requests: {} of {} requests, {} answered first'
+        ).format(self.hedges, self.requests, self.wins)
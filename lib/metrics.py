@@ -0,0 +1,322 @@
+import os
+import math
+import time
+import pstats
+import cProfile
+from threading import Lock, local
+from functools import wraps
+from tempfile import gettempdir
+from types import GeneratorType
+from contextlib import contextmanager, nullcontext
+
+from .utils import uid
+
+
+load_translations()
+
+
+class Spans:
+    """Aggregate the time spent in the named spans of the hot paths, e.g.
+    building the request body or parsing the response. While disabled, a
+    span only costs the check of a flag.
+    """
+    def __init__(self):
+        self.enabled = False
+        # The count and seconds of each span by name.
+        self.totals: dict[str, list] = {}
+        self._lock = Lock()
+        self._null = nullcontext()
+
+    def set_enabled(self, enabled):
+        self.enabled = bool(enabled)
+
+    def reset(self):
+        with self._lock:
+            self.totals.clear()
+
+    def add(self, name, seconds):
+        with self._lock:
+            total = self.totals.setdefault(name, [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+
+    @contextmanager
+    def _span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def span(self, name):
+        return self._span(name) if self.enabled else self._null
+
+    def timed(self, name):
+        """Decorate a function to be measured as the span of the name."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.add(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def get_report(self):
+        with self._lock:
+            return {
+                name: {'count': count, 'seconds': round(seconds, 3)}
+                for name, (count, seconds) in sorted(self.totals.items())}
+
+
+spans = Spans()
+span = spans.span
+timed = spans.timed
+
+
+class Profiler:
+    """Profile a job with cProfile. A profile only hooks the thread enabling
+    it, so the functions run by the worker threads are decorated to be
+    profiled in their own thread, and the profiles are merged when dumped.
+    While disabled, a decorated function only costs the check of a flag.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.profiles: list[cProfile.Profile] = []
+        self._local = local()
+        self._lock = Lock()
+
+    def reset(self):
+        with self._lock:
+            self.profiles = []
+            self._local = local()
+
+    @contextmanager
+    def _profile(self):
+        """Profile the calling thread unless it is profiled already."""
+        thread = self._local
+        if getattr(thread, 'active', False):
+            yield
+            return
+        profile = getattr(thread, 'profile', None) or cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Since Python 3.12, a profile hooks all the threads, so the one
+            # of the job covers this thread.
+            profile = None
+        if profile is None:
+            yield
+            return
+        if getattr(thread, 'profile', None) is None:
+            thread.profile = profile
+            with self._lock:
+                self.profiles.append(profile)
+        thread.active = True
+        try:
+            yield
+        finally:
+            thread.active = False
+            profile.disable()
+
+    @contextmanager
+    def profile(self):
+        """Profile the block in the calling thread and the decorated
+        functions run by the other threads meanwhile."""
+        self.reset()
+        self.enabled = True
+        try:
+            with self._profile():
+                yield
+        finally:
+            self.enabled = False
+
+    def profiled(self, func):
+        """Decorate a function run by a worker thread to be profiled."""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            with self._profile():
+                return func(*args, **kwargs)
+        return wrapper
+
+    def dump_stats(self, path):
+        with self._lock:
+            profiles = list(self.profiles)
+        stats = pstats.Stats(*profiles)
+        stats.dump_stats(path)
+
+
+profiler = Profiler()
+profiled = profiler.profiled
+
+
+def get_profile_path(output_path, extension='.prof'):
+    """The temporary path of the profile of the job writing to the output
+    path, which is moved next to the job log once the job is done."""
+    return os.path.join(
+        gettempdir(), 'ebook_translator_%s%s' % (uid(output_path), extension))
+
+
+def get_report_path(output_path):
+    """The temporary path of the performance report of the job, which is
+    moved next to the job log like the profile."""
+    return get_profile_path(output_path, '.json')
+
+
+class JobMetrics:
+    """Measure the wall time of the phases of a job and the requests sent to
+    the translation engine, which may come from multiple threads. The bytes
+    are those of the content sent and received, without the envelope of the
+    engine API.
+    """
+    phase_names = ('extract', 'prepare', 'cache_save', 'translate', 'output')
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.characters = 0
+        self.tokens: int | None = None
+        self.latencies: list[float] = []
+
+        self._lock = Lock()
+
+    def add_phase(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.monotonic() - start)
+
+    def record_request(self, latency, sent, received, failed=False):
+        with self._lock:
+            self.requests += 1
+            self.failures += int(failed)
+            self.bytes_sent += sent
+            self.bytes_received += received
+            self.latencies.append(latency)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def record_characters(self, count):
+        with self._lock:
+            self.characters += count
+
+    def set_tokens(self, tokens):
+        self.tokens = tokens
+
+    def request(self, translate, text):
+        """Translate the text with the function and record the request."""
+        start = time.monotonic()
+        try:
+            translation = translate(text)
+        except Exception:
+            self.record_request(
+                time.monotonic() - start, len(text.encode('utf-8')), 0, True)
+            raise
+        return self.measure(start, text, translation)
+
+    def measure(self, start, text, translation):
+        """Record a request started at the monotonic time ``start``. The
+        streaming translation is recorded once it is read to the end."""
+        sent = len(text.encode('utf-8'))
+        if not isinstance(translation, GeneratorType):
+            self.record_request(
+                time.monotonic() - start, sent,
+                len(translation.encode('utf-8')))
+            return translation
+
+        def stream():
+            received = 0
+            for chunk in translation:
+                received += len(chunk.encode('utf-8'))
+                yield chunk
+            self.record_request(time.monotonic() - start, sent, received)
+        return stream()
+
+    def get_percentile(self, percent):
+        """The nearest-rank percentile of the latencies."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if len(latencies) < 1:
+            return None
+        index = max(0, math.ceil(len(latencies) * percent / 100) - 1)
+        return round(latencies[index], 3)
+
+    def get_report(self):
+        duration = self.phases.get('translate', 0.0)
+        per_second = (lambda count: None if count is None or duration <= 0
+                      else round(count / duration, 2))
+        return {
+            'phases': {
+                name: round(self.phases[name], 3) for name in
+                sorted(self.phases, key=lambda name: (
+                    self.phase_names.index(name)
+                    if name in self.phase_names else len(self.phase_names)))},
+            'requests': self.requests,
+            'failures': self.failures,
+            'retries': self.retries,
+            'cache_hits': self.cache_hits,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'latency': {
+                'p50': self.get_percentile(50),
+                'p95': self.get_percentile(95),
+                'p99': self.get_percentile(99)},
+            'characters_per_second': per_second(self.characters),
+            'tokens_per_second': per_second(self.tokens),
+            # The requests in flight on average while translating.
+            'concurrency': per_second(sum(self.latencies)),
+            'spans': spans.get_report() if spans.enabled else None,
+        }
+
+    def get_phase_summary(self):
+        phases = self.get_report()['phases']
+        return _('Performance: {}').format(', '.join(
+            '%s %ss' % (name, seconds)
+            for name, seconds in phases.items()) or _('N/A'))
+
+    def get_summary(self):
+        report = self.get_report()
+        latency = report['latency']
+        na = _('N/A')
+        value = (lambda value: na if value is None else value)
+        return '\n'.join([
+            self.get_phase_summary(),
+            _('Requests: {} ({} failed, {} retries), cache hits: {}').format(
+                report['requests'], report['failures'], report['retries'],
+                report['cache_hits']),
+            _('Bytes sent: {}, received: {}').format(
+                report['bytes_sent'], report['bytes_received']),
+            _('Latency: p50 {}s, p95 {}s, p99 {}s').format(
+                value(latency['p50']), value(latency['p95']),
+                value(latency['p99'])),
+            _('Throughput: {} chars/s, {} tokens/s, concurrency {}').format(
+                value(report['characters_per_second']),
+                value(report['tokens_per_second']),
+                value(report['concurrency'])),
+        ] + [
+            _('Span {}: {} calls, {}s').format(
+                name, total['count'], total['seconds'])
+            for name, total in (report['spans'] or {}).items()])
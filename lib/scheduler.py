@@ -0,0 +1,154 @@
+import time
+
+
+load_translations()
+
+
+class ScheduledBook:
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    PAUSED = 'paused'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, ebook, size, priority=0):
+        """:size: The characters left to translate, or None if unknown."""
+        self.ebook = ebook
+        self.size = size
+        self.priority = priority
+        self.state = self.QUEUED
+        self.job = None
+        self.started_at = None
+        self.finished_at = None
+
+    def get_state_name(self):
+        return {
+            self.QUEUED: _('Queued'),
+            self.RUNNING: _('Running'),
+            self.PAUSED: _('Paused'),
+            self.DONE: _('Done'),
+            self.FAILED: _('Failed'),
+        }.get(self.state)
+
+
+class BookScheduler:
+    """Queue the books of the batch mode and translate up to ``limit`` of
+    them at once. The queued books are started by priority, then the
+    shortest first if ``shortest_first`` is set, otherwise in the order
+    they were added. The books of unknown size, which have not been cached,
+    follow the others. A paused book has its job stopped, and continues
+    from its cache once resumed.
+    """
+    def __init__(self, start, stop, limit=2, shortest_first=True):
+        """:start: A function starting the job of an ebook and returning it.
+        :stop: A function stopping a job.
+        """
+        self.start = start
+        self.stop = stop
+        self.limit = limit
+        self.shortest_first = shortest_first
+        self.books: list[ScheduledBook] = []
+        # The characters translated per second, measured by finished books.
+        self.throughput: float | None = None
+
+    def add(self, ebook, size, priority=0):
+        book = ScheduledBook(ebook, size, priority)
+        self.books.append(book)
+        return book
+
+    def get_books(self, state):
+        return [book for book in self.books if book.state == state]
+
+    def get_book(self, job):
+        for book in self.books:
+            if book.job is job:
+                return book
+        return None
+
+    def _queue(self):
+        books = self.get_books(ScheduledBook.QUEUED)
+        # The sort is stable, so books of the same order stay as added.
+        if self.shortest_first:
+            books.sort(key=lambda book: (book.size is None, book.size or 0))
+        books.sort(key=lambda book: book.priority, reverse=True)
+        return books
+
+    def schedule(self):
+        running = len(self.get_books(ScheduledBook.RUNNING))
+        for book in self._queue():
+            if self.limit > 0 and running >= self.limit:
+                break
+            book.state = ScheduledBook.RUNNING
+            book.started_at = time.time()
+            book.job = self.start(book.ebook)
+            running += 1
+
+    def done(self, job, failed=False):
+        """Record the job as finished and start the next books. Return the
+        book of the job, or None if it is not scheduled."""
+        book = self.get_book(job)
+        if book is None or book.state != ScheduledBook.RUNNING:
+            return book
+        book.finished_at = time.time()
+        book.state = ScheduledBook.FAILED if failed else ScheduledBook.DONE
+        duration = book.finished_at - book.started_at
+        if not failed and duration > 0 and book.size is not None:
+            speed = book.size / duration
+            self.throughput = speed if self.throughput is None \
+                else (self.throughput + speed) / 2
+        self.schedule()
+        return book
+
+    def pause(self, book):
+        if book.state == ScheduledBook.RUNNING:
+            book.state = ScheduledBook.PAUSED
+            self.stop(book.job)
+            self.schedule()
+        elif book.state == ScheduledBook.QUEUED:
+            book.state = ScheduledBook.PAUSED
+
+    def resume(self, book):
+        if book.state in (ScheduledBook.PAUSED, ScheduledBook.FAILED):
+            book.state = ScheduledBook.QUEUED
+            book.job = None
+            self.schedule()
+
+    def set_priority(self, book, priority):
+        book.priority = priority
+
+    def _remaining(self, book, now):
+        """The estimated seconds left to translate the book."""
+        if book.state == ScheduledBook.RUNNING:
+            elapsed = now - book.started_at
+            percent = getattr(book.job, 'percent', None) or 0
+            if 0 < percent < 1:
+                return elapsed / percent - elapsed
+            if self.throughput and book.size is not None:
+                return max(0.0, book.size / self.throughput - elapsed)
+            return None
+        if self.throughput and book.size is not None:
+            return book.size / self.throughput
+        return None
+
+    def get_estimates(self, now=None):
+        """Estimate when each unfinished book will be completed, assuming
+        the queued books take the first free slot in order."""
+        now = time.time() if now is None else now
+        estimates = {}
+        slots = []
+        for book in self.get_books(ScheduledBook.RUNNING):
+            remaining = self._remaining(book, now)
+            estimates[book] = None if remaining is None else now + remaining
+            slots.append(estimates[book])
+        limit = self.limit if self.limit > 0 else len(self.books)
+        slots += [now] * (limit - len(slots))
+        for book in self._queue():
+            remaining = self._remaining(book, now)
+            known = [slot for slot in slots if slot is not None]
+            if remaining is None or len(known) < 1:
+                estimates[book] = None
+                continue
+            start = min(known)
+            slots[slots.index(start)] = start + remaining
+            estimates[book] = start + remaining
+        return estimates
@@ -0,0 +1,91 @@
+import time
+from threading import Condition
+
+
+load_translations()
+
+
+class KeySharder:
+    """Use multiple API keys at the same time. Each key has its own
+    concurrency slots and request interval, and a request is routed to the
+    key with the most headroom. A key rejected by the service is left out
+    for a while instead of being given up for good.
+    """
+    # The seconds before trying a quarantined key again.
+    cooldown = 60.0
+
+    def __init__(self, keys, concurrency_limit=0, request_interval=0.0):
+        self.keys = list(dict.fromkeys(keys))
+        self.concurrency_limit = concurrency_limit
+        self.request_interval = request_interval
+
+        self.in_flight = {key: 0 for key in self.keys}
+        self.next_time = {key: 0.0 for key in self.keys}
+        self.quarantined_until = {key: 0.0 for key in self.keys}
+        self.requests = {key: 0 for key in self.keys}
+        self.quarantines = {key: 0 for key in self.keys}
+
+        self._condition = Condition()
+
+    def _available(self, now):
+        keys = [key for key in self.keys if self.quarantined_until[key] <= now]
+        # Keep trying if all the keys are quarantined, so the error surfaces.
+        return keys or self.keys
+
+    def _has_slot(self, key):
+        return self.concurrency_limit < 1 \
+            or self.in_flight[key] < self.concurrency_limit
+
+    def acquire(self):
+        """Reserve a slot of the key with the most headroom, waiting for its
+        request interval if necessary."""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                keys = [key for key in self._available(now)
+                        if self._has_slot(key)]
+                if len(keys) > 0:
+                    break
+                self._condition.wait(1.0)
+            key = min(keys, key=lambda key: (
+                max(0.0, self.next_time[key] - now), self.in_flight[key]))
+            wait = max(0.0, self.next_time[key] - now)
+            self.next_time[key] = now + wait + self.request_interval
+            self.in_flight[key] += 1
+            self.requests[key] += 1
+        if wait > 0:
+            time.sleep(wait)
+        return key
+
+    def release(self, key):
+        with self._condition:
+            self.in_flight[key] -= 1
+            self._condition.notify_all()
+
+    def hold(self, key, generator):
+        """Release the key once the streaming response is read."""
+        try:
+            yield from generator
+        finally:
+            self.release(key)
+
+    def quarantine(self, key):
+        """Leave the key out during the cooldown. Return whether any other
+        key can still be used."""
+        with self._condition:
+            now = time.monotonic()
+            self.quarantined_until[key] = now + self.cooldown
+            self.quarantines[key] += 1
+            self._condition.notify_all()
+            return any(
+                self.quarantined_until[other] <= now for other in self.keys)
+
+    def get_report(self):
+        items = []
+        for key in self.keys:
+            item = '...%s %s' % (key[-4:], self.requests[key])
+            if self.quarantines[key] > 0:
+                item += ' (%s)' % _('quarantined {} times').format(
+                    self.quarantines[key])
+            items.append(item)
+        return _('API keys: {}').format(', '.join(items))
@@ -1,17 +1,21 @@
 import re
 import time
 import json
+import copy
 from types import GeneratorType
 
 from ..engines import builtin_engines
 from ..engines import GoogleFreeTranslateNew
 from ..engines.base import Base
+from ..engines.genai import GenAI
 from ..engines.custom import CustomTranslate
+from ..engines.pool import EnginePool
 
 from .utils import sep, trim, dummy, traceback_error
 from .config import get_config
 from .exception import TranslationFailed, TranslationCanceled
 from .handler import Handler
+from .metrics import JobMetrics, timed, profiled
 
 
 load_translations()
@@ -36,12 +40,14 @@ class Glossary:
             group = group.split("\n")
             self.glossary.append((group[0], group[0] if len(group) < 2 else group[1]))
 
+    @timed("glossary.replace")
     def replace(self, content):
         for wid, words in enumerate(self.glossary):
             replacement = self.placeholder[0].format(format(wid, "06"))
             content = content.replace(words[0], replacement)
         return content
 
+    @timed("glossary.restore")
     def restore(self, content):
         for wid, words in enumerate(self.glossary):
             pattern = self.placeholder[1].format(format(wid, "06"))
@@ -84,6 +90,7 @@ class Translation:
         self.total = 0
         self.progress_bar = ProgressBar()
         self.abort_count = 0
+        self.metrics = JobMetrics()
 
     def set_fresh(self, fresh):
         self.fresh = fresh
@@ -132,7 +139,7 @@ class Translation:
         if self.cancel_request():
             raise TranslationCanceled(_("Translation canceled."))
         try:
-            translation = self.translator.translate(text)
+            translation = self.metrics.request(self.translator.translate, text)
             self.abort_count = 0
             return translation
         except Exception as e:
@@ -162,13 +169,56 @@ class Translation:
             if self.translator.match_error(str(e)):
                 raise TranslationCanceled(_("Translation canceled."))
             time.sleep(interval)
+            self.metrics.record_retry()
             return self.translate_text(row, text, retry, interval)
 
+    def translate_segments(self, row, text):
+        """Translate the merged paragraphs as a keyed JSON object, so each
+        translation maps back to its paragraph without guessing. Only the
+        keys missing from a response are requested again.
+        """
+        separator = self.translator.separator
+        segments = text.strip().split(separator)
+        keys = [str(index) for index in range(1, len(segments) + 1)]
+        pending = dict(zip(keys, segments))
+        translations = {}
+        for attempt in range(self.translator.request_attempt + 1):
+            if attempt > 0:
+                self.metrics.record_retry()
+            content = self.translator.get_structured_content(pending)
+            result = self.translate_text(row, content)
+            if isinstance(result, GeneratorType):
+                result = "".join(result)
+            translations.update(
+                self.translator.get_structured_result(result, pending.keys())
+            )
+            pending = {
+                key: value
+                for key, value in pending.items()
+                if key not in translations
+            }
+            if len(pending) < 1:
+                break
+            self.log(
+                _("Missing translation keys: {}").format(", ".join(pending)),
+                True,
+            )
+        if len(pending) > 0:
+            raise TranslationFailed(
+                _("Failed to retrieve the translation of all paragraphs.")
+            )
+        # Keep the separator from splitting a single translation.
+        return separator.join(
+            translations[key].replace(separator, "\n") for key in keys
+        )
+
+    @profiled
     def translate_paragraph(self, paragraph):
         if self.cancel_request():
             raise TranslationCanceled(_("Translation canceled."))
         if paragraph.translation and not self.fresh:
             paragraph.is_cache = True
+            self.metrics.record_cache_hit()
             return
         self.streaming("")
         self.streaming(_("Translating..."))
@@ -185,7 +235,10 @@ class Translation:
             paragraph.is_cache = True  # 標記為已處理，避免後續操作再次處理它
             return
         # --- 檢查邏輯結束 ---
-        translation = self.translate_text(paragraph.row, text)
+        if isinstance(self.translator, GenAI) and self.translator.is_structured():
+            translation = self.translate_segments(paragraph.row, text)
+        else:
+            translation = self.translate_text(paragraph.row, text)
         # Process streaming text
         if isinstance(translation, GeneratorType):
             if self.total == 1:
@@ -197,7 +250,6 @@ class Translation:
                         self.streaming("")
                         clear = False
                     self.streaming(char)
-                    time.sleep(0.05)
                     temp += char
             else:
                 temp = "".join([char for char in translation])
@@ -210,7 +262,9 @@ class Translation:
         paragraph.engine_name = self.translator.name
         paragraph.target_lang = self.translator.get_target_lang()
         paragraph.is_cache = False
+        self.metrics.record_characters(len(paragraph.original))
 
+    @profiled
     def process_translation(self, paragraph):
         self.progress(
             self.progress_bar.length,
@@ -259,19 +313,33 @@ class Translation:
             self.process_translation,
             self.translator.request_interval,
         )
-        handler.handle()
+        with self.metrics.phase('translate'):
+            handler.handle()
+        self.metrics.set_tokens(self.translator.get_token_count())
 
         self.log(sep())
         if self.batch and self.need_stop():
             raise Exception(_("Translation failed."))
         consuming = round((time.time() - start_time) / 60, 2)
         self.log(_("Time consuming: {} minutes").format(consuming))
+        if isinstance(self.translator, GenAI):
+            report = self.translator.get_prompt_cache_report()
+            if report is not None:
+                self.log(report)
+        for report in (
+            self.translator.get_hedge_report(),
+            self.translator.get_key_report(),
+        ):
+            if report is not None:
+                self.log(report)
+        if isinstance(self.translator, EnginePool):
+            self.log(self.translator.get_pool_report())
         self.log(_("Translation completed."))
         self.progress(1, _("Translation completed."))
 
 
 def get_engine_class(engine_name=None):
-    config = get_config()
+    config = get_config(snapshot=True)
     engine_name = engine_name or config.get("translate_engine")
     engines: dict[str, type[Base]] = {engine.name: engine for engine in builtin_engines}
     custom_engines = config.get("custom_engines")
@@ -284,27 +352,91 @@ def get_engine_class(engine_name=None):
     else:
         engine_class = GoogleFreeTranslateNew
     engine_preferences = config.get("engine_preferences")
-    engine_class.set_config(engine_preferences.get(engine_class.name) or {})
+    engine_class.set_config(
+        copy.deepcopy(engine_preferences.get(engine_class.name) or {}))
     return engine_class
 
 
+def get_engine_pool():
+    """Create a pool of the engines listed in the "engine_pool" setting, or
+    return None if it is disabled. An engine may be listed more than once
+    with different API keys. The engines whose placeholder or separator
+    differs from the first one are left out, as are the unknown engines.
+    """
+    config = get_config(snapshot=True)
+    pool_config = config.get("engine_pool") or {}
+    if not pool_config.get("enabled"):
+        return None
+    members = []
+    has_custom = False
+    for item in pool_config.get("members", []):
+        engine_name = item.get("engine")
+        engine_class = get_engine_class(engine_name)
+        if engine_class.name != engine_name:
+            continue
+        # The data of a custom engine is kept on the shared class.
+        if issubclass(engine_class, CustomTranslate):
+            if has_custom:
+                continue
+            has_custom = True
+        translator = engine_class()
+        if item.get("api_keys"):
+            translator.set_api_keys(item.get("api_keys"))
+        # The pool sends the merged paragraphs joined by the separator, so a
+        # member must not ask for a JSON object in reply.
+        if isinstance(translator, GenAI):
+            translator.structured_merge = False
+        if len(members) > 0:
+            primary = members[0][0]
+            if (translator.placeholder, translator.separator) != (
+                primary.placeholder,
+                primary.separator,
+            ):
+                continue
+        members.append((translator, item.get("weight", 1)))
+    if len(members) < 1:
+        return None
+    return EnginePool(members)
+
+
+def get_engine_name():
+    """The name of the engine translating the jobs, which their caches are
+    named after, without creating the translator. A pool is named after its
+    first known member.
+    """
+    config = get_config(snapshot=True)
+    pool_config = config.get("engine_pool") or {}
+    if pool_config.get("enabled"):
+        for item in pool_config.get("members", []):
+            engine_name = item.get("engine")
+            if not engine_name:
+                continue
+            if get_engine_class(engine_name).name == engine_name:
+                return engine_name
+    return get_engine_class().name
+
+
 def get_translator(engine_class=None):
-    config = get_config()
-    engine_class = engine_class or get_engine_class()
-    translator = engine_class()
+    config = get_config(snapshot=True)
+    translator = None if engine_class else get_engine_pool()
+    if translator is None:
+        engine_class = engine_class or get_engine_class()
+        translator = engine_class()
     translator.set_search_paths(config.get("search_paths"))
     if config.get("proxy_enabled"):
         translator.set_proxy(config.get("proxy_setting"))
     translator.set_merge_enabled(config.get("merge_enabled"))
+    # Share the request limits with the other running jobs.
+    translator.set_coordinated(config.get("job_coordination", True))
     return translator
 
 
 def get_translation(translator, log=None):
-    config = get_config()
+    config = get_config(snapshot=True)
     glossary = Glossary(translator.placeholder)
     if config.get("glossary_enabled"):
         glossary.load_from_file(config.get("glossary_path"))
     translation = Translation(translator, glossary)
-    if get_config().get("log_translation"):
+    if config.get("log_translation"):
         translation.set_logging(log)
     return translation
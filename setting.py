@@ -72,7 +72,8 @@ load_translations()
 
 
 class ModelWorker(QObject):
-    start = pyqtSignal(object)
+    # The engine class, and whether to bypass the cached model list.
+    start = pyqtSignal(object, bool)
     success = pyqtSignal(bool, str)
     finished = pyqtSignal()
 
@@ -81,11 +82,11 @@ class ModelWorker(QObject):
         self.log = Log()
         self.start.connect(self.get_models)
 
-    @pyqtSlot(object)
-    def get_models(self, engine_class):
+    @pyqtSlot(object, bool)
+    def get_models(self, engine_class, refresh=False):
         try:
             engine = get_translator(engine_class)
-            engine_class.models = engine.get_models()
+            engine_class.models = engine.get_cached_models(refresh)
             self.success.emit(True, "")
         except Exception:
             error = traceback_error()
@@ -328,6 +329,15 @@ class TranslationSetting(QDialog):
         output_format = OutputFormat()
         format_layout.addRow(_("Input Format"), input_format)
         format_layout.addRow(_("Output Format"), output_format)
+        epub_in_place = QCheckBox(_("Edit EPUB files in place"))
+        epub_in_place.setToolTip(
+            _(
+                "Translate EPUB to EPUB without converting it with Calibre. "
+                "Only the documents with translations are rewritten."
+            )
+        )
+        epub_in_place.setChecked(self.config.get("epub_in_place", False))
+        format_layout.addRow(_("EPUB to EPUB"), epub_in_place)
         layout.addWidget(format_group)
 
         self.apply_form_layout_policy(format_layout)
@@ -345,6 +355,31 @@ class TranslationSetting(QDialog):
         output_format.currentTextChanged.connect(
             lambda format: self.config.update(output_format=format)
         )
+        epub_in_place.toggled.connect(
+            lambda checked: self.config.update(epub_in_place=checked)
+        )
+
+        # Batch Queue
+        queue_group = QGroupBox(_("Batch Queue"))
+        queue_layout = QFormLayout(queue_group)
+        book_concurrency = QSpinBox()
+        book_concurrency.setRange(0, 99)
+        book_concurrency.setValue(self.config.get("book_concurrency", 2))
+        book_concurrency.setToolTip(_("0 means no limit."))
+        queue_layout.addRow(_("Books at once"), book_concurrency)
+        shortest_first = QCheckBox(_("Translate the shortest books first"))
+        shortest_first.setChecked(self.config.get("shortest_book_first", True))
+        queue_layout.addRow(_("Order"), shortest_first)
+        layout.addWidget(queue_group)
+
+        self.apply_form_layout_policy(queue_layout)
+
+        book_concurrency.valueChanged.connect(
+            lambda value: self.config.update(book_concurrency=value)
+        )
+        shortest_first.toggled.connect(
+            lambda checked: self.config.update(shortest_book_first=checked)
+        )
 
         # Merge Translate
         merge_group = QGroupBox("%s %s" % (_("Merge to Translate"), _("(Beta)")))
@@ -405,6 +440,55 @@ class TranslationSetting(QDialog):
 
         toggle_merge_controls(merge_enabled.isChecked())
 
+        # Subtitle Window
+        window_group = QGroupBox(_("Subtitle Window"))
+        window_layout = QGridLayout(window_group)
+        window_enabled = QCheckBox(
+            _("Translate consecutive subtitle cues together")
+        )
+        window_enabled.setToolTip(
+            _(
+                "Merge the cues of SRT, VTT and ASS files into windows "
+                "limited by the number of cues and of characters, which "
+                "takes fewer requests and gives more context."
+            )
+        )
+        window_cues = QSpinBox()
+        window_cues.setRange(1, 999)
+        window_length = QSpinBox()
+        window_length.setRange(1, 99999)
+        window_layout.addWidget(window_enabled, 0, 0, 1, 5)
+        window_layout.addWidget(QLabel(_("Cues:")), 1, 0, Qt.AlignRight)
+        window_layout.addWidget(window_cues, 1, 1)
+        window_layout.addWidget(QLabel(_("Characters:")), 1, 2, Qt.AlignRight)
+        window_layout.addWidget(window_length, 1, 3)
+        window_layout.setColumnStretch(4, 1)
+        layout.addWidget(window_group)
+
+        self.disable_wheel_event(window_cues)
+        self.disable_wheel_event(window_length)
+
+        window_enabled.setChecked(self.config.get("subtitle_window.enabled"))
+        window_cues.setValue(self.config.get("subtitle_window.cue_count"))
+        window_length.setValue(self.config.get("subtitle_window.length"))
+
+        def update_subtitle_window():
+            self.config.update(
+                subtitle_window={
+                    "enabled": window_enabled.isChecked(),
+                    "cue_count": window_cues.value(),
+                    "length": window_length.value(),
+                }
+            )
+            window_cues.setEnabled(window_enabled.isChecked())
+            window_length.setEnabled(window_enabled.isChecked())
+
+        window_enabled.clicked.connect(update_subtitle_window)
+        window_cues.valueChanged.connect(update_subtitle_window)
+        window_length.valueChanged.connect(update_subtitle_window)
+        window_cues.setEnabled(window_enabled.isChecked())
+        window_length.setEnabled(window_enabled.isChecked())
+
         # Network Proxy
         proxy_group = QGroupBox(_("HTTP Proxy"))
         proxy_layout = QHBoxLayout()
@@ -480,8 +564,24 @@ class TranslationSetting(QDialog):
         # Job Log
         log_group = QGroupBox(_("Job Log"))
         log_translation = QCheckBox(_("Show translation"))
+        instrumentation = QCheckBox(_("Record timing spans"))
+        instrumentation.setToolTip(
+            _(
+                "Log the time spent in extraction, caching, requests and "
+                "other hot paths along with the performance report."
+            )
+        )
+        profiling = QCheckBox(_("Save profile"))
+        profiling.setToolTip(
+            _(
+                "Run the job under cProfile and save the .prof file next to "
+                "the job log. This slows down the job."
+            )
+        )
         log_layout = QVBoxLayout(log_group)
         log_layout.addWidget(log_translation)
+        log_layout.addWidget(instrumentation)
+        log_layout.addWidget(profiling)
         log_layout.addStretch(1)
         misc_layout.addWidget(log_group, 1)
 
@@ -498,6 +598,14 @@ class TranslationSetting(QDialog):
         log_translation.toggled.connect(
             lambda checked: self.config.update(log_translation=checked)
         )
+        instrumentation.setChecked(self.config.get("instrumentation", False))
+        instrumentation.toggled.connect(
+            lambda checked: self.config.update(instrumentation=checked)
+        )
+        profiling.setChecked(self.config.get("profiling", False))
+        profiling.toggled.connect(
+            lambda checked: self.config.update(profiling=checked)
+        )
 
         notice.setChecked(self.config.get("show_notification", True))
         notice.toggled.connect(
@@ -561,7 +669,11 @@ class TranslationSetting(QDialog):
             "%s %s"
             % (
                 _("Tip: "),
-                _("API keys will auto-switch if the previous one is unavailable."),
+                _(
+                    "API keys are used at the same time, each with its own "
+                    "concurrency limit and interval. A rejected key is paused "
+                    "for a while."
+                ),
             )
         )
         auto_change.setVisible(False)
@@ -644,6 +756,11 @@ class TranslationSetting(QDialog):
         request_layout.addRow(_("Interval (seconds)"), request_interval)
         request_layout.addRow(_("Attempt times"), request_attempt)
         request_layout.addRow(_("Timeout (seconds)"), request_timeout)
+        request_hedging = QCheckBox(
+            _("Send a duplicate of the requests slower than usual")
+        )
+        request_hedging_label = QLabel(_("Hedging"))
+        request_layout.addRow(request_hedging_label, request_hedging)
         layout.addWidget(request_group)
 
         # Abort Translation
@@ -730,6 +847,16 @@ class TranslationSetting(QDialog):
         stream_enabled = QCheckBox(_("Enable streaming response"))
         genai_layout.addRow(_("Stream"), stream_enabled)
 
+        prompt_caching = QCheckBox(
+            _("Reuse the system prompt through the provider's prompt cache")
+        )
+        genai_layout.addRow(_("Prompt Cache"), prompt_caching)
+
+        structured_merge = QCheckBox(
+            _("Send merged paragraphs as a keyed JSON object")
+        )
+        genai_layout.addRow(_("Structured Merge"), structured_merge)
+
         sampling_btn_group = QButtonGroup(sampling_widget)
         sampling_btn_group.addButton(temperature, 0)
         sampling_btn_group.addButton(top_p, 1)
@@ -742,6 +869,52 @@ class TranslationSetting(QDialog):
 
         layout.addWidget(genai_group)
 
+        # Engine Pool
+        pool_group = QGroupBox(_("Engine Pool"))
+        pool_layout = QVBoxLayout(pool_group)
+        pool_enabled = QCheckBox(_("Enable"))
+        pool_enabled.setChecked(self.config.get("engine_pool.enabled", False))
+        pool_enabled.toggled.connect(
+            lambda checked: self.config.update(
+                engine_pool={
+                    **(self.config.get("engine_pool") or {}),
+                    "enabled": checked,
+                }
+            )
+        )
+        pool_layout.addWidget(pool_enabled)
+        self.pool_members = QPlainTextEdit()
+        self.pool_members.setPlaceholderText(
+            "%s %s" % (_("e.g.,"), "ChatGPT, 3\nDeepSeek, 1, sk-xxx sk-yyy")
+        )
+        self.pool_members.setMinimumHeight(80)
+        self.pool_members.setPlainText(
+            "\n".join(
+                ", ".join(
+                    [member.get("engine"), str(member.get("weight", 1))]
+                    + ([" ".join(member["api_keys"])] if member.get("api_keys") else [])
+                )
+                for member in self.config.get("engine_pool.members", [])
+            )
+        )
+        pool_layout.addWidget(
+            QLabel(_("Engine name, weight and optional API keys. One engine per line:"))
+        )
+        pool_layout.addWidget(self.pool_members)
+        pool_layout.addWidget(
+            QLabel(
+                "%s%s"
+                % (
+                    _("Tip: "),
+                    _(
+                        "Requests are spread over the engines by weight, and "
+                        "fail over to the others when an engine keeps failing."
+                    ),
+                )
+            )
+        )
+        layout.addWidget(pool_group)
+
         # Setup genAI model
         def init_ai_models(model=None):
             try:
@@ -785,7 +958,7 @@ class TranslationSetting(QDialog):
             lambda model: self.current_engine.config.update(model=model.strip())
         )
 
-        def fetch_ai_models():
+        def fetch_ai_models(refresh=False):
             try:
                 genai_model_list.currentTextChanged.disconnect()
             except TypeError:
@@ -795,11 +968,11 @@ class TranslationSetting(QDialog):
             genai_model_list.addItem(_("Fetching..."))
             genai_model_list.setDisabled(True)
             genai_model_input.setVisible(False)
-            self.model_worker.start.emit(self.current_engine)
+            self.model_worker.start.emit(self.current_engine, refresh)
 
         def man_fetch_ai_models():
             if self.api_keys.toPlainText().strip() != "":
-                fetch_ai_models()
+                fetch_ai_models(True)
             else:
                 self.alert.pop(_("You need to provide an API key to proceed."))
 
@@ -888,6 +1061,20 @@ class TranslationSetting(QDialog):
             stream_enabled.toggled.connect(
                 lambda checked: config.update(stream=checked)
             )
+            # Prompt Cache
+            prompt_caching.setChecked(
+                config.get("prompt_caching", self.current_engine.prompt_caching)
+            )
+            prompt_caching.toggled.connect(
+                lambda checked: config.update(prompt_caching=checked)
+            )
+            # Structured Merge
+            structured_merge.setChecked(
+                config.get("structured_merge", self.current_engine.structured_merge)
+            )
+            structured_merge.toggled.connect(
+                lambda checked: config.update(structured_merge=checked)
+            )
             genai_group.setVisible(True)
 
         def choose_default_engine(index):
@@ -956,6 +1143,14 @@ class TranslationSetting(QDialog):
             max_error_count.valueChanged.connect(
                 lambda value: config.update(max_error_count=value)
             )
+            # Hedging is only available for the free engines.
+            is_free = self.current_engine.free
+            request_hedging_label.setVisible(is_free)
+            request_hedging.setVisible(is_free)
+            request_hedging.setChecked(config.get("request_hedging", False))
+            request_hedging.toggled.connect(
+                lambda checked: config.update(request_hedging=checked)
+            )
             # Show GenAI preferences
             genai_group.setVisible(False)
             if issubclass(self.current_engine, GenAI):
@@ -1575,6 +1770,38 @@ class TranslationSetting(QDialog):
                 engine_config.pop(name)
         # Update modified engine preferences
         self.config.update(engine_preferences=engine_config)
+        # Engine pool members: "engine name, weight[, api keys]" per line.
+        engines = {engine.name: engine for engine in builtin_engines}
+        engines.update(
+            (name, CustomTranslate) for name in self.config.get("custom_engines")
+        )
+        members = []
+        for line in self.pool_members.toPlainText().split("\n"):
+            if not line.strip():
+                continue
+            parts = [part.strip() for part in line.split(",", 2)]
+            if parts[0] not in engines:
+                self.alert.pop(
+                    _("{} is not a valid translation engine.").format(parts[0]),
+                    "warning",
+                )
+                return False
+            member = {"engine": parts[0], "weight": 1}
+            if len(parts) > 1 and parts[1]:
+                if not parts[1].isdigit() or int(parts[1]) < 1:
+                    self.alert.pop(
+                        _("The weight of {} must be a positive integer.").format(
+                            parts[0]
+                        ),
+                        "warning",
+                    )
+                    return False
+                member.update(weight=int(parts[1]))
+            if len(parts) > 2 and parts[2]:
+                member.update(api_keys=parts[2].split())
+            members.append(member)
+        pool_config = self.config.get("engine_pool") or {}
+        self.config.update(engine_pool={**pool_config, "members": members})
         return True
 
     def update_content_config(self):
@@ -1,6 +1,10 @@
+import os
+import shutil
+import tempfile
 import unittest
+from unittest.mock import patch
 
-from ..lib.cache import Paragraph
+from ..lib.cache import Paragraph, TranslationCache
 
 
 class TestParagraph(unittest.TestCase):
@@ -75,3 +79,191 @@ class TestParagraph(unittest.TestCase):
         self.paragraph.translation = 'A\n\nB\nC'
         self.paragraph.do_aligment('\n\n')
         self.assertEqual('A\n\nB\n\nC', self.paragraph.translation)
+
+
+class TestTranslationCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.patcher = patch.multiple(
+            TranslationCache, dir_path=self.temp_dir,
+            cache_path=os.path.join(self.temp_dir, 'cache'),
+            temp_path=os.path.join(self.temp_dir, 'temp'))
+        self.patcher.start()
+        self.cache = TranslationCache('test')
+        self.cache.add(0, 'a', '<p>Hello World</p>', 'Hello World')
+        self.cache.add(1, 'b', '<p>Good <b>Night</b></p>', 'Good Night')
+        self.cache.add(2, 'c', '<p>50% off</p>', '50% off')
+        self.cache.connection.commit()
+
+    def tearDown(self):
+        self.cache.destroy()
+        self.patcher.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_pending_size(self):
+        self.assertEqual(28, TranslationCache.pending_size('test'))
+        self.cache.update(0, translation='Bonjour le monde')
+        self.cache.ignore([1])
+        self.assertEqual(7, TranslationCache.pending_size('test'))
+        self.assertIsNone(TranslationCache.pending_size('missing'))
+
+    def test_find_by_info(self):
+        self.assertIsNone(TranslationCache.find_by_info('extraction_key', 'k'))
+        self.cache.set_info('extraction_key', 'k')
+        self.assertEqual(
+            'test', TranslationCache.find_by_info('extraction_key', 'k'))
+        self.assertIsNone(
+            TranslationCache.find_by_info('extraction_key', 'k', 'test'))
+        self.assertIsNone(TranslationCache.find_by_info('extraction_key', 'x'))
+
+    def test_originals(self):
+        self.cache.update(0, translation='Bonjour le monde')
+        self.cache.ignore([1])
+        cache = TranslationCache('other')
+        try:
+            cache.save(TranslationCache.originals('test'))
+            self.assertEqual(
+                [(0, 'a', '<p>Hello World</p>', 'Hello World', 0, None, None,
+                  None, None, None),
+                 (2, 'c', '<p>50% off</p>', '50% off', 0, None, None, None,
+                  None, None)],
+                cache.all())
+            self.assertEqual(1, len(cache.get([1])))
+        finally:
+            cache.destroy()
+
+    def test_checkpoint(self):
+        self.assertIsNone(self.cache.get_checkpoint())
+        self.cache.set_checkpoint('extracting', fingerprint='a')
+        self.cache.close()
+        self.cache = TranslationCache('test')
+        self.assertTrue(self.cache.is_fresh())
+        self.assertEqual('extracting', self.cache.get_checkpoint()['phase'])
+
+        self.cache.save([])
+        self.cache.close()
+        self.cache = TranslationCache('test')
+        self.assertFalse(self.cache.is_fresh())
+        checkpoint = self.cache.get_checkpoint()
+        self.assertEqual('translating', checkpoint['phase'])
+        self.assertEqual('a', checkpoint['fingerprint'])
+        self.assertEqual((0, 3), self.cache.get_progress())
+
+    def test_resume(self):
+        self.cache.save([])
+        self.cache.close()
+        self.cache = TranslationCache('test')
+        self.assertEqual(
+            'translating', self.cache.resume('a')['phase'])
+        self.assertFalse(self.cache.is_fresh())
+        self.assertEqual('a', self.cache.get_checkpoint()['fingerprint'])
+        self.assertIsNotNone(self.cache.resume('a'))
+
+    def test_resume_changed_source(self):
+        self.cache.set_checkpoint('translating', fingerprint='a')
+        self.cache.update(0, translation='Bonjour le monde')
+        self.cache.update(2, translation='50% de remise')
+        self.assertIsNone(self.cache.resume('b'))
+        self.assertTrue(self.cache.is_fresh())
+        self.cache.save([
+            (0, 'd', '<p>Hello World</p>', 'Hello World', False, None, None),
+            (1, 'e', '<p>New</p>', 'New', False, None, None)])
+        self.assertEqual(
+            [(0, 'Bonjour le monde'), (1, None)],
+            [(row[0], row[7]) for row in self.cache.all()])
+        checkpoint = self.cache.get_checkpoint()
+        self.assertEqual('translating', checkpoint['phase'])
+        self.assertEqual('b', checkpoint['fingerprint'])
+
+    def test_done(self):
+        cache = TranslationCache('temp', False)
+        cache.set_checkpoint('translating')
+        cache.close()
+        cache = TranslationCache('temp', False)
+        self.assertTrue(os.path.exists(cache.file_path))
+        cache.done()
+        self.assertFalse(os.path.exists(cache.file_path))
+        self.cache.done()
+        self.assertEqual('done', self.cache.get_checkpoint()['phase'])
+
+    def test_search_original(self):
+        self.assertEqual({0}, self.cache.search('world'))
+        self.assertEqual({1}, self.cache.search('NI'))
+        self.assertEqual({2}, self.cache.search('0%'))
+        self.assertEqual(set(), self.cache.search('bye'))
+
+    def test_search_raw(self):
+        self.assertEqual({1}, self.cache.search('<b>n', 'raw'))
+        self.assertEqual(set(), self.cache.search('<b>n'))
+
+    def test_search_translation(self):
+        self.assertEqual(set(), self.cache.search('monde', 'translation'))
+        self.cache.update(0, translation='Bonjour "le" monde')
+        self.assertEqual({0}, self.cache.search('monde', 'translation'))
+        self.assertEqual({0}, self.cache.search('"le"', 'translation'))
+        self.cache.update(0, translation='Salut')
+        self.assertEqual(set(), self.cache.search('monde', 'translation'))
+
+    def test_search_after_delete(self):
+        self.cache.delete([0])
+        self.assertEqual(set(), self.cache.search('world'))
+
+    def test_search_index_created_on_search(self):
+        exists = ("SELECT name FROM sqlite_master WHERE type='table' "
+                  "AND name='cache_search'")
+        cache = TranslationCache('search', False)
+        self.addCleanup(cache.destroy)
+        cache.save([
+            (0, 'a', '<p>Hello World</p>', 'Hello World', False, None, None)])
+        self.assertIsNone(cache.searchable)
+        self.assertIsNone(cache.cursor.execute(exists).fetchone())
+        self.assertEqual({0}, cache.search('world'))
+        self.assertIsNotNone(cache.cursor.execute(exists).fetchone())
+
+    def test_search_short_keyword_non_ascii(self):
+        self.cache.update(0, translation='Größe ÄÖ')
+        self.assertEqual({0}, self.cache.search('äö', 'translation'))
+        self.assertEqual({0}, self.cache.search('ÄÖ', 'translation'))
+        self.assertEqual({2}, self.cache.search('0%'))
+
+    def test_search_unsupported_column(self):
+        self.assertRaises(ValueError, self.cache.search, 'a', 'md5')
+
+    def test_update_paragraphs(self):
+        paragraphs = self.cache.get_paragraphs([0, 2])
+        for paragraph in paragraphs:
+            paragraph.translation = 'Translated %s' % paragraph.id
+            paragraph.engine_name = 'Google'
+            paragraph.target_lang = 'French'
+        self.cache.update_paragraphs(paragraphs)
+
+        paragraphs = self.cache.get_paragraphs([0, 1, 2])
+        self.assertEqual(
+            ['Translated 0', None, 'Translated 2'],
+            [paragraph.translation for paragraph in paragraphs])
+        self.assertEqual(
+            ['Google', None, 'Google'],
+            [paragraph.engine_name for paragraph in paragraphs])
+        self.assertEqual({2}, self.cache.search('ed 2', 'translation'))
+
+    def test_batch_jobs(self):
+        self.assertEqual([], self.cache.get_batch_jobs('chatgpt'))
+
+        self.cache.save_batch_job('chatgpt', {
+            'batch_id': 'batch-1', 'file_id': 'file-1',
+            'status': 'submitted', 'custom_ids': ['a', 'b']})
+        self.cache.save_batch_job('claude', {
+            'batch_id': 'batch-2', 'status': 'submitted', 'attempt': 1})
+        self.cache.save_batch_job('chatgpt', {
+            'batch_id': 'batch-1', 'status': 'completed',
+            'output': 'file-2'})
+
+        self.assertEqual([{
+            'batch_id': 'batch-1', 'file_id': 'file-1', 'status': 'completed',
+            'custom_ids': ['a', 'b'], 'output': 'file-2', 'attempt': 0}],
+            self.cache.get_batch_jobs('chatgpt'))
+        self.assertEqual(1, self.cache.get_batch_jobs('claude')[0]['attempt'])
+
+        self.cache.del_batch_jobs('chatgpt')
+        self.assertEqual([], self.cache.get_batch_jobs('chatgpt'))
+        self.assertEqual(1, len(self.cache.get_batch_jobs('claude')))
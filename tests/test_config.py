@@ -1,10 +1,13 @@
 import unittest
-from unittest.mock import call, Mock
+from unittest.mock import call, patch, Mock
 
 from ..lib.config import (
     Configuration, get_config, ver200_upgrade, ver203_upgrade)
 
 
+module_name = 'calibre_plugins.ebook_translator.lib.config'
+
+
 class TestFunction(unittest.TestCase):
     def setUp(self):
         self.config = get_config()
@@ -40,9 +43,19 @@ class TestFunction(unittest.TestCase):
             'glossary_enabled': False,
             'glossary_path': None,
             'merge_enabled': False,
+            'merge_strategy': 'length',
             'merge_length': 1800,
+            'subtitle_window': {
+                'enabled': False, 'cue_count': 30, 'length': 1500},
             'ebook_metadata': {},
             'search_paths': [],
+            'engine_pool': {'enabled': False, 'members': []},
+            'job_coordination': True,
+            'book_concurrency': 2,
+            'shortest_book_first': True,
+            'epub_in_place': False,
+            'instrumentation': False,
+            'profiling': False,
         }
 
         self.assertEqual(defaults, self.config.preferences.defaults)
@@ -200,3 +213,52 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(
             self.config.preferences.mock_calls,
             [call.update(b=2), call.commit()])
+
+
+class Preferences(dict):
+    commit = Mock()
+
+
+@patch(module_name + '._config_stamp')
+@patch(module_name + '.JSONConfig')
+class TestConfigSnapshot(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.dict(module_name + '._snapshots', clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reuse_snapshot(self, mock_json_config, mock_config_stamp):
+        mock_json_config.return_value = Preferences({'a': {'b': 1}})
+        mock_config_stamp.return_value = (1, 10)
+
+        config = get_config(snapshot=True)
+        self.assertIs(config, get_config(snapshot=True))
+        self.assertEqual(1, config.get('a.b'))
+        mock_json_config.assert_called_once()
+
+    def test_reload_modified_file(self, mock_json_config, mock_config_stamp):
+        mock_json_config.return_value = Preferences({'a': 1})
+        mock_config_stamp.return_value = (1, 10)
+        config = get_config(snapshot=True)
+
+        mock_json_config.return_value = Preferences({'a': 2})
+        mock_config_stamp.return_value = (2, 10)
+        self.assertEqual(2, get_config(snapshot=True).get('a'))
+        self.assertEqual(1, config.get('a'))
+
+    def test_reload_after_commit(self, mock_json_config, mock_config_stamp):
+        mock_json_config.return_value = Preferences(a=1)
+        mock_config_stamp.return_value = None
+        config = get_config(snapshot=True)
+
+        get_config().commit()
+        self.assertIsNot(config, get_config(snapshot=True))
+
+    def test_read_only(self, mock_json_config, mock_config_stamp):
+        mock_json_config.return_value = Preferences({'a': 1})
+        mock_config_stamp.return_value = None
+        config = get_config(snapshot=True)
+
+        self.assertRaises(TypeError, config.update, a=2)
+        self.assertRaises(TypeError, config.set, 'a', 2)
+        self.assertRaises(TypeError, config.commit)
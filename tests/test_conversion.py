@@ -1,10 +1,19 @@
+import os
+import shutil
+import tempfile
 import unittest
 from pathlib import Path
 from typing import Callable
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, mock_open, create_autospec
 
-from ..lib.conversion import ConversionWorker
+from ..lib.conversion import (
+    ConversionWorker, convert_epub, convert_pgn, convert_vtt, get_book_size)
+from ..lib.cache import Paragraph
+from ..lib.config import Configuration
 from ..lib.ebook import Ebook
+from ..lib.element import PgnElement, ElementHandler
+from ..lib.metrics import JobMetrics, get_profile_path, get_report_path
+from ..engines import DeeplFreeTranslate
 
 
 module_name = 'calibre_plugins.ebook_translator.lib.conversion'
@@ -26,6 +35,62 @@ class TestConversionWorker(unittest.TestCase):
     def test_create_worker(self):
         self.assertIsInstance(self.worker, ConversionWorker)
 
+    def test_save_reports(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        self.job.log_path = os.path.join(temp_dir, 'job.log')
+        output_path = os.path.join(temp_dir, 'test.epub')
+        report_path = get_report_path(output_path)
+        profile_path = get_profile_path(output_path)
+        for path in (report_path, profile_path):
+            self.addCleanup(
+                lambda path=path: os.path.exists(path) and os.remove(path))
+
+        self.worker.save_reports(self.job, output_path)
+        self.assertEqual([], os.listdir(temp_dir))
+
+        with open(report_path, 'w') as file:
+            file.write('{}')
+        self.worker.save_reports(self.job, output_path)
+        self.assertFalse(os.path.exists(report_path))
+        self.assertEqual(['job.json'], os.listdir(temp_dir))
+
+        with open(profile_path, 'w') as file:
+            file.write('profile')
+        self.worker.save_reports(self.job, output_path)
+        self.assertFalse(os.path.exists(profile_path))
+        self.assertTrue(os.path.exists(os.path.join(temp_dir, 'job.prof')))
+
+    def test_get_scheduler_stop(self):
+        # The signature of JobManager.kill_job of calibre.
+        def kill_job(job, view):
+            pass
+        self.gui.bookfere_ebook_translator.scheduler = None
+        self.gui.job_manager.kill_job = create_autospec(kill_job)
+        self.worker.config = {}
+
+        scheduler = self.worker.get_scheduler()
+        scheduler.stop(self.job)
+        self.gui.job_manager.kill_job.assert_called_once_with(
+            self.job, self.gui)
+
+    @patch(module_name + '.get_book_size')
+    @patch(module_name + '.get_engine_name')
+    @patch(module_name + '.get_translator')
+    def test_schedule_ebooks(
+            self, mock_get_translator, mock_get_engine_name,
+            mock_get_book_size):
+        mock_get_engine_name.return_value = 'Google'
+        mock_get_book_size.return_value = 100
+        scheduler = Mock()
+        self.worker.get_scheduler = Mock(return_value=scheduler)
+
+        self.worker.schedule_ebooks([self.ebook])
+        mock_get_translator.assert_not_called()
+        mock_get_book_size.assert_called_once_with(self.ebook, 'Google')
+        scheduler.add.assert_called_once_with(self.ebook, 100)
+        scheduler.schedule.assert_called_once_with()
+
     def test_translate_done_job_failed_debug(self):
         self.job.failed = True
         with patch(module_name + '.DEBUG', True):
@@ -47,6 +112,7 @@ class TestConversionWorker(unittest.TestCase):
         self.job.failed = False
         self.job.description = 'test description'
         self.job.log_path = '/path/to/log'
+        mock_os.path.exists.return_value = False
         metadata_config = {
             'subjects': ['test subject 1', 'test subject 2'],
             'lang_code': True,
@@ -301,3 +367,106 @@ class TestConversionWorker(unittest.TestCase):
         arguments = self.worker.gui.proceed_question.mock_calls[0].kwargs
         self.assertEqual(True, arguments.get('log_is_file'))
         self.assertIs(self.icon, arguments.get('icon'))
+
+
+class TestGetBookSize(unittest.TestCase):
+    @patch(module_name + '.TranslationCache.pending_size')
+    @patch(module_name + '.get_cache_id')
+    @patch('calibre_plugins.ebook_translator.lib.element.get_config')
+    def test_subtitle_window(
+            self, mock_get_config, mock_get_cache_id, mock_pending_size):
+        mock_get_config.return_value = Configuration({
+            'merge_enabled': True, 'merge_length': 1800,
+            'subtitle_window': {
+                'enabled': True, 'cue_count': 30, 'length': 1500}})
+        mock_pending_size.return_value = None
+        ebook = Mock(Ebook)
+        ebook.get_input_path.return_value = '/path/to/input.srt'
+        ebook.target_lang = 'French'
+        ebook.encoding = 'utf-8'
+        ebook.input_format = 'srt'
+
+        self.assertIsNone(get_book_size(ebook, 'Google'))
+        mock_get_cache_id.assert_called_once_with(
+            '/path/to/input.srt', 'Google', 'French', 1500, 'utf-8')
+        mock_pending_size.assert_called_once_with(
+            mock_get_cache_id.return_value)
+
+        ebook.input_format = 'epub'
+        get_book_size(ebook, 'Google')
+        self.assertEqual(1800, mock_get_cache_id.call_args[0][3])
+
+
+class TestConvertEpub(unittest.TestCase):
+    @patch(module_name + '.convert_book')
+    def test_fall_back_to_conversion(self, mock_convert_book):
+        args = (Mock(), Mock(), Mock(), 'debug info', 'utf-8', Mock())
+        convert_epub('/path/to/missing.epub', '/path/to/output.epub', *args)
+        mock_convert_book.assert_called_once_with(
+            '/path/to/missing.epub', '/path/to/output.epub', *args)
+
+
+class TestConvertPgn(unittest.TestCase):
+    @patch(module_name + '.open', new_callable=mock_open)
+    @patch(module_name + '.open_file')
+    @patch(module_name + '.get_pgn_elements')
+    def test_output_translations(
+            self, mock_get_pgn_elements, mock_open_file, mock_open):
+        mock_open_file.return_value = '1. e4 {a} e5 {a} 2. Nf3 {b}'
+        elements = [
+            PgnElement(['{a}', 'A'], (6, 9)),
+            PgnElement(['{a}', None], (13, 16)),
+            PgnElement(['{b}', 'B'], (24, 27))]
+        mock_get_pgn_elements.return_value = elements
+
+        convert_pgn(
+            '/path/to/input.pgn', '/path/to/output.pgn',
+            Mock(metrics=JobMetrics()), Mock(), Mock(), 'debug info',
+            'utf-8', Mock())
+
+        mock_open.assert_called_once_with(
+            '/path/to/output.pgn', 'w', encoding='utf-8')
+        mock_open().write.assert_called_once_with(
+            '1. e4 {A} e5 {a} 2. Nf3 {B}')
+
+
+class TestConvertSubtitles(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, 'input.vtt')
+        self.output_path = os.path.join(self.temp_dir, 'output.vtt')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_convert_vtt(self):
+        with open(self.input_path, 'w', encoding='utf-8', newline='') as file:
+            file.write(
+                'WEBVTT\r\n\r\nNOTE a\r\n\r\n\r\n1\r\n'
+                '00:01.000 --> 00:02.000\r\nHello\r\n\r\n'
+                '00:03.000 --> 00:04.000\r\nWorld\r\n')
+        element_handler = ElementHandler(
+            DeeplFreeTranslate.placeholder, DeeplFreeTranslate.separator,
+            'below')
+        cache = Mock()
+        cache.all_paragraphs.return_value = [
+            Paragraph(0, 'a', 'Hello', 'Hello', translation='Bonjour'),
+            Paragraph(1, 'b', 'World', 'World', translation='Monde')]
+
+        translation = Mock(metrics=JobMetrics())
+
+        convert_vtt(
+            self.input_path, self.output_path, translation, element_handler,
+            cache, 'debug info', 'utf-8', Mock())
+
+        self.assertEqual(
+            ['Hello', 'World'],
+            [item[3] for item in cache.save.call_args[0][0]])
+        with open(self.output_path, encoding='utf-8') as file:
+            self.assertEqual(
+                'WEBVTT\n\nNOTE a\n\n1\n00:01.000 --> 00:02.000\n'
+                'Hello\nBonjour\n\n00:03.000 --> 00:04.000\nWorld\nMonde\n',
+                file.read())
+        self.assertEqual(
+            ['extract', 'prepare', 'cache_save', 'output'],
+            list(translation.metrics.get_report()['phases']))
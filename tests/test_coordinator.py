@@ -0,0 +1,86 @@
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from ..lib.coordinator import SlotCoordinator
+
+
+module_name = 'calibre_plugins.ebook_translator.lib.coordinator'
+
+
+class TestSlotCoordinator(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.coordinator = SlotCoordinator(self.temp_dir, 'test', 2, 10.0)
+        # The coordinator of another job process.
+        self.other = SlotCoordinator(self.temp_dir, 'test', 2, 10.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_try_acquire(self):
+        first = self.coordinator._try_acquire()
+        second = self.other._try_acquire()
+        self.assertTrue(first.name.endswith('test-0.lock'))
+        self.assertTrue(second.name.endswith('test-1.lock'))
+
+        # All the slots are in use.
+        self.assertEqual(0.5, self.coordinator._try_acquire())
+
+        self.coordinator.release(first)
+        self.other.release(second)
+
+    def test_try_acquire_without_waiting(self):
+        slots = [self.coordinator.try_acquire(), self.other.try_acquire()]
+        self.assertIsNone(self.coordinator.try_acquire())
+        for slot in slots:
+            self.coordinator.release(slot)
+
+    def test_release_without_truncating(self):
+        slot = self.coordinator.try_acquire()
+        self.coordinator.release(slot)
+        with open(slot.name) as file:
+            content = file.read()
+        self.assertEqual(self.coordinator.time_width, len(content))
+        self.assertGreater(float(content), 0)
+
+    @patch(module_name + '.time.time')
+    def test_try_acquire_after_request_interval(self, mock_time):
+        mock_time.return_value = 100.0
+        self.coordinator.poll_interval = 30.0
+        slot = self.coordinator._try_acquire()
+        self.coordinator.release(slot)
+        slot = self.other._try_acquire()
+        self.assertTrue(slot.name.endswith('test-1.lock'))
+        self.other.release(slot)
+
+        # Wait for the slot which can be used soonest.
+        mock_time.return_value = 104.0
+        self.assertEqual(6.0, self.coordinator._try_acquire())
+
+        mock_time.return_value = 110.0
+        slot = self.coordinator._try_acquire()
+        self.assertTrue(slot.name.endswith('test-0.lock'))
+        self.coordinator.release(slot)
+
+    @patch(module_name + '.time.sleep')
+    def test_acquire(self, mock_sleep):
+        self.other.request_interval = 0.0
+        slots = [self.other._try_acquire(), self.other._try_acquire()]
+        mock_sleep.side_effect = lambda seconds: self.other.release(
+            slots.pop(0))
+
+        slot = self.coordinator.acquire()
+        mock_sleep.assert_called_once_with(0.5)
+        self.assertTrue(slot.name.endswith('test-0.lock'))
+
+        self.coordinator.release(slot)
+        self.other.release(slots.pop(0))
+
+    def test_hold(self):
+        slot = self.coordinator._try_acquire()
+        stream = self.coordinator.hold(slot, iter('ab'))
+        self.assertIsInstance(self.other._try_acquire(), type(slot))
+        self.assertEqual('ab', ''.join(stream))
+        self.assertTrue(slot.closed)
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, Mock
+
+from ..lib.credential import CredentialCache
+
+
+module_name = 'calibre_plugins.ebook_translator.lib.credential'
+
+
+class TestCredentialCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'credentials.json')
+        self.cache = CredentialCache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_get(self):
+        fetch = Mock(return_value=('token', time.time() + 3600))
+        self.assertEqual('token', self.cache.get('test', fetch))
+        self.assertEqual('token', self.cache.get('test', fetch))
+        fetch.assert_called_once_with()
+
+        with open(self.path) as file:
+            self.assertEqual('token', json.load(file)['test']['value'])
+        if sys.platform != 'win32':
+            self.assertEqual(0o600, os.stat(self.path).st_mode & 0o777)
+
+    def test_get_shared(self):
+        self.cache.get('test', lambda: ('token', time.time() + 3600))
+
+        # Another process reads the credential from the file.
+        fetch = Mock()
+        cache = CredentialCache(self.path)
+        self.assertEqual('token', cache.get('test', fetch))
+        fetch.assert_not_called()
+
+    def test_get_force(self):
+        self.cache.get('token', lambda: ('abc', time.time() + 3600))
+        fetch = Mock(return_value=('def', time.time() + 3600))
+        self.assertEqual('def', self.cache.get('token', fetch, force=True))
+        fetch.assert_called_once_with()
+        self.assertEqual('def', self.cache.get('token', Mock()))
+
+    def test_get_expired(self):
+        self.cache.get('test', lambda: ('old token', time.time() - 1))
+        self.assertEqual(
+            'new token',
+            self.cache.get('test', lambda: ('new token', time.time() + 3600)))
+
+    @patch(module_name + '.Thread')
+    def test_get_refresh_ahead(self, mock_thread):
+        self.cache.get('test', lambda: ('old token', time.time() + 100))
+        fetch = Mock(return_value=('new token', time.time() + 3600))
+
+        self.assertEqual('old token', self.cache.get('test', fetch))
+        self.assertEqual('old token', self.cache.get('test', fetch))
+        mock_thread.assert_called_once_with(
+            target=self.cache._refresh, args=('test', fetch), daemon=True)
+
+        self.cache._refresh('test', fetch)
+        self.assertEqual(set(), self.cache.refreshing)
+        self.assertEqual('new token', self.cache.get('test', fetch))
+
+    def test_get_with_broken_file(self):
+        with open(self.path, 'w') as file:
+            file.write('broken')
+        self.assertEqual(
+            'token',
+            self.cache.get('test', lambda: ('token', time.time() + 3600)))
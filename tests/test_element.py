@@ -1,6 +1,6 @@
 import re
 import unittest
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, mock_open
 
 from lxml import etree
 
@@ -8,11 +8,12 @@ from calibre.ebooks.oeb.base import TOC, Metadata
 
 from ..lib.utils import ns, create_xpath
 from ..lib.cache import Paragraph
+from ..lib.config import Configuration
 from ..lib.element import (
     get_string, get_name, Extraction, ElementHandler, ElementHandlerMerge,
     Element, SrtElement, PgnElement, TocElement, PageElement, MetadataElement,
-    get_srt_elements, get_pgn_elements, get_toc_elements,
-    get_metadata_elements)
+    AssElement, get_srt_elements, get_pgn_elements, get_toc_elements,
+    get_metadata_elements, read_srt, read_vtt, read_ass, get_element_handler)
 from ..engines import DeeplFreeTranslate
 from ..engines.base import Base
 
@@ -41,14 +42,62 @@ class TestFunction(unittest.TestCase):
         xhtml = '<p xmlns="http://www.w3.org/1999/xhtml">a</p>'
         self.assertEqual('p', get_name(etree.XML(xhtml)))
 
-    @patch('calibre_plugins.ebook_translator.lib.element.open_file')
-    def test_get_srt_elements(self, mock_open_file):
-        mock_open_file.return_value = '01:00\n0\na\nb\n\n02:00\n1\nc\n\n'
-        elements = get_srt_elements('/path/to/srt', 'utf-8')
-        mock_open_file.assert_called_once_with('/path/to/srt', 'utf-8')
+    def test_get_srt_elements(self):
+        content = '0\n01 --> 02\na\nb\n\n1\n02 --> 03\nc\n\n'
+        with patch(module_name + '.open', mock_open(read_data=content)) \
+                as mock_file:
+            elements = get_srt_elements('/path/to/srt', 'utf-8')
+        mock_file.assert_called_once_with(
+            '/path/to/srt', 'r', encoding='utf-8', newline=None)
         self.assertEqual(2, len(elements))
-        self.assertEqual(['01:00', '0', 'a\nb'], elements[0].element)
-        self.assertEqual(['02:00', '1', 'c'], elements[1].element)
+        self.assertEqual(['0', '01 --> 02', 'a\nb'], elements[0].element)
+        self.assertEqual(['1', '02 --> 03', 'c'], elements[1].element)
+
+    def test_read_srt_malformed(self):
+        content = (
+            '\ufeff1\r\n00:01 --> 00:02\r\na\r\n\r\n\r\n\r\n'
+            '00:03 --> 00:04\r\nb\r\n\r\nnoise\r\n\r\n'
+            'more\r\nnoise\r\n\r\n3\r\n00:05 --> 00:06\r\n')
+        with patch(module_name + '.open', mock_open(read_data=content)):
+            items = list(read_srt('/path/to/srt', 'utf-8'))
+        self.assertEqual(5, len(items))
+        self.assertEqual(['1', '00:01 --> 00:02', 'a'], items[0].element)
+        self.assertEqual([None, '00:03 --> 00:04', 'b'], items[1].element)
+        self.assertEqual('00:03 --> 00:04\nb', items[1].get_translation())
+        self.assertEqual('noise', items[2])
+        self.assertEqual('more\nnoise', items[3])
+        self.assertEqual(['3', '00:05 --> 00:06', ''], items[4].element)
+
+    def test_read_vtt(self):
+        content = (
+            'WEBVTT\n\nNOTE a note\n\nintro\n00:01.000 --> 00:02.000\n'
+            'a\nb\n\n00:03.000 --> 00:04.000 line:0\nc\n')
+        with patch(module_name + '.open', mock_open(read_data=content)):
+            items = list(read_vtt('/path/to/vtt', 'utf-8'))
+        self.assertEqual(['WEBVTT', 'NOTE a note'], items[:2])
+        self.assertEqual(
+            ['intro', '00:01.000 --> 00:02.000', 'a\nb'], items[2].element)
+        self.assertEqual(
+            [None, '00:03.000 --> 00:04.000 line:0', 'c'], items[3].element)
+
+    def test_read_ass(self):
+        content = (
+            '[Script Info]\nTitle: Dialogue: test\n\n[Events]\n'
+            'Format: Layer, Start, End, Style, Text\n'
+            'Dialogue: 0,0:00:01.00,0:00:02.00,Default,{\\an8}a, b\\Nc\n'
+            'Comment: 0,0:00:01.00,0:00:02.00,Default,d\n'
+            'Dialogue: broken\n')
+        with patch(module_name + '.open', mock_open(read_data=content)):
+            items = list(read_ass('/path/to/ass', 'utf-8'))
+        self.assertEqual(8, len(items))
+        self.assertEqual(
+            ['[Script Info]', 'Title: Dialogue: test', '', '[Events]',
+             'Format: Layer, Start, End, Style, Text'], items[:5])
+        self.assertEqual(
+            ['Dialogue: 0,0:00:01.00,0:00:02.00,Default,',
+             '{\\an8}a, b\\Nc'], items[5].element)
+        self.assertEqual('Comment: 0,0:00:01.00,0:00:02.00,Default,d', items[6])
+        self.assertEqual('Dialogue: broken', items[7])
 
     @patch('calibre_plugins.ebook_translator.lib.element.open_file')
     def test_get_pgn_elements(self, mock_open_file):
@@ -58,6 +107,8 @@ class TestFunction(unittest.TestCase):
         self.assertEqual(2, len(elements))
         self.assertEqual(['{abc}', None], elements[0].element)
         self.assertEqual(['{def}', None], elements[1].element)
+        self.assertEqual((10, 15), elements[0].span)
+        self.assertEqual((23, 28), elements[1].span)
 
     def test_get_toc_elements(self):
         toc = TOC()
@@ -71,6 +122,22 @@ class TestFunction(unittest.TestCase):
         elements = get_toc_elements(toc, [])
         self.assertEqual(3, len(elements))
 
+    @patch(module_name + '.get_config')
+    def test_get_element_handler_subtitle_window(self, mock_get_config):
+        mock_get_config.return_value = Configuration({
+            'subtitle_window': {
+                'enabled': True, 'cue_count': 20, 'length': 800}})
+        handler = get_element_handler(
+            Base.placeholder, Base.separator, 'auto', 'srt')
+        self.assertIsInstance(handler, ElementHandlerMerge)
+        self.assertEqual(20, handler.window_size)
+        self.assertEqual(800, handler.get_merge_length())
+
+        handler = get_element_handler(
+            Base.placeholder, Base.separator, 'auto', 'epub')
+        self.assertNotIsInstance(handler, ElementHandlerMerge)
+        self.assertEqual(0, handler.get_merge_length())
+
     @patch(module_name + '.get_config')
     def test_get_metadata_elements(self, mock_get_config):
         mock_get_config.return_value.get.return_value = False
@@ -229,6 +296,38 @@ class TestSrtElement(unittest.TestCase):
         self.assertEqual('A', self.element.element[2])
 
 
+class TestAssElement(unittest.TestCase):
+    def setUp(self):
+        self.element = AssElement(['Dialogue: 0,,,Default,', '{\\an8}a\\Nb'])
+        self.element.position = 'below'
+
+    def test_get_raw(self):
+        self.assertEqual('{\\an8}a\\Nb', self.element.get_raw())
+
+    def test_get_content(self):
+        self.assertEqual('a\nb', self.element.get_content())
+
+    def test_add_translation_none(self):
+        self.element.add_translation()
+        self.assertEqual(
+            'Dialogue: 0,,,Default,{\\an8}a\\Nb',
+            self.element.get_translation())
+
+    def test_add_translation_below(self):
+        self.element.add_translation('A\nB')
+        self.assertEqual('{\\an8}a\\Nb\\NA\\NB', self.element.element[1])
+
+    def test_add_translation_above(self):
+        self.element.position = 'above'
+        self.element.add_translation('A')
+        self.assertEqual('A\\N{\\an8}a\\Nb', self.element.element[1])
+
+    def test_add_translation_only(self):
+        self.element.position = 'only'
+        self.element.add_translation('A')
+        self.assertEqual('{\\an8}A', self.element.element[1])
+
+
 class TestPgnElement(unittest.TestCase):
     def setUp(self):
         self.item = ['{a}', None]
@@ -1527,6 +1626,17 @@ class TestElementHandlerMerge(unittest.TestCase):
             (2, 'm3', '<p id="c" class="c">c</p>', 'c\n\n', False)]
         self.assertEqual(items, self.handler.prepare_original(self.elements))
 
+    @patch(module_name + '.uid')
+    def test_prepare_original_merge_window(self, mock_uid):
+        mock_uid.side_effect = ['m1', 'm2']
+        self.handler.separator = Base.separator
+        self.handler.set_window_size(2)
+        items = [
+            (0, 'm1', '<p id="a">a</p>\n\n<p id="b">b</p>\n\n', 'a\n\nb\n\n',
+             False),
+            (1, 'm2', '<p id="c" class="c">c</p>', 'c\n\n', False)]
+        self.assertEqual(items, self.handler.prepare_original(self.elements))
+
     def test_prepare_translation(self):
         pass
 
@@ -4,7 +4,7 @@ import json
 import unittest
 from pathlib import Path
 from types import GeneratorType
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, ANY, call
 
 from mechanize import HTTPError
 from mechanize._response import closeable_response as mechanize_response
@@ -15,8 +15,10 @@ from ..engines.base import Base
 from ..engines.genai import GenAI
 from ..engines.deepl import DeeplTranslate
 from ..engines.openai import ChatgptTranslate, ChatgptBatchTranslate
-from ..engines.microsoft import AzureChatgptTranslate
-from ..engines.anthropic import ClaudeTranslate
+from ..engines.microsoft import (
+    AzureChatgptTranslate, AzureChatgptBatchTranslate)
+from ..engines.anthropic import ClaudeTranslate, ClaudeBatchTranslate
+from ..engines.google import GeminiTranslate, GeminiBatchTranslate
 from ..engines.custom import (
     create_engine_template, load_engine_data, CustomTranslate)
 
@@ -85,7 +87,9 @@ class TestBase(unittest.TestCase):
         self.assertEqual([], translator.bad_api_keys)
         self.assertEqual('a', translator.api_key)
 
-        self.assertEqual(5, translator.concurrency_limit)
+        # The concurrency limit applies to each of the sharded keys.
+        self.assertEqual(['a', 'b', 'c'], translator.sharder.keys)
+        self.assertEqual(15, translator.concurrency_limit)
         self.assertEqual(10, translator.request_interval)
         self.assertEqual(3, translator.request_attempt)
         self.assertEqual(10, translator.request_timeout)
@@ -248,6 +252,71 @@ class TestBase(unittest.TestCase):
             self.assertRegex(
                 str(cm.exception), 'test parse error\n\nany unexpected result')
 
+    def test_set_api_keys(self):
+        self.translator.concurrency_limit = 2
+        self.translator.set_api_keys(['a', 'b'])
+        self.assertEqual('a', self.translator.api_key)
+        self.assertEqual(4, self.translator.concurrency_limit)
+
+        self.translator.set_api_keys(['c'])
+        self.assertIsNone(self.translator.sharder)
+        self.assertEqual('c', self.translator.api_key)
+        self.assertEqual(2, self.translator.concurrency_limit)
+
+    @patch(module_name + '.base.request')
+    def test_translate_with_sharded_keys(self, mock_request):
+        self.translator.set_api_keys(['a', 'b'])
+        self.translator.api_key_errors = ['401']
+        used_keys = []
+
+        def request(*args, **kwargs):
+            used_keys.append(self.translator.api_key)
+            if self.translator.api_key == 'a':
+                raise Exception('HTTP Error 401: Unauthorized')
+            return 'result'
+
+        mock_request.side_effect = request
+
+        self.assertEqual('result', self.translator.translate('Hello World'))
+        self.assertEqual('result', self.translator.translate('Hello World'))
+        self.assertEqual(['a', 'b', 'b'], used_keys)
+        self.assertEqual('a', self.translator.api_key)
+        self.assertEqual({'a': 0, 'b': 0}, self.translator.sharder.in_flight)
+        self.assertEqual(
+            'API keys: ...a 1 (quarantined 1 times), ...b 2',
+            self.translator.get_key_report())
+
+    @patch(module_name + '.base.get_coordinator')
+    @patch(module_name + '.base.request')
+    def test_translate_coordinated(self, mock_request, mock_get_coordinator):
+        mock_request.return_value = 'result'
+        mock_coordinator = mock_get_coordinator.return_value
+        self.translator.set_api_keys(['a'])
+        self.translator.concurrency_limit = 2
+        self.translator.request_interval = 5.0
+
+        self.translator.translate('Hello World')
+        mock_get_coordinator.assert_not_called()
+
+        self.translator.set_coordinated(True)
+        self.assertEqual('result', self.translator.translate('Hello World'))
+        mock_get_coordinator.assert_called_once_with(None, 'a', 2, 5.0)
+        mock_coordinator.acquire.assert_called_once_with()
+        mock_coordinator.release.assert_called_once_with(
+            mock_coordinator.acquire.return_value)
+
+    def test_reserve_slot(self):
+        self.assertIsNone(self.translator._reserve_slot()())
+
+        coordinator = Mock()
+        self.translator._local.coordinator = coordinator
+        coordinator.try_acquire.return_value = None
+        self.assertIsNone(self.translator._reserve_slot())
+
+        coordinator.try_acquire.return_value = 'slot'
+        self.translator._reserve_slot()()
+        coordinator.release.assert_called_once_with('slot')
+
     @patch(module_name + '.base.Base.need_swap_api_key')
     @patch(module_name + '.base.request')
     def test_translate_no_need_swap_api_keys(
@@ -445,6 +514,36 @@ class TestChatgptTranslate(unittest.TestCase):
             headers=self.translator.get_headers(),
             proxy_uri=self.translator.proxy_uri)
 
+    @patch(module_name + '.genai.get_model_cache')
+    def test_get_cached_models(self, mock_get_model_cache):
+        mock_cache = mock_get_model_cache.return_value
+        mock_cache.get.side_effect = \
+            lambda name, fetch, ahead, force: fetch()[0]
+
+        with patch.object(self.translator, 'get_models') as mock_get_models:
+            mock_get_models.return_value = ['model-id-0']
+            self.assertEqual(
+                ['model-id-0'], self.translator.get_cached_models())
+        mock_cache.get.assert_called_once_with(
+            'ChatGPT https://api.openai.com/v1/chat/completions',
+            ANY, ahead=518400.0, force=False)
+
+        mock_cache.get.reset_mock()
+        with patch.object(self.translator, 'get_models') as mock_get_models:
+            mock_get_models.return_value = ['model-id-0']
+            self.translator.get_cached_models(True)
+        mock_cache.get.assert_called_once_with(
+            'ChatGPT https://api.openai.com/v1/chat/completions',
+            ANY, ahead=518400.0, force=True)
+
+        # The model list is not fetched from the service.
+        self.translator.models_ttl = None
+        with patch.object(self.translator, 'get_models') as mock_get_models:
+            mock_get_models.return_value = ['model-id-1']
+            self.assertEqual(
+                ['model-id-1'], self.translator.get_cached_models())
+        mock_cache.get.assert_called_once()
+
     def test_get_body(self):
         model = 'gpt-4o'
         self.assertEqual(self.translator.get_body('test content'), json.dumps({
@@ -544,6 +643,52 @@ class TestChatgptTranslate(unittest.TestCase):
 
         self.assertEqual('你好世界！', result)
 
+    @patch(module_name + '.base.request')
+    def test_translate_with_prompt_caching(self, mock_request):
+        self.translator.prompt_caching = True
+        self.assertEqual(
+            {'include_usage': True},
+            json.loads(self.translator.get_body('test')).get('stream_options'))
+
+        mock_response = Mock()
+        mock_response.readline.side_effect = [
+            b'data: {"choices":[{"delta":{"content":"A"}}]}',
+            b'data: {"choices":[],"usage":{"prompt_tokens":2048,'
+            b'"prompt_tokens_details":{"cached_tokens":1024}}}',
+            b'data: [DONE]']
+        mock_request.return_value = mock_response
+        self.assertEqual('A', ''.join(self.translator.translate('test')))
+
+        mock_request.return_value = json.dumps({
+            'choices': [{'message': {'content': 'B'}}],
+            'usage': {'prompt_tokens': 2048}})
+        self.translator.stream = False
+        self.assertEqual('B', self.translator.translate('test'))
+
+        self.assertEqual({
+            'requests': 2, 'hits': 1, 'input_tokens': 4096,
+            'cached_tokens': 1024}, self.translator.prompt_cache_usage)
+        self.assertEqual(
+            'Prompt cache: 1 hits, 1 misses, 1024 of 4096 input tokens '
+            'cached', self.translator.get_prompt_cache_report())
+
+    def test_get_body_with_structured_merge(self):
+        self.translator.structured_merge = True
+        self.assertNotIn(
+            'response_format', json.loads(self.translator.get_body('{}')))
+
+        self.translator.set_merge_enabled(True)
+        body = json.loads(self.translator.get_body('{}'))
+        self.assertEqual({'type': 'json_object'}, body.get('response_format'))
+        self.assertTrue(body['messages'][0]['content'].endswith(
+            ChatgptTranslate.structured_prompt))
+
+    def test_get_prompt_cache_report_disabled(self):
+        self.translator.record_prompt_cache(2048, 1024)
+        self.assertIsNone(self.translator.get_prompt_cache_report())
+        self.assertNotIn(
+            'stream_options', json.loads(self.translator.get_body('test')))
+
 
 class TestChatgptBatchTranslate(unittest.TestCase):
     def setUp(self):
@@ -572,7 +717,7 @@ class TestChatgptBatchTranslate(unittest.TestCase):
             'https://api.openai.com/v1/batches')
 
     def test_supported_models(self):
-        self.mock_translator.get_models.return_value = [
+        self.mock_translator.get_cached_models.return_value = [
             'model-id-0', 'model-id-1', 'model-id-2']
         self.assertEqual(
             self.batch_translator.supported_models(),
@@ -585,10 +730,22 @@ class TestChatgptBatchTranslate(unittest.TestCase):
         self.mock_translator.model = 'fake-model'
         self.mock_translator.stream = True
         with self.assertRaises(UnsupportedModel) as cm:
-            self.batch_translator.upload([Mock(Paragraph)])
+            self.batch_translator.upload(['{}'])
         self.assertEqual(
             str(cm.exception),
             'The model "fake-model" does not support batch functionality.')
+        mock_supported_models.assert_has_calls([call(), call(True)])
+
+    @patch(module_name + '.openai.ChatgptBatchTranslate.supported_models')
+    @patch(module_name + '.openai.request')
+    def test_upload_with_new_model(
+            self, mock_request, mock_supported_models):
+        mock_supported_models.side_effect = \
+            lambda refresh=False: ['gpt-4o', 'new-model'] if refresh \
+            else ['gpt-4o']
+        mock_request.return_value = '{"id": "file-abc"}'
+        self.mock_translator.model = 'new-model'
+        self.assertEqual('file-abc', self.batch_translator.upload(['{}']))
 
     @patch.object(ChatgptBatchTranslate, 'boundary', new='xxxxxxxxxx')
     @patch(module_name + '.openai.ChatgptBatchTranslate.supported_models')
@@ -627,8 +784,9 @@ class TestChatgptBatchTranslate(unittest.TestCase):
             })
         self.mock_translator.get_body.side_effect = mock_get_body
 
-        file_id = self.batch_translator.upload(
-            [mock_paragraph_1, mock_paragraph_2])
+        file_id = self.batch_translator.upload([
+            self.batch_translator.get_line(mock_paragraph_1),
+            self.batch_translator.get_line(mock_paragraph_2)])
 
         self.assertEqual(file_id, 'test-file-id')
         mock_body = (
@@ -681,14 +839,15 @@ class TestChatgptBatchTranslate(unittest.TestCase):
         line_2 = (
             b'{"custom_id":"def","response":{"status_code":200,"body":{'
             b'"choices": [{"message": {"content": "B"}}]}}}')
-        mock_request.return_value.read.return_value = line_1 + b'\n' + line_2
+        mock_request.return_value.readline.side_effect = [
+            line_1 + b'\n', line_2 + b'\n', b'']
         self.mock_translator.get_headers.return_value = {
             'Content-Type': 'application/json',
             'Authorization': 'Bearer abc',
             'User-Agent': 'Ebook-Translator/v1.0.0'}
 
         self.assertEqual(
-            self.batch_translator.retrieve('test-batch-id'),
+            dict(self.batch_translator.retrieve('test-batch-id')),
             {'abc': 'A', 'def': 'B'})
 
         headers = {
@@ -698,7 +857,7 @@ class TestChatgptBatchTranslate(unittest.TestCase):
             'https://api.openai.com/v1/files/test-batch-id/content',
             headers=headers, raw_object=True,
             proxy_uri=self.mock_translator.proxy_uri)
-        mock_request().read.assert_called_once()
+        self.assertEqual(3, mock_request().readline.call_count)
 
     @patch(module_name + '.openai.request')
     def test_create(self, mock_request):
@@ -825,6 +984,82 @@ class TestChatgptBatchTranslate(unittest.TestCase):
             proxy_uri=self.mock_translator.proxy_uri)
 
 
+    def test_split(self):
+        self.mock_translator.get_body.side_effect = lambda text: json.dumps(
+            {'messages': [{'role': 'user', 'content': text}]})
+        paragraphs = []
+        for index in range(5):
+            paragraph = Mock(Paragraph)
+            paragraph.md5 = 'id-%s' % index
+            paragraph.original = 'content %s' % index
+            paragraphs.append(paragraph)
+
+        self.batch_translator.max_requests = 2
+        groups = list(self.batch_translator.split(paragraphs))
+        self.assertEqual([2, 2, 1], [len(group) for group in groups])
+        self.assertIs(paragraphs[4], groups[2][0][0])
+        self.assertEqual(
+            'id-4', json.loads(groups[2][0][1]).get('custom_id'))
+
+        self.batch_translator.max_requests = 50000
+        self.batch_translator.max_bytes = len(groups[0][0][1]) * 3
+        groups = list(self.batch_translator.split(paragraphs))
+        self.assertEqual([2, 2, 1], [len(group) for group in groups])
+
+    @patch.object(ChatgptBatchTranslate, 'delete')
+    @patch.object(ChatgptBatchTranslate, 'create')
+    @patch.object(ChatgptBatchTranslate, 'upload')
+    def test_submit(self, mock_upload, mock_create, mock_delete):
+        mock_upload.return_value = 'test-file-id'
+        mock_create.return_value = 'test-batch-id'
+
+        self.assertEqual(
+            self.batch_translator.submit(['{}']),
+            {'batch_id': 'test-batch-id', 'file_id': 'test-file-id'})
+        mock_upload.assert_called_once_with(['{}'])
+        mock_create.assert_called_once_with('test-file-id')
+        mock_delete.assert_not_called()
+
+        mock_create.side_effect = Exception('any error')
+        with self.assertRaises(Exception):
+            self.batch_translator.submit(['{}'])
+        mock_delete.assert_called_once_with('test-file-id')
+
+    @patch.object(ChatgptBatchTranslate, 'check')
+    def test_status(self, mock_check):
+        mock_check.return_value = {
+            'id': 'test-batch-id',
+            'status': 'finalizing',
+            'errors': None,
+            'output_file_id': None,
+            'request_counts': {'total': 100, 'completed': 95, 'failed': 5}}
+
+        self.assertEqual(self.batch_translator.status('test-batch-id'), {
+            'status': 'in_progress',
+            'request_counts': {'total': 100, 'completed': 95, 'failed': 5},
+            'errors': None,
+            'output': None})
+
+        mock_check.return_value.update(
+            status='completed', output_file_id='test-output-id')
+        details = self.batch_translator.status('test-batch-id')
+        self.assertEqual('completed', details.get('status'))
+        self.assertEqual('test-output-id', details.get('output'))
+
+    @patch.object(ChatgptBatchTranslate, 'retrieve')
+    def test_results(self, mock_retrieve):
+        mock_retrieve.return_value = iter([('abc', 'A')])
+        self.assertEqual(
+            [('abc', 'A')],
+            list(self.batch_translator.results({'output': 'test-output-id'})))
+        mock_retrieve.assert_called_once_with('test-output-id')
+
+        mock_retrieve.reset_mock()
+        self.assertEqual(
+            [], list(self.batch_translator.results({'output': None})))
+        mock_retrieve.assert_not_called()
+
+
 class TestAzureChatgptTranslate(unittest.TestCase):
     def setUp(self):
         AzureChatgptTranslate.set_config({'api_keys': ['a', 'b', 'c']})
@@ -880,6 +1115,53 @@ class TestAzureChatgptTranslate(unittest.TestCase):
         self.assertEqual('你好世界！', ''.join(result))
 
 
+class TestAzureChatgptBatchTranslate(unittest.TestCase):
+    def setUp(self):
+        self.mock_translator = Mock(AzureChatgptTranslate)
+        self.mock_translator.endpoint = (
+            'https://test.openai.azure.com/openai/deployments/gpt-4o-batch/'
+            'chat/completions?api-version=2024-10-21')
+        self.mock_translator.model = 'gpt-4o-batch'
+        self.mock_translator.proxy_uri = {}
+        self.mock_translator.get_headers.side_effect = lambda: {
+            'Content-Type': 'application/json', 'api-key': 'abc'}
+        self.batch_translator = AzureChatgptBatchTranslate(
+            self.mock_translator)
+
+    def test_created_translator(self):
+        self.assertFalse(self.mock_translator.stream)
+        self.assertEqual('2024-10-21', self.batch_translator.api_version)
+        self.assertEqual('gpt-4o-batch', self.batch_translator.deployment)
+        self.assertEqual(
+            ['gpt-4o-batch'], self.batch_translator.supported_models())
+
+    def test_get_line(self):
+        self.mock_translator.get_body.return_value = json.dumps(
+            {'messages': []})
+        paragraph = Mock(Paragraph)
+        paragraph.md5 = 'abc'
+        paragraph.original = 'A'
+        self.assertEqual(
+            '{"custom_id": "abc", "method": "POST", "url": '
+            '"/chat/completions", "body": {"messages": [], '
+            '"model": "gpt-4o-batch"}}',
+            self.batch_translator.get_line(paragraph))
+
+    @patch(module_name + '.openai.request')
+    def test_create(self, mock_request):
+        mock_request.return_value = json.dumps({'id': 'batch_abc'})
+        self.assertEqual(
+            'batch_abc', self.batch_translator.create('file-abc'))
+        mock_request.assert_called_once_with(
+            'https://test.openai.azure.com/openai/batches'
+            '?api-version=2024-10-21', json.dumps({
+                'input_file_id': 'file-abc',
+                'endpoint': '/chat/completions',
+                'completion_window': '24h'}),
+            {'Content-Type': 'application/json', 'api-key': 'abc'}, 'POST',
+            proxy_uri={})
+
+
 class TestClaudeTranslate(unittest.TestCase):
     def setUp(self):
         ClaudeTranslate.set_config({'api_keys': ['a', 'b', 'c']})
@@ -895,6 +1177,26 @@ class TestClaudeTranslate(unittest.TestCase):
         self.assertIsInstance(self.translator, Base)
         self.assertIsInstance(self.translator, GenAI)
 
+    @patch(module_name + '.base.request')
+    def test_translate_with_prompt_caching(self, mock_request):
+        self.translator.prompt_caching = True
+        self.translator.stream = False
+        system = json.loads(self.translator.get_body('test')).get('system')
+        self.assertEqual(1, len(system))
+        self.assertEqual(
+            {'type': 'ephemeral'}, system[0].get('cache_control'))
+        self.assertEqual(self.translator._get_prompt(), system[0].get('text'))
+
+        mock_request.return_value = json.dumps({
+            'content': [{'text': 'A'}],
+            'usage': {
+                'input_tokens': 10, 'cache_creation_input_tokens': 0,
+                'cache_read_input_tokens': 1500}})
+        self.assertEqual('A', self.translator.translate('test'))
+        self.assertEqual({
+            'requests': 1, 'hits': 1, 'input_tokens': 1510,
+            'cached_tokens': 1500}, self.translator.prompt_cache_usage)
+
     @patch(module_name + '.anthropic.EbookTranslator')
     @patch(module_name + '.base.request')
     def test_translate(self, mock_request, mock_et):
@@ -1036,6 +1338,345 @@ data: {"type":"message_stop"}
         self.assertEqual('你好世界！', ''.join(result))
 
 
+class TestClaudeBatchTranslate(unittest.TestCase):
+    def setUp(self):
+        self.mock_translator = Mock(ClaudeTranslate)
+        self.mock_translator.endpoint = 'https://api.anthropic.com/v1/messages'
+        self.mock_translator.proxy_uri = {}
+        self.mock_headers = {
+            'Content-Type': 'application/json',
+            'anthropic-version': '2023-06-01',
+            'x-api-key': 'abc'}
+        self.mock_translator.get_headers.side_effect = \
+            lambda: self.mock_headers.copy()
+        self.batch_translator = ClaudeBatchTranslate(self.mock_translator)
+
+    def mock_paragraph(self, md5, original):
+        paragraph = Mock(Paragraph)
+        paragraph.md5 = md5
+        paragraph.original = original
+        return paragraph
+
+    def test_created_translator(self):
+        self.assertFalse(self.mock_translator.stream)
+        self.assertEqual(
+            'https://api.anthropic.com/v1/messages/batches',
+            self.batch_translator.batch_endpoint)
+
+    def test_get_line(self):
+        self.mock_translator.get_body.side_effect = lambda text: json.dumps(
+            {'stream': False, 'model': 'claude', 'messages': [text]})
+        self.assertEqual(
+            '{"custom_id": "a", "params": {"model": "claude", '
+            '"messages": ["A"]}}',
+            self.batch_translator.get_line(self.mock_paragraph('a', 'A')))
+
+    @patch(module_name + '.anthropic.request')
+    def test_submit(self, mock_request):
+        mock_request.return_value = json.dumps({'id': 'msgbatch_1'})
+
+        self.assertEqual(
+            {'batch_id': 'msgbatch_1', 'file_id': None},
+            self.batch_translator.submit(['{"custom_id": "a"}', '{}']))
+        mock_request.assert_called_once_with(
+            'https://api.anthropic.com/v1/messages/batches',
+            '{"requests": [{"custom_id": "a"}, {}]}', self.mock_headers,
+            'POST', proxy_uri={})
+
+    @patch(module_name + '.anthropic.request')
+    def test_status(self, mock_request):
+        mock_request.return_value = json.dumps({
+            'processing_status': 'in_progress',
+            'request_counts': {
+                'processing': 1, 'succeeded': 1, 'errored': 1,
+                'canceled': 0, 'expired': 0}})
+        self.assertEqual({
+            'status': 'in_progress',
+            'request_counts': {'total': 3, 'completed': 1, 'failed': 1},
+            'errors': None,
+            'output': 'msgbatch_1'}, self.batch_translator.status('msgbatch_1'))
+        mock_request.assert_called_once_with(
+            'https://api.anthropic.com/v1/messages/batches/msgbatch_1',
+            headers=self.mock_headers, proxy_uri={})
+
+        mock_request.return_value = json.dumps({
+            'processing_status': 'ended', 'request_counts': {}})
+        self.assertEqual(
+            'completed',
+            self.batch_translator.status('msgbatch_1').get('status'))
+
+    @patch(module_name + '.anthropic.request')
+    def test_results(self, mock_request):
+        lines = [
+            b'{"custom_id": "a", "result": {"type": "succeeded", "message": '
+            b'{"content": [{"type": "text", "text": "X"}]}}}\n',
+            b'\n',
+            b'{"custom_id": "b", "result": {"type": "errored", "error": {}}}'
+            b'\n', b'']
+        mock_request.return_value = Mock(mechanize_response)
+        mock_request.return_value.readline.side_effect = lines
+
+        self.assertEqual(
+            [('a', 'X')],
+            list(self.batch_translator.results({'batch_id': 'msgbatch_1'})))
+        mock_request.assert_called_once_with(
+            'https://api.anthropic.com/v1/messages/batches/msgbatch_1/'
+            'results', headers={
+                'anthropic-version': '2023-06-01', 'x-api-key': 'abc'},
+            raw_object=True, proxy_uri={})
+
+    @patch(module_name + '.anthropic.request')
+    def test_cancel(self, mock_request):
+        mock_request.return_value = json.dumps(
+            {'processing_status': 'canceling'})
+        self.assertTrue(self.batch_translator.cancel('msgbatch_1'))
+        mock_request.assert_called_once_with(
+            'https://api.anthropic.com/v1/messages/batches/msgbatch_1/cancel',
+            headers=self.mock_headers, method='POST', proxy_uri={})
+
+
+class TestGeminiTranslate(unittest.TestCase):
+    def setUp(self):
+        GeminiTranslate.set_config({'api_keys': ['a', 'b', 'c']})
+        GeminiTranslate.lang_codes = {
+            'source': {'English': 'EN'}, 'target': {'Chinese': 'ZH'}}
+
+        self.translator = GeminiTranslate()
+        self.translator.set_source_lang('English')
+        self.translator.set_target_lang('Chinese')
+
+    @patch(module_name + '.base.request')
+    @patch(module_name + '.google.request')
+    def test_translate_with_prompt_caching(
+            self, mock_google_request, mock_request):
+        self.translator.prompt_caching = True
+        self.translator.stream = False
+        mock_google_request.return_value = json.dumps(
+            {'name': 'cachedContents/abc'})
+
+        for count in range(2):
+            body = json.loads(self.translator.get_body('test'))
+            self.assertEqual('cachedContents/abc', body.get('cachedContent'))
+            self.assertEqual(
+                [{'role': 'user', 'parts': [{'text': 'test'}]}],
+                body.get('contents'))
+        mock_google_request.assert_called_once_with(
+            'https://generativelanguage.googleapis.com/v1beta/cachedContents'
+            '?key=a', json.dumps({
+                'model': 'models/gemini-2.0-flash',
+                'systemInstruction': {
+                    'parts': [{'text': self.translator._system_prompt()}]},
+                'ttl': '3600s'}),
+            {'Content-Type': 'application/json'}, 'POST', timeout=30.0,
+            proxy_uri=None)
+
+        mock_request.return_value = json.dumps({
+            'candidates': [{'content': {'parts': [{'text': 'A'}]}}],
+            'usageMetadata': {
+                'promptTokenCount': 4100, 'cachedContentTokenCount': 4096}})
+        self.assertEqual('A', self.translator.translate('test'))
+        self.assertEqual({
+            'requests': 1, 'hits': 1, 'input_tokens': 4100,
+            'cached_tokens': 4096}, self.translator.prompt_cache_usage)
+
+    @patch(module_name + '.google.time')
+    @patch(module_name + '.google.request')
+    def test_get_body_with_expired_cached_content(
+            self, mock_request, mock_time):
+        self.translator.prompt_caching = True
+        mock_time.time.return_value = 4102444800.0
+        cache_key = (self.translator._system_prompt(), 'a')
+        # The cached content expires within the refresh time.
+        self.translator.cached_contents[cache_key] = (
+            'cachedContents/old', 4102444800.0 + 60)
+        mock_request.return_value = json.dumps({
+            'name': 'cachedContents/new',
+            'expireTime': '2100-01-01T01:00:00.123456789Z'})
+
+        body = json.loads(self.translator.get_body('test'))
+        self.assertEqual('cachedContents/new', body.get('cachedContent'))
+        self.assertEqual(
+            ('cachedContents/new', 4102448400.0),
+            self.translator.cached_contents[cache_key])
+        self.translator.get_body('test')
+        mock_request.assert_called_once()
+
+    @patch(module_name + '.base.request')
+    @patch(module_name + '.google.request')
+    def test_translate_with_missing_cached_content(
+            self, mock_google_request, mock_request):
+        self.translator.prompt_caching = True
+        self.translator.stream = False
+        mock_google_request.return_value = json.dumps(
+            {'name': 'cachedContents/abc'})
+        mock_request.side_effect = [
+            Exception('403 PERMISSION_DENIED: CachedContent not found '
+                      '(or permission denied)'),
+            json.dumps({
+                'candidates': [{'content': {'parts': [{'text': 'A'}]}}]})]
+
+        self.assertEqual('A', self.translator.translate('test'))
+        self.assertEqual('a', self.translator.api_key)
+        self.assertEqual({}, self.translator.cached_contents)
+        first, second = [
+            json.loads(args.kwargs['data'])
+            for args in mock_request.call_args_list]
+        self.assertEqual('cachedContents/abc', first.get('cachedContent'))
+        self.assertNotIn('cachedContent', second)
+        self.assertEqual(
+            self.translator._prompt('test'),
+            second['contents'][0]['parts'][0]['text'])
+
+    def test_get_body_with_structured_merge(self):
+        self.translator.structured_merge = True
+        self.translator.set_merge_enabled(True)
+        body = json.loads(self.translator.get_body('{}'))
+        self.assertEqual(
+            'application/json',
+            body['generationConfig'].get('responseMimeType'))
+        self.assertIn(
+            GeminiTranslate.structured_prompt,
+            body['contents'][0]['parts'][0]['text'])
+
+    @patch(module_name + '.google.request')
+    def test_get_body_with_uncacheable_prompt(self, mock_request):
+        self.translator.prompt_caching = True
+        mock_request.side_effect = Exception('The prompt is too short.')
+
+        body = json.loads(self.translator.get_body('test'))
+        self.assertNotIn('cachedContent', body)
+        self.assertEqual(
+            self.translator._prompt('test'),
+            body['contents'][0]['parts'][0]['text'])
+        self.translator.get_body('test')
+        mock_request.assert_called_once()
+
+
+class TestGeminiBatchTranslate(unittest.TestCase):
+    def setUp(self):
+        self.mock_translator = Mock(GeminiTranslate)
+        self.mock_translator.endpoint = \
+            'https://generativelanguage.googleapis.com/v1beta/models'
+        self.mock_translator.api_key = 'abc'
+        self.mock_translator.model = 'gemini-2.0-flash'
+        self.mock_translator.proxy_uri = {}
+        self.mock_headers = {'Content-Type': 'application/json'}
+        self.mock_translator.get_headers.return_value = self.mock_headers
+        self.batch_translator = GeminiBatchTranslate(self.mock_translator)
+
+    def test_created_translator(self):
+        self.assertFalse(self.mock_translator.stream)
+        self.assertEqual(
+            'https://generativelanguage.googleapis.com/v1beta',
+            self.batch_translator.api_endpoint)
+        self.assertEqual(
+            'https://generativelanguage.googleapis.com/upload/v1beta/files',
+            self.batch_translator.file_endpoint)
+
+    @patch(module_name + '.google.request')
+    def test_submit_inline(self, mock_request):
+        mock_request.return_value = json.dumps({'name': 'batches/123'})
+        self.mock_translator.get_body.side_effect = \
+            lambda text: json.dumps({'contents': text})
+        paragraph = Mock(Paragraph)
+        paragraph.md5 = 'a'
+        paragraph.original = 'A'
+
+        self.assertEqual(
+            {'batch_id': 'batches/123', 'file_id': None},
+            self.batch_translator.submit(
+                [self.batch_translator.get_line(paragraph)]))
+        body = json.dumps({'batch': {
+            'display_name': 'ebook-translator',
+            'input_config': {'requests': {'requests': [{
+                'request': {'contents': 'A'},
+                'metadata': {'key': 'a'}}]}}}})
+        mock_request.assert_called_once_with(
+            'https://generativelanguage.googleapis.com/v1beta/models/'
+            'gemini-2.0-flash:batchGenerateContent?key=abc', body,
+            self.mock_headers, 'POST', proxy_uri={})
+
+    @patch(module_name + '.google.GeminiBatchTranslate.upload')
+    @patch(module_name + '.google.request')
+    def test_submit_with_file(self, mock_request, mock_upload):
+        mock_request.return_value = json.dumps({'name': 'batches/123'})
+        mock_upload.return_value = 'files/abc'
+        self.batch_translator.max_inline_bytes = 10
+        lines = ['{"key": "a", "request": {}}']
+
+        self.assertEqual(
+            {'batch_id': 'batches/123', 'file_id': 'files/abc'},
+            self.batch_translator.submit(lines))
+        mock_upload.assert_called_once_with(lines)
+        body = json.loads(mock_request.call_args[0][1])
+        self.assertEqual(
+            {'file_name': 'files/abc'}, body['batch']['input_config'])
+
+    @patch(module_name + '.google.GeminiBatchTranslate.upload')
+    @patch(module_name + '.google.request')
+    def test_submit_with_file_by_bytes(self, mock_request, mock_upload):
+        mock_request.return_value = json.dumps({'name': 'batches/123'})
+        mock_upload.return_value = 'files/abc'
+        # 6 characters but 14 bytes in UTF-8.
+        self.batch_translator.max_inline_bytes = 10
+        lines = ['"你好世界"']
+
+        self.batch_translator.submit(lines)
+        mock_upload.assert_called_once_with(lines)
+
+    @patch(module_name + '.google.request')
+    def test_status(self, mock_request):
+        mock_request.return_value = json.dumps({
+            'name': 'batches/123',
+            'metadata': {
+                'state': 'BATCH_STATE_SUCCEEDED',
+                'batchStats': {
+                    'requestCount': '2', 'successfulRequestCount': '1',
+                    'failedRequestCount': '1'}}})
+        self.assertEqual({
+            'status': 'completed',
+            'request_counts': {'total': 2, 'completed': 1, 'failed': 1},
+            'errors': None,
+            'output': 'batches/123',
+        }, self.batch_translator.status('batches/123'))
+        mock_request.assert_called_once_with(
+            'https://generativelanguage.googleapis.com/v1beta/batches/123'
+            '?key=abc', headers=self.mock_headers, proxy_uri={})
+
+    @patch(module_name + '.google.request')
+    def test_results(self, mock_request):
+        def result(key, text):
+            return {
+                'metadata': {'key': key}, 'key': key, 'response': {
+                    'candidates': [{'content': {'parts': [{'text': text}]}}]}}
+        mock_response = Mock(mechanize_response)
+        mock_response.readline.side_effect = [
+            json.dumps(result('b', 'B')).encode(), b'']
+        mock_request.side_effect = [json.dumps({'response': {
+            'inlinedResponses': {'inlinedResponses': [
+                result('a', 'A'), {'error': {}}]},
+            'responsesFile': 'files/out'}}), mock_response]
+
+        self.assertEqual(
+            [('a', 'A'), ('b', 'B')],
+            list(self.batch_translator.results({'batch_id': 'batches/1'})))
+        mock_request.assert_called_with(
+            'https://generativelanguage.googleapis.com/download/v1beta/'
+            'files/out:download?alt=media&key=abc', headers=self.mock_headers,
+            raw_object=True, proxy_uri={})
+
+    @patch(module_name + '.google.request')
+    def test_clean(self, mock_request):
+        self.batch_translator.clean({'file_id': None})
+        mock_request.assert_not_called()
+
+        self.batch_translator.clean({'file_id': 'files/abc'})
+        mock_request.assert_called_once_with(
+            'https://generativelanguage.googleapis.com/v1beta/files/abc'
+            '?key=abc', headers=self.mock_headers, method='DELETE',
+            proxy_uri={})
+
+
 class TestFunction(unittest.TestCase):
     def test_create_engine_template(self):
         expect = """{
@@ -0,0 +1,118 @@
+import os
+import shutil
+import zipfile
+import tempfile
+import unittest
+
+from ..lib.epub import EpubContainer
+from ..lib.exception import UnsupportedEpub
+
+
+container_xml = b'''<?xml version="1.0"?>
+<container version="1.0" \
+xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+<rootfiles><rootfile full-path="OEBPS/content.opf" \
+media-type="application/oebps-package+xml"/></rootfiles>
+</container>'''
+
+content_opf = b'''<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="2.0">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:title>Hello World</dc:title><dc:language>en</dc:language>
+</metadata>
+<manifest>
+<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+<item id="c1" href="Text/chapter%201.xhtml" \
+media-type="application/xhtml+xml"/>
+<item id="c2" href="Text/chapter2.xhtml" media-type="application/xhtml+xml"/>
+<item id="img" href="Images/cover.png" media-type="image/png"/>
+</manifest>
+<spine toc="ncx"><itemref idref="c1"/><itemref idref="c2"/></spine>
+</package>'''
+
+toc_ncx = b'''<?xml version="1.0" encoding="utf-8"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+<navMap><navPoint id="p1"><navLabel><text>Chapter 1</text></navLabel>
+<content src="Text/chapter%201.xhtml"/></navPoint></navMap>
+</ncx>'''
+
+chapter = '''<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml"><head><title>%s</title></head>
+<body><p>%s</p></body></html>'''
+
+
+class TestEpubContainer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, 'input.epub')
+        self.output_path = os.path.join(self.temp_dir, 'output.epub')
+        with zipfile.ZipFile(self.input_path, 'w') as archive:
+            archive.writestr('mimetype', 'application/epub+zip')
+            archive.writestr('META-INF/container.xml', container_xml)
+            archive.writestr('OEBPS/content.opf', content_opf)
+            archive.writestr('OEBPS/toc.ncx', toc_ncx)
+            archive.writestr(
+                'OEBPS/Text/chapter 1.xhtml', chapter % ('One', 'Hello'),
+                compress_type=zipfile.ZIP_DEFLATED)
+            archive.writestr(
+                'OEBPS/Text/chapter2.xhtml', chapter % ('Two', 'World'),
+                compress_type=zipfile.ZIP_DEFLATED)
+            archive.writestr(
+                'OEBPS/Images/cover.png', b'\x89PNG' + b'\x00' * 1000,
+                compress_type=zipfile.ZIP_DEFLATED)
+        self.container = EpubContainer(self.input_path)
+
+    def tearDown(self):
+        self.container.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_invalid_file(self):
+        path = os.path.join(self.temp_dir, 'invalid.epub')
+        with open(path, 'w') as file:
+            file.write('invalid')
+        with self.assertRaises(UnsupportedEpub):
+            EpubContainer(path)
+
+    def test_get_pages(self):
+        pages = self.container.get_pages()
+        self.assertEqual(['c1', 'c2'], [page.id for page in pages])
+        self.assertEqual(
+            ['OEBPS/Text/chapter 1.xhtml', 'OEBPS/Text/chapter2.xhtml'],
+            [page.href for page in pages])
+        self.assertEqual(
+            'OEBPS/Text/chapter2.xhtml', self.container.get_page_name('c2'))
+
+    def test_get_metadata(self):
+        metadata = self.container.get_metadata()
+        self.assertEqual(['title', 'language'], list(metadata.iterkeys()))
+        self.assertEqual('Hello World', metadata.title[0].content)
+        with self.assertRaises(AttributeError):
+            metadata.creator
+
+    def test_get_toc_items(self):
+        items = self.container.get_toc_items()
+        self.assertEqual(['Chapter 1'], [item.title for item in items])
+        self.assertEqual('OEBPS/toc.ncx', self.container.toc_name)
+
+    def test_save(self):
+        page = self.container.get_pages()[0]
+        page.data.find('.//{http://www.w3.org/1999/xhtml}p').text = 'Bonjour'
+        self.container.save(self.output_path, {page.href})
+
+        with zipfile.ZipFile(self.input_path) as source, \
+                zipfile.ZipFile(self.output_path) as target:
+            self.assertIsNone(target.testzip())
+            self.assertEqual(source.namelist(), target.namelist())
+            self.assertEqual(
+                zipfile.ZIP_STORED, target.getinfo('mimetype').compress_type)
+            self.assertIn(b'<p>Bonjour</p>', target.read(page.href))
+            self.assertIn(
+                b'<p>World</p>', target.read('OEBPS/Text/chapter2.xhtml'))
+            for name in ('OEBPS/Images/cover.png', 'OEBPS/content.opf'):
+                self.assertEqual(source.read(name), target.read(name))
+                source_info = source.getinfo(name)
+                target_info = target.getinfo(name)
+                self.assertEqual(
+                    source_info.compress_size, target_info.compress_size)
+                self.assertEqual(
+                    source_info.compress_type, target_info.compress_type)
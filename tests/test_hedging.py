@@ -0,0 +1,99 @@
+import os
+import time
+import unittest
+from threading import Event
+from unittest.mock import Mock
+
+from ..lib.hedging import RequestHedger
+
+
+class TestRequestHedger(unittest.TestCase):
+    def setUp(self):
+        self.hedger = RequestHedger(budget=0.5, min_samples=4)
+
+    def test_get_delay(self):
+        self.assertIsNone(self.hedger.get_delay())
+        self.hedger.latencies.extend([0.4, 0.1, 0.3, 0.2])
+        self.assertEqual(0.3, self.hedger.get_delay())
+
+    def test_request_without_samples(self):
+        func = Mock(return_value='result')
+        self.assertEqual('result', self.hedger.request(func))
+        func.assert_called_once_with()
+        self.assertEqual(1, len(self.hedger.latencies))
+        self.assertEqual(0, self.hedger.hedges)
+
+    def test_request_hedged(self):
+        self.hedger.latencies.extend([0.01] * 4)
+        self.hedger.requests = 4
+        stuck = Event()
+
+        def func():
+            if not stuck.is_set():
+                stuck.set()
+                time.sleep(0.2)
+                return 'slow'
+            return 'fast'
+
+        self.assertEqual('fast', self.hedger.request(func))
+        self.assertEqual(1, self.hedger.hedges)
+        self.assertEqual(1, self.hedger.wins)
+        self.assertEqual(
+            'Hedged requests: 1 of 5 requests, 1 answered first',
+            self.hedger.get_report())
+
+    def test_request_hedged_with_slot(self):
+        self.hedger.latencies.extend([0.01] * 4)
+        self.hedger.requests = 4
+        func = Mock(side_effect=lambda: time.sleep(0.05) or 'result')
+        release = Mock()
+        reserve = Mock(return_value=release)
+
+        self.assertEqual('result', self.hedger.request(func, reserve))
+        self.hedger._executor.shutdown(wait=True)
+        self.assertEqual(2, func.call_count)
+        reserve.assert_called_once_with()
+        release.assert_called_once_with()
+
+    def test_request_without_free_slot(self):
+        self.hedger.latencies.extend([0.01] * 4)
+        self.hedger.requests = 4
+        func = Mock(side_effect=lambda: time.sleep(0.05) or 'result')
+
+        self.assertEqual('result', self.hedger.request(func, lambda: None))
+        func.assert_called_once_with()
+        self.assertEqual(0, self.hedger.hedges)
+
+    def test_request_over_budget(self):
+        self.hedger.latencies.extend([0.01] * 4)
+        func = Mock(side_effect=lambda: time.sleep(0.05) or 'result')
+
+        self.assertEqual('result', self.hedger.request(func))
+        func.assert_called_once_with()
+        self.assertEqual(0, self.hedger.hedges)
+        self.assertIsNone(self.hedger.get_report())
+
+    def test_request_hedge_after_failure(self):
+        self.hedger.latencies.extend([0.01] * 4)
+        self.hedger.requests = 4
+        results = [Exception('any error'), 'result']
+
+        def func():
+            time.sleep(0.05)
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        self.assertEqual('result', self.hedger.request(func))
+        self.assertEqual(1, self.hedger.wins)
+
+    def test_set_concurrency_limit(self):
+        hedger = RequestHedger(4)
+        self.assertEqual(8, hedger._executor._max_workers)
+        hedger.set_concurrency_limit(10)
+        self.assertEqual(20, hedger._executor._max_workers)
+        hedger.set_concurrency_limit(0)
+        self.assertEqual(
+            2 * min(32, (os.cpu_count() or 1) + 4),
+            hedger._executor._max_workers)
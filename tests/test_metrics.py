@@ -0,0 +1,160 @@
+import os
+import time
+import pstats
+import shutil
+import tempfile
+import unittest
+from threading import Thread
+from unittest.mock import patch
+
+from ..lib.metrics import JobMetrics, Spans, spans, Profiler
+
+
+class TestJobMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = JobMetrics()
+
+    def test_phase(self):
+        with self.metrics.phase('translate'):
+            pass
+        self.metrics.add_phase('output', 2.0)
+        self.metrics.add_phase('extract', 1.0)
+        self.metrics.add_phase('output', 0.5)
+        phases = self.metrics.get_report()['phases']
+        self.assertEqual(['extract', 'translate', 'output'], list(phases))
+        self.assertEqual(2.5, phases['output'])
+
+    def test_measure(self):
+        start = time.monotonic()
+        self.assertEqual('Bonjour', self.metrics.measure(
+            start, 'Hello', 'Bonjour'))
+        translation = self.metrics.measure(
+            start, 'Wörld', (chunk for chunk in ('Mon', 'de')))
+        self.assertEqual(1, self.metrics.requests)
+        self.assertEqual('Monde', ''.join(translation))
+        self.assertEqual(2, self.metrics.requests)
+        self.assertEqual(11, self.metrics.bytes_sent)
+        self.assertEqual(12, self.metrics.bytes_received)
+
+    def test_get_percentile(self):
+        self.assertIsNone(self.metrics.get_percentile(50))
+        for latency in range(100, 0, -1):
+            self.metrics.record_request(latency / 100, 0, 0)
+        self.assertEqual(0.5, self.metrics.get_percentile(50))
+        self.assertEqual(0.95, self.metrics.get_percentile(95))
+        self.assertEqual(0.99, self.metrics.get_percentile(99))
+
+    def test_get_report(self):
+        self.metrics.add_phase('translate', 2.0)
+        self.metrics.record_request(1.0, 10, 20)
+        self.metrics.record_request(3.0, 10, 0, True)
+        self.metrics.record_retry()
+        self.metrics.record_cache_hit()
+        self.metrics.record_characters(100)
+        report = self.metrics.get_report()
+        self.assertEqual(2, report['requests'])
+        self.assertEqual(1, report['failures'])
+        self.assertEqual(1, report['retries'])
+        self.assertEqual(1, report['cache_hits'])
+        self.assertEqual(20, report['bytes_sent'])
+        self.assertEqual(50.0, report['characters_per_second'])
+        self.assertIsNone(report['tokens_per_second'])
+        self.assertEqual(2.0, report['concurrency'])
+
+        self.metrics.set_tokens(30)
+        self.assertEqual(15.0, self.metrics.get_report()['tokens_per_second'])
+
+    def test_get_summary(self):
+        self.metrics.add_phase('translate', 2.0)
+        self.metrics.record_request(1.0, 10, 20)
+        self.assertEqual(
+            'Performance: translate 2.0s\n'
+            'Requests: 1 (0 failed, 0 retries), cache hits: 0\n'
+            'Bytes sent: 10, received: 20\n'
+            'Latency: p50 1.0s, p95 1.0s, p99 1.0s\n'
+            'Throughput: 0.0 chars/s, N/A tokens/s, concurrency 0.5',
+            self.metrics.get_summary())
+
+
+class TestSpans(unittest.TestCase):
+    def setUp(self):
+        self.spans = Spans()
+
+    def test_disabled(self):
+        func = self.spans.timed('func')(lambda value: value * 2)
+        self.assertEqual(4, func(2))
+        with self.spans.span('block'):
+            pass
+        self.assertEqual({}, self.spans.get_report())
+
+    def test_enabled(self):
+        self.spans.set_enabled(True)
+
+        @self.spans.timed('func')
+        def func(value):
+            if value < 0:
+                raise ValueError()
+            return value * 2
+
+        self.assertEqual('func', func.__name__)
+        self.assertEqual(4, func(2))
+        self.assertRaises(ValueError, func, -1)
+        with self.spans.span('block'):
+            pass
+        report = self.spans.get_report()
+        self.assertEqual(['block', 'func'], list(report))
+        self.assertEqual(2, report['func']['count'])
+        self.assertEqual(1, report['block']['count'])
+
+        self.spans.reset()
+        self.assertEqual({}, self.spans.get_report())
+
+    def test_job_report(self):
+        metrics = JobMetrics()
+        self.assertIsNone(metrics.get_report()['spans'])
+        with patch.object(spans, 'enabled', True), \
+                patch.object(spans, 'totals', {'cache.save': [2, 0.5]}):
+            self.assertEqual(
+                {'cache.save': {'count': 2, 'seconds': 0.5}},
+                metrics.get_report()['spans'])
+            self.assertIn(
+                'Span cache.save: 2 calls, 0.5s', metrics.get_summary())
+
+
+def main_work():
+    return sum(range(10))
+
+
+def thread_work():
+    return sum(range(10))
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = Profiler()
+
+    def test_disabled(self):
+        func = self.profiler.profiled(lambda value: value * 2)
+        self.assertEqual(4, func(2))
+        self.assertEqual([], self.profiler.profiles)
+
+    def test_profile(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        path = os.path.join(temp_dir, 'job.prof')
+        work = self.profiler.profiled(thread_work)
+
+        with self.profiler.profile():
+            main_work()
+            # Profiled in the calling thread already.
+            work()
+            thread = Thread(target=work)
+            thread.start()
+            thread.join()
+        self.assertFalse(self.profiler.enabled)
+        self.assertEqual(2, len(self.profiler.profiles))
+
+        self.profiler.dump_stats(path)
+        names = [name for _, _, name in pstats.Stats(path).stats]
+        self.assertIn('main_work', names)
+        self.assertIn('thread_work', names)
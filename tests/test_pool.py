@@ -0,0 +1,147 @@
+import unittest
+from unittest.mock import patch, Mock
+
+from ..engines.base import Base
+from ..engines.genai import GenAI
+from ..engines.pool import EnginePool
+from ..lib.translation import get_engine_pool, get_engine_name
+
+
+load_translations()
+
+
+def make_translator(name, concurrency_limit=1):
+    translator = Mock(Base)
+    translator.name = name
+    translator.placeholder = Base.placeholder
+    translator.separator = Base.separator
+    translator.concurrency_limit = concurrency_limit
+    translator.request_interval = 0.0
+    translator.request_attempt = 3
+    translator.request_timeout = 10.0
+    translator.max_error_count = 10
+    translator.get_hedge_report.return_value = None
+    translator.get_key_report.return_value = None
+    return translator
+
+
+class TestEnginePool(unittest.TestCase):
+    def setUp(self):
+        self.first = make_translator('First', 2)
+        self.second = make_translator('Second', 3)
+        self.pool = EnginePool([(self.first, 1), (self.second, 1)])
+
+    def test_created(self):
+        self.assertIs(self.first, self.pool.primary)
+        self.assertEqual(5, self.pool.concurrency_limit)
+        self.assertEqual('First', self.pool.name)
+        self.assertIs(self.first.lang_codes, self.pool.lang_codes)
+
+    def test_created_without_concurrency_limit(self):
+        pool = EnginePool([(self.first, 1), (make_translator('Third', 0), 1)])
+        self.assertEqual(0, pool.concurrency_limit)
+
+    def test_set_target_lang(self):
+        self.pool.set_target_lang('French')
+        self.first.set_target_lang.assert_called_once_with('French')
+        self.second.set_target_lang.assert_called_once_with('French')
+
+    @patch('calibre_plugins.ebook_translator.engines.pool.random.choices')
+    def test_translate(self, mock_choices):
+        mock_choices.side_effect = lambda members, weights: [members[-1]]
+        self.second.translate.return_value = 'B'
+
+        self.assertEqual('B', self.pool.translate('a'))
+        self.assertEqual('Second', self.pool.name)
+        self.first.translate.assert_not_called()
+        self.assertEqual(
+            'Engine pool: First 0, Second 1', self.pool.get_pool_report())
+
+    @patch('calibre_plugins.ebook_translator.engines.pool.random.choices')
+    def test_translate_stream(self, mock_choices):
+        mock_choices.side_effect = lambda members, weights: [members[0]]
+        self.first.translate.return_value = (char for char in 'AB')
+
+        self.assertEqual('AB', self.pool.translate('ab'))
+
+    @patch('calibre_plugins.ebook_translator.engines.pool.random.choices')
+    def test_translate_failover(self, mock_choices):
+        mock_choices.side_effect = lambda members, weights: [members[0]]
+        self.first.translate.side_effect = Exception('any error')
+        self.second.translate.return_value = 'B'
+
+        for _ in range(3):
+            self.assertEqual('B', self.pool.translate('a'))
+        self.assertEqual(3, self.first.translate.call_count)
+
+        # The failing translator is left out during the cooldown.
+        self.assertEqual('B', self.pool.translate('a'))
+        self.assertEqual(3, self.first.translate.call_count)
+        self.assertEqual([self.second], self.pool._candidates())
+
+    def test_translate_all_failed(self):
+        self.first.translate.side_effect = Exception('first error')
+        self.second.translate.side_effect = Exception('second error')
+
+        with self.assertRaises(Exception):
+            self.pool.translate('a')
+        self.assertEqual(1, self.first.translate.call_count)
+        self.assertEqual(1, self.second.translate.call_count)
+
+
+class TestGetEnginePool(unittest.TestCase):
+    @patch('calibre_plugins.ebook_translator.lib.translation.get_config')
+    def test_disabled(self, mock_get_config):
+        mock_get_config.return_value.get.return_value = {
+            'enabled': False, 'members': [{'engine': 'Google(Free)New'}]}
+        self.assertIsNone(get_engine_pool())
+
+    @patch('calibre_plugins.ebook_translator.lib.translation.get_config')
+    def test_enabled(self, mock_get_config):
+        mock_get_config.return_value.get.return_value = {
+            'enabled': True, 'members': [
+                {'engine': 'ChatGPT', 'weight': 2, 'api_keys': ['a', 'b']},
+                {'engine': 'Unknown'},
+                {'engine': 'DeepSeek'},
+                {'engine': 'Google(Free)New'}]}
+        pool = get_engine_pool()
+
+        self.assertIsInstance(pool, EnginePool)
+        self.assertEqual(
+            [('ChatGPT', 2), ('DeepSeek', 1), ('Google(Free)New', 1)],
+            [(translator.name, weight)
+             for translator, weight in pool.members])
+        self.assertEqual('a', pool.primary.api_key)
+        self.assertEqual(['b'], pool.primary.api_keys)
+
+    @patch.object(GenAI, 'structured_merge', True)
+    @patch('calibre_plugins.ebook_translator.lib.translation.get_config')
+    def test_structured_member(self, mock_get_config):
+        mock_get_config.return_value.get.return_value = {
+            'enabled': True, 'members': [
+                {'engine': 'ChatGPT', 'api_keys': ['a']},
+                {'engine': 'Google(Free)New'}]}
+        pool = get_engine_pool()
+        pool.set_merge_enabled(True)
+
+        member = pool.members[0][0]
+        member.set_source_lang('English')
+        member.set_target_lang('French')
+        self.assertFalse(member.is_structured())
+        self.assertNotIn('response_format', member.get_body('test'))
+        self.assertNotIn(member.structured_prompt, member.get_prompt())
+
+    @patch('calibre_plugins.ebook_translator.lib.translation.get_config')
+    def test_get_engine_name(self, mock_get_config):
+        config = {
+            'translate_engine': 'DeepL',
+            'custom_engines': {},
+            'engine_preferences': {},
+            'engine_pool': {'enabled': True, 'members': [
+                {'engine': 'Unknown'}, {'engine': 'DeepSeek'},
+                {'engine': 'ChatGPT'}]}}
+        mock_get_config.return_value.get.side_effect = config.get
+        self.assertEqual('DeepSeek', get_engine_name())
+
+        config['engine_pool']['enabled'] = False
+        self.assertEqual('DeepL', get_engine_name())
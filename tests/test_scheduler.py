@@ -0,0 +1,111 @@
+import unittest
+from unittest.mock import patch, Mock
+
+from ..lib.scheduler import BookScheduler, ScheduledBook
+
+
+module_name = 'calibre_plugins.ebook_translator.lib.scheduler'
+
+
+class TestBookScheduler(unittest.TestCase):
+    def setUp(self):
+        self.start = Mock(side_effect=lambda ebook: Mock(percent=0))
+        self.stop = Mock()
+        self.scheduler = BookScheduler(self.start, self.stop, limit=2)
+        self.long = self.scheduler.add('long', 3000)
+        self.short = self.scheduler.add('short', 100)
+        self.medium = self.scheduler.add('medium', 1000)
+
+    def test_schedule(self):
+        self.scheduler.schedule()
+        self.assertEqual(
+            [self.short, self.medium],
+            self.scheduler.get_books(ScheduledBook.RUNNING))
+        self.assertEqual(
+            [self.long], self.scheduler.get_books(ScheduledBook.QUEUED))
+
+        self.scheduler.done(self.short.job)
+        self.assertEqual(ScheduledBook.DONE, self.short.state)
+        self.assertEqual(ScheduledBook.RUNNING, self.long.state)
+
+    def test_schedule_in_order(self):
+        self.scheduler.shortest_first = False
+        self.scheduler.schedule()
+        self.assertEqual(
+            [self.long, self.short],
+            self.scheduler.get_books(ScheduledBook.RUNNING))
+
+    def test_schedule_by_priority(self):
+        self.scheduler.set_priority(self.long, 1)
+        self.scheduler.schedule()
+        self.assertEqual(
+            [self.long, self.short],
+            self.scheduler.get_books(ScheduledBook.RUNNING))
+
+    def test_schedule_without_limit(self):
+        self.scheduler.limit = 0
+        self.scheduler.schedule()
+        self.assertEqual(3, self.start.call_count)
+
+    def test_done_failed(self):
+        self.scheduler.schedule()
+        self.scheduler.done(self.short.job, True)
+        self.assertEqual(ScheduledBook.FAILED, self.short.state)
+        self.assertIsNone(self.scheduler.throughput)
+
+        self.scheduler.resume(self.short)
+        self.assertEqual(ScheduledBook.QUEUED, self.short.state)
+
+    def test_done_unknown_job(self):
+        self.assertIsNone(self.scheduler.done(Mock()))
+
+    def test_pause_and_resume(self):
+        self.scheduler.schedule()
+        job = self.short.job
+        self.scheduler.pause(self.short)
+        self.stop.assert_called_once_with(job)
+        self.assertEqual(ScheduledBook.PAUSED, self.short.state)
+        self.assertEqual(ScheduledBook.RUNNING, self.long.state)
+
+        # The stopped job is finished afterwards.
+        self.assertIs(self.short, self.scheduler.done(job, True))
+        self.assertEqual(ScheduledBook.PAUSED, self.short.state)
+
+        self.scheduler.resume(self.short)
+        self.assertEqual(ScheduledBook.QUEUED, self.short.state)
+        self.scheduler.done(self.medium.job)
+        self.assertEqual(ScheduledBook.RUNNING, self.short.state)
+
+    @patch(module_name + '.time.time')
+    def test_get_estimates(self, mock_time):
+        mock_time.return_value = 0.0
+        self.scheduler.schedule()
+        self.assertEqual(
+            {self.short: None, self.medium: None, self.long: None},
+            self.scheduler.get_estimates())
+
+        mock_time.return_value = 10.0
+        self.scheduler.done(self.short.job)
+        self.assertEqual(10.0, self.scheduler.throughput)
+        self.medium.job.percent = 0.5
+        self.assertEqual(
+            {self.medium: 30.0, self.long: 310.0},
+            self.scheduler.get_estimates(15.0))
+
+    @patch(module_name + '.time.time')
+    def test_unknown_size(self, mock_time):
+        mock_time.return_value = 0.0
+        unknown = self.scheduler.add('unknown', None)
+        self.scheduler.limit = 3
+        self.scheduler.schedule()
+        self.assertEqual(
+            [unknown], self.scheduler.get_books(ScheduledBook.QUEUED))
+
+        mock_time.return_value = 10.0
+        self.scheduler.done(self.short.job)
+        self.assertEqual(ScheduledBook.RUNNING, unknown.state)
+        self.assertIsNone(self.scheduler.get_estimates(10.0)[unknown])
+
+        # The book of unknown size does not change the throughput.
+        self.scheduler.done(unknown.job)
+        self.assertEqual(10.0, self.scheduler.throughput)
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch
+
+from ..lib.sharding import KeySharder
+
+
+module_name = 'calibre_plugins.ebook_translator.lib.sharding'
+
+
+class TestKeySharder(unittest.TestCase):
+    def setUp(self):
+        self.sharder = KeySharder(['key-a', 'key-b', 'key-a'], 2)
+
+    def test_created(self):
+        self.assertEqual(['key-a', 'key-b'], self.sharder.keys)
+
+    def test_acquire(self):
+        keys = [self.sharder.acquire() for _ in range(4)]
+        self.assertEqual(['key-a', 'key-b', 'key-a', 'key-b'], keys)
+        self.assertEqual({'key-a': 2, 'key-b': 2}, self.sharder.in_flight)
+
+        self.sharder.release('key-b')
+        self.assertEqual('key-b', self.sharder.acquire())
+
+    @patch(module_name + '.time')
+    def test_acquire_with_request_interval(self, mock_time):
+        mock_time.monotonic.return_value = 100.0
+        self.sharder.request_interval = 10.0
+
+        self.assertEqual('key-a', self.sharder.acquire())
+        self.sharder.release('key-a')
+        self.assertEqual('key-b', self.sharder.acquire())
+        self.sharder.release('key-b')
+        mock_time.sleep.assert_not_called()
+
+        # Wait for the key that can be used soonest.
+        mock_time.monotonic.return_value = 105.0
+        self.assertEqual('key-a', self.sharder.acquire())
+        mock_time.sleep.assert_called_once_with(5.0)
+        self.assertEqual(120.0, self.sharder.next_time['key-a'])
+
+    def test_quarantine(self):
+        self.assertTrue(self.sharder.quarantine('key-a'))
+        self.assertEqual('key-b', self.sharder.acquire())
+        self.assertEqual('key-b', self.sharder.acquire())
+
+        # Keep using the quarantined keys if no other key is left.
+        self.assertFalse(self.sharder.quarantine('key-b'))
+        self.assertEqual('key-a', self.sharder.acquire())
+
+    def test_quarantine_expired(self):
+        self.sharder.cooldown = 0.0
+        self.sharder.quarantine('key-a')
+        self.assertEqual('key-a', self.sharder.acquire())
+
+    def test_hold(self):
+        key = self.sharder.acquire()
+        stream = self.sharder.hold(key, iter('ab'))
+        self.assertEqual(1, self.sharder.in_flight[key])
+        self.assertEqual('ab', ''.join(stream))
+        self.assertEqual(0, self.sharder.in_flight[key])
+
+    def test_get_report(self):
+        self.sharder.acquire()
+        self.sharder.quarantine('key-a')
+        self.assertEqual(
+            'API keys: ...ey-a 1 (quarantined 1 times), ...ey-b 0',
+            self.sharder.get_report())
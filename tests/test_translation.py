@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest.mock import patch, Mock, call
 
@@ -5,6 +6,7 @@ from ..lib.utils import dummy
 from ..lib.translation import Glossary, ProgressBar, Translation
 from ..lib.exception import TranslationCanceled, TranslationFailed
 from ..engines.base import Base
+from ..engines.genai import GenAI
 from ..engines.deepl import DeeplTranslate
 
 
@@ -75,7 +77,8 @@ class TestTranslation(unittest.TestCase):
     def setUp(self):
         self.translator = Mock()
         self.glossary = Mock()
-        self.paragraph = Mock()
+        self.glossary.replace.side_effect = lambda text: text
+        self.paragraph = Mock(original='Hello World')
         self.streaming = Mock()
         self.cancel_request = Mock(return_value=False)
         self.log = Mock()
@@ -202,6 +205,8 @@ class TestTranslation(unittest.TestCase):
         mock_time.sleep.assert_has_calls([
             call(5), call(10), call(15), call(20), call(25)])
         self.assertEqual(6, self.translation.abort_count)
+        self.assertEqual(6, self.translation.metrics.failures)
+        self.assertEqual(5, self.translation.metrics.retries)
 
     def test_translate_cancel_due_to_fatal_error(self):
         pass
@@ -253,7 +258,7 @@ class TestTranslation(unittest.TestCase):
         self.streaming.assert_has_calls([
             call(''), call('Translating...'), call(''), call('你'),
             call('好'), call('世'), call('界')])
-        mock_time.sleep.assert_called_with(0.05)
+        mock_time.sleep.assert_not_called()
 
         self.assertEqual('你好呀世界', self.paragraph.translation)
 
@@ -269,9 +274,79 @@ class TestTranslation(unittest.TestCase):
 
         self.assertEqual('你好呀世界', self.paragraph.translation)
 
+    @patch('calibre_plugins.ebook_translator.lib.translation.Handler')
+    def test_handle_with_reports(self, mock_handler):
+        self.translator.concurrency_limit = 1
+        self.translator.request_interval = 0
+        self.translator.get_prompt_cache_report.return_value = 'report'
+        self.translator.get_hedge_report.return_value = 'hedge report'
+        self.translator.get_key_report.return_value = 'key report'
+        self.translation.set_logging(self.log)
+        self.paragraph.original = 'test'
+
+        self.translation.handle([self.paragraph])
+        self.log.assert_any_call('Translation completed.')
+        self.log.assert_any_call('hedge report')
+        self.log.assert_any_call('key report')
+        self.assertNotIn(call('report'), self.log.mock_calls)
+
+        self.translation.translator = Mock(GenAI)
+        self.translation.translator.get_prompt_cache_report.return_value = \
+            'report'
+        self.translation.handle([self.paragraph])
+        self.log.assert_any_call('report')
+
+    def test_translate_segments(self):
+        translator = Mock(GenAI)
+        translator.separator = '\n\n'
+        translator.request_attempt = 2
+        translator.get_structured_content.side_effect = json.dumps
+        translator.get_structured_result.side_effect = \
+            lambda result, keys: GenAI.get_structured_result(
+                translator, result, keys)
+        translator.translate.side_effect = [
+            '```json\n%s\n```' % json.dumps(
+                {'1': 'A', '3': 'C\n\nD', '4': 'X'}),
+            'invalid', '{"2": "B"}']
+        self.translation.translator = translator
+        self.translation.set_logging(self.log)
+
+        self.assertEqual(
+            'A\n\nB\n\nC\nD',
+            self.translation.translate_segments(0, 'a\n\nb\n\nc\n\n'))
+        translator.translate.assert_has_calls([
+            call(json.dumps({'1': 'a', '2': 'b', '3': 'c'})),
+            call(json.dumps({'2': 'b'})), call(json.dumps({'2': 'b'}))])
+        self.log.assert_called_with('Missing translation keys: 2', True)
+
+        translator.translate.side_effect = ['{}'] * 3
+        with self.assertRaises(TranslationFailed):
+            self.translation.translate_segments(0, 'a\n\n')
+        self.assertEqual(6, translator.translate.call_count)
+
+    def test_translate_paragraph_structured(self):
+        self.translation.translator = Mock(GenAI)
+        self.translation.translator.is_structured.return_value = True
+        self.translation.translator.merge_enabled = True
+        self.translation.translator.separator = '\n\n'
+        self.glossary.replace.side_effect = lambda text: text
+        self.glossary.restore.side_effect = lambda text: text
+        self.paragraph.original = 'a\n\nb\n\n'
+        self.paragraph.translation = None
+
+        with patch.object(
+                Translation, 'translate_segments',
+                return_value='A\n\nB') as mock_translate_segments:
+            self.translation.translate_paragraph(self.paragraph)
+        mock_translate_segments.assert_called_once_with(
+            self.paragraph.row, 'a\n\nb\n\n')
+        self.assertEqual('A\n\nB', self.paragraph.translation)
+        self.paragraph.do_aligment.assert_called_once_with('\n\n')
+
     def test_translate_paragraph_without_merge_enabled(self):
         self.translation.set_fresh(True)
         self.translator.merge_enabled = False
+        self.translator.translate.return_value = 'Bonjour le monde'
 
         self.translation.translate_paragraph(self.paragraph)
 
@@ -281,6 +356,7 @@ class TestTranslation(unittest.TestCase):
         self.translation.set_fresh(True)
         self.translator.separator = '\n\n'
         self.translator.merge_enabled = True
+        self.translator.translate.return_value = 'Bonjour le monde'
 
         self.translation.translate_paragraph(self.paragraph)
 
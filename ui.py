@@ -9,10 +9,11 @@ from . import EbookTranslator
 from .lib.utils import uid
 from .lib.ebook import Ebooks
 from .lib.config import get_config, upgrade_config
-from .lib.conversion import ConversionWorker
+from .lib.conversion import ConversionWorker, extra_formats
 from .batch import BatchTranslation
 from .setting import TranslationSetting
 from .cache import CacheManager
+from .jobs import BookQueue
 from .about import AboutDialog
 from .components import AlertMessage, ModeSelection
 from .advanced import CreateTranslationProject, AdvancedTranslation
@@ -34,6 +35,7 @@ class EbookTranslatorGui(InterfaceAction):
     class Status:
         jobs = {}
         windows = {}
+        scheduler = None
 
     def genesis(self):
         try:
@@ -45,6 +47,7 @@ class EbookTranslatorGui(InterfaceAction):
         menu.addAction(
             _('Advanced Mode'), self.show_advanced_translation)
         menu.addAction(_('Batch Mode'), self.show_batch_translation)
+        menu.addAction(_('Queue'), self.show_queue)
         menu.addSeparator()
         menu.addAction(_('Cache'), self.show_cache)
         menu.addSeparator()
@@ -104,6 +107,17 @@ class EbookTranslatorGui(InterfaceAction):
         window.show()
         self.add_window('batch', window)
 
+    def show_queue(self):
+        if self.show_window('queue'):
+            return
+        window = BookQueue(self, self.gui)
+        window.setMinimumWidth(800)
+        window.setMinimumHeight(400)
+        window.setWindowTitle('%s - %s' % (_('Queue'), self.title))
+        window.setWindowIcon(self.icon)
+        window.show()
+        self.add_window('queue', window)
+
     def show_setting(self):
         if self.has_running_jobs():
             self.alert.pop(_(
@@ -218,16 +232,16 @@ class EbookTranslatorGui(InterfaceAction):
             book_id = model.id(row)
             book_metadata = api.get_proxy_metadata(book_id)
             fmt, fmts = None, []
-            extra_formats = []
+            book_extra_formats = []
             try:
                 fmt, fmts = get_input_format_for_book(db, book_id, 'epub')
             except Exception as e:
-                for extra_format in ('srt', 'pgn'):
+                for extra_format in extra_formats.keys():
                     if api.has_format(book_id, extra_format):
                         if fmt is None:
                             fmt = extra_format
                         fmts.append(extra_format)
-                        extra_formats.append(extra_format)
+                        book_extra_formats.append(extra_format)
                 if fmt is None:
                     raise e
             ebooks.add(
@@ -240,6 +254,6 @@ class EbookTranslatorGui(InterfaceAction):
                 )),
                 fmt.lower(),  # Input format
                 book_metadata.language,  # Source language
-                extra_formats,
+                book_extra_formats,
             )
         return ebooks